@@ -3,38 +3,55 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from config import Config
+from .routing import LAST_WRITE_HEADER, RoutingSession, init_replica_routing
 import os
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 jwt = JWTManager()
 cors = CORS()
 
+# Building the app must stay cheap and free of side effects: gunicorn imports it once in the
+# master and forks the workers from there (see gunicorn.conf.py). Nothing here connects to the
+# database or touches the disk; folders are created on first write and the schema by `flask init`.
+def init_migrations(app):
+    # Alembic is only needed by the `flask db` commands and schema setup, not to serve requests
+    from flask_migrate import Migrate
+    Migrate(app, db, directory=os.path.join(os.path.dirname(app.root_path), 'migrations'))
+
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
 
     db.init_app(app)
     jwt.init_app(app)
-    cors.init_app(app, resources={r"/*": {"origins": "*"}})
+    cors.init_app(app, resources={r"/*": {"origins": "*"}}, expose_headers=[LAST_WRITE_HEADER])
+    if os.environ.get('FLASK_RUN_FROM_CLI'):
+        init_migrations(app)
+
+    from .routes.auth import auth_bp
+    app.register_blueprint(auth_bp)
+    from .routes.admin import admin_bp
+    app.register_blueprint(admin_bp)
+    from .routes.hod import hod_bp
+    app.register_blueprint(hod_bp)
+    from .routes.lecturer import lecturer_bp
+    app.register_blueprint(lecturer_bp)
+    from .routes.cr import cr_bp
+    app.register_blueprint(cr_bp)
+    from .routes.shared import shared_bp
+    app.register_blueprint(shared_bp)
 
-    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    from .commands import init_command, occurrences_cli, rollup_cli, reports_cli, changes_cli, excuses_cli
+    app.cli.add_command(init_command)
+    app.cli.add_command(occurrences_cli)
+    app.cli.add_command(rollup_cli)
+    app.cli.add_command(reports_cli)
+    app.cli.add_command(changes_cli)
+    app.cli.add_command(excuses_cli)
 
+    from .metrics import init_metrics
     with app.app_context():
-        from . import models
-
-        from .routes.auth import auth_bp
-        app.register_blueprint(auth_bp)
-        from .routes.admin import admin_bp
-        app.register_blueprint(admin_bp)
-        from .routes.hod import hod_bp
-        app.register_blueprint(hod_bp)
-        from .routes.lecturer import lecturer_bp
-        app.register_blueprint(lecturer_bp)
-        from .routes.cr import cr_bp
-        app.register_blueprint(cr_bp)
-        from .routes.shared import shared_bp
-        app.register_blueprint(shared_bp)
-        
-        db.create_all()
-
-    return app
\ No newline at end of file
+        init_metrics(app, db)
+    init_replica_routing(app)
+
+    return app
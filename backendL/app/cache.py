@@ -0,0 +1,75 @@
+# app/cache.py
+import hashlib
+import threading
+from flask import current_app, request, make_response
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import make_transient_to_detached
+from .models import db, Semester, CacheVersion
+
+# Process-local caches are keyed on a version stamp stored in the database, so every
+# worker process sees a change on its next lookup. Writers bump the stamp in the same
+# transaction as the change; readers pay one primary-key lookup instead of re-querying.
+SEMESTER = 'semester'
+DEPARTMENTS = 'departments'
+PROGRAMS = 'programs'
+SUBJECTS = 'subjects'
+USERS = 'users'
+# Every stamp has its row from the start (migration 0013), so a bump is always a plain
+# UPDATE; inserting rows on first use let two first writers collide on the primary key
+VERSION_NAMES = (SEMESTER, DEPARTMENTS, PROGRAMS, SUBJECTS, USERS)
+
+_lock = threading.Lock()
+
+@event.listens_for(CacheVersion.__table__, 'after_create')
+def _seed_versions(table, connection, **kwargs):
+    # Databases built with db.create_all() instead of the migrations
+    connection.execute(table.insert(), [{'name': name, 'version': 0} for name in VERSION_NAMES])
+
+def get_version(name):
+    return db.session.execute(select(CacheVersion.version).where(CacheVersion.name == name)).scalar() or 0
+
+def get_versions(names):
+    rows = db.session.execute(select(CacheVersion.name, CacheVersion.version).where(CacheVersion.name.in_(names)))
+    versions = dict.fromkeys(names, 0)
+    versions.update(rows.all())
+    return versions
+
+def bump_version(name):
+    db.session.execute(update(CacheVersion).where(CacheVersion.name == name).values(version=CacheVersion.version + 1))
+
+def _detached_copy(semester):
+    copy = Semester(**{column.key: getattr(semester, column.key) for column in Semester.__table__.columns})
+    make_transient_to_detached(copy)
+    return copy
+
+def get_active_semester():
+    version = get_version(SEMESTER)
+    _active_semester = current_app.extensions.setdefault('active_semester_cache', {'version': None, 'semester': None})
+    with _lock:
+        if _active_semester['version'] == version:
+            cached = _active_semester['semester']
+            return db.session.merge(cached, load=False) if cached is not None else None
+
+    active_semester = Semester.query.filter_by(is_active=True).first()
+    with _lock:
+        _active_semester['version'] = version
+        _active_semester['semester'] = _detached_copy(active_semester) if active_semester else None
+    return active_semester
+
+# --- CONDITIONAL GET ---
+def conditional_response(names, build, scope='', public=False):
+    # The ETag is derived from the version stamps of the data the response is built from,
+    # so a matching If-None-Match is answered with a 304 after one stamp lookup, without
+    # loading or serializing anything. Clients must revalidate on every use.
+    versions = get_versions(names)
+    stamp = ';'.join(f"{name}={versions[name]}" for name in sorted(names))
+    etag = hashlib.sha256(f"{request.full_path}|{scope}|{stamp}".encode()).hexdigest()[:32]
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(build())
+        if response.status_code != 200:
+            return response
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'public, no-cache' if public else 'private, no-cache'
+    return response
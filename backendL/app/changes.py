@@ -0,0 +1,162 @@
+# app/changes.py
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event, func, insert, literal, null, select
+from .models import (db, ChangeLog, CacheVersion, Department, Semester, User, Program, Subject, ClassSchedule,
+                     SpecialSchedule, Attendance, ClassOccurrence)
+from .routing import RoutingSession
+
+# The change log behind GET /api/changes. ORM writes to the tracked models are logged by the
+# flush hook below; writes made with Core statements call record_changes() with the same
+# criteria, and bulk imports log a 'reset' that tells clients to reload that whole list.
+# Every row carries the department and lecturer it belongs to, so callers only see their share.
+CHANGE_SETTLE_SECONDS = 5
+CHANGES_PAGE_SIZE = 500
+PRUNED = 'change_log_pruned'   # CacheVersion row holding the highest pruned change id
+
+ENTITIES = {
+    'departments': Department,
+    'semesters': Semester,
+    'users': User,
+    'programs': Program,
+    'subjects': Subject,
+    'schedules': ClassSchedule,
+    'special_schedules': SpecialSchedule,
+    'attendance': Attendance,
+}
+ENTITY_NAMES = {model: name for name, model in ENTITIES.items()}
+GLOBAL_ENTITIES = {'departments', 'semesters'}
+TIMETABLE_ENTITIES = {'departments', 'semesters', 'schedules', 'special_schedules', 'attendance'}
+ROLE_ENTITIES = {'Admin': set(ENTITIES), 'HOD': set(ENTITIES), 'Lecturer': TIMETABLE_ENTITIES, 'CR': TIMETABLE_ENTITIES}
+
+def _owners(entity):
+    # (id, department_id, lecturer_id) for each row of an entity
+    if entity == 'subjects':
+        return select(Subject.id, Program.department_id, null()).join(Program, Program.id == Subject.program_id)
+    if entity == 'schedules':
+        return select(ClassSchedule.id, Program.department_id, ClassSchedule.lecturer_id).join(
+            Subject, Subject.id == ClassSchedule.subject_id).join(Program, Program.id == Subject.program_id)
+    if entity == 'special_schedules':
+        return select(SpecialSchedule.id, SpecialSchedule.target_department_id, SpecialSchedule.lecturer_id)
+    if entity == 'attendance':
+        return select(Attendance.id, ClassOccurrence.department_id, ClassOccurrence.lecturer_id).join(
+            ClassOccurrence, ClassOccurrence.id == Attendance.occurrence_id)
+    model = ENTITIES[entity]
+    return select(model.id, model.department_id if entity in ('users', 'programs') else null(), null())
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def record_changes(entity, *criteria, action='update', session=None):
+    # One INSERT ... SELECT logs every row of the entity matching the criteria
+    entity_id, department_id, lecturer_id = _owners(entity).where(*criteria).subquery().c
+    source = select(literal(entity), entity_id, literal(action), department_id, lecturer_id, literal(_now(), ChangeLog.created_at.type))
+    (session or db.session).execute(insert(ChangeLog).from_select(
+        ['entity', 'entity_id', 'action', 'department_id', 'lecturer_id', 'created_at'], source
+    ))
+
+def record_reset(entity, department_id=None):
+    db.session.execute(insert(ChangeLog).values(entity=entity, action='reset', department_id=department_id, created_at=_now()))
+
+@event.listens_for(RoutingSession, 'before_flush')
+def _collect_deletes(session, flush_context, instances):
+    # Deleted rows are gone after the flush, so their owners are looked up while they still exist
+    deleted = {}
+    for obj in session.deleted:
+        if type(obj) in ENTITY_NAMES:
+            deleted.setdefault(ENTITY_NAMES[type(obj)], []).append(obj.id)
+    session.info['deleted_changes'] = [{
+        'entity': entity, 'entity_id': entity_id, 'action': 'delete', 'department_id': department_id,
+        'lecturer_id': lecturer_id, 'created_at': _now()
+    } for entity, ids in deleted.items()
+      for entity_id, department_id, lecturer_id in session.execute(_owners(entity).where(ENTITIES[entity].id.in_(ids)))]
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _record_flush(session, flush_context):
+    changed = {}
+    for obj in list(session.new) + [obj for obj in session.dirty if session.is_modified(obj, include_collections=False)]:
+        if type(obj) in ENTITY_NAMES:
+            changed.setdefault((ENTITY_NAMES[type(obj)], 'insert' if obj in session.new else 'update'), []).append(obj.id)
+    for (entity, action), ids in changed.items():
+        record_changes(entity, ENTITIES[entity].id.in_(ids), action=action, session=session)
+    deleted = session.info.pop('deleted_changes', None)
+    if deleted:
+        session.execute(insert(ChangeLog), deleted)
+
+# --- READING ---
+class ChangesPruned(Exception):
+    pass
+
+def head_cursor():
+    # Every change up to this id is old enough to have committed
+    settled = _now() - timedelta(seconds=CHANGE_SETTLE_SECONDS)
+    first_recent = db.session.execute(select(func.min(ChangeLog.id)).where(ChangeLog.created_at >= settled)).scalar()
+    if first_recent is not None:
+        return first_recent - 1
+    return db.session.execute(select(func.max(ChangeLog.id))).scalar() or 0
+
+def _visible(change, claims):
+    if claims.get('role') == 'Admin' or change.entity in GLOBAL_ENTITIES:
+        return True
+    if change.action == 'reset':
+        return change.department_id in (None, claims.get('department_id'))
+    if claims.get('role') == 'Lecturer':
+        return change.lecturer_id == claims.get('id')
+    return change.department_id == claims.get('department_id')
+
+def read_changes(claims, since, entities):
+    pruned = db.session.get(CacheVersion, PRUNED)
+    if pruned and since < pruned.version:
+        raise ChangesPruned()
+    page = db.session.execute(
+        select(ChangeLog).where(ChangeLog.id > since).order_by(ChangeLog.id).limit(CHANGES_PAGE_SIZE)
+    ).scalars().all()
+
+    # Ids are handed out before commit, so a young change may still have an older one pending
+    # below it: the cursor only moves past changes that have had time to settle. Anything
+    # newer is sent now and again next time, which clients absorb since entries carry full rows.
+    settled = _now() - timedelta(seconds=CHANGE_SETTLE_SECONDS)
+    cursor = since
+    for change in page:
+        if change.created_at > settled:
+            break
+        cursor = change.id
+
+    latest = {}
+    for change in page:
+        if change.entity in entities and _visible(change, claims):
+            latest.pop((change.entity, change.entity_id), None)
+            latest[(change.entity, change.entity_id)] = change
+    rows = {}
+    for entity in entities:
+        ids = [entity_id for (name, entity_id), change in latest.items() if name == entity and change.action != 'reset']
+        if ids:
+            model = ENTITIES[entity]
+            options = model.to_dict_options() if hasattr(model, 'to_dict_options') else ()
+            rows.update({(entity, row.id): row for row in model.query.options(*options).filter(model.id.in_(ids)).all()})
+
+    changes = []
+    for (entity, entity_id), change in latest.items():
+        if change.action == 'reset':
+            changes.append({'entity': entity, 'action': 'reset'})
+        elif (entity, entity_id) in rows:
+            changes.append({'entity': entity, 'id': entity_id, 'action': change.action, 'data': rows[(entity, entity_id)].to_dict()})
+        else:
+            changes.append({'entity': entity, 'id': entity_id, 'action': 'delete'})
+    more = len(page) == CHANGES_PAGE_SIZE and cursor == page[-1].id
+    return {'cursor': cursor, 'has_more': more, 'changes': changes}
+
+def prune_changes(days):
+    cutoff = _now() - timedelta(days=days)
+    last = db.session.execute(select(func.max(ChangeLog.id)).where(ChangeLog.created_at < cutoff)).scalar()
+    # The newest entry always stays, so the id counter cannot restart below it on servers that
+    # recompute AUTO_INCREMENT from the table after a restart
+    newest = db.session.execute(select(func.max(ChangeLog.id))).scalar()
+    if last is None or last >= newest:
+        last = (newest or 0) - 1
+    if last <= 0:
+        return 0
+    deleted = ChangeLog.query.filter(ChangeLog.id <= last).delete(synchronize_session=False)
+    marker = db.session.get(CacheVersion, PRUNED) or CacheVersion(name=PRUNED, version=0)
+    marker.version = max(marker.version or 0, last)
+    db.session.add(marker)
+    return deleted
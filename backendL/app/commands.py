@@ -0,0 +1,78 @@
+# app/commands.py
+import os
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from .models import db, Semester
+from .occurrences import sync_semester_occurrences, sync_special_occurrences
+from .rollups import rebuild_rollup
+from .report_jobs import run_queued_jobs, prune_report_jobs
+from .changes import prune_changes
+from .excuse_jobs import run_queued_excuses
+
+@click.command('init')
+def init_command():
+    """Create the storage folders and bring the database schema up to date. Run once per deploy."""
+    from flask_migrate import upgrade
+    from . import init_migrations
+    os.makedirs(current_app.config['UPLOAD_FOLDER'], exist_ok=True)
+    os.makedirs(current_app.config['REPORT_FOLDER'], exist_ok=True)
+    if 'migrate' not in current_app.extensions:
+        init_migrations(current_app)
+    upgrade()
+    click.echo('Storage folders and database schema are ready.')
+
+occurrences_cli = AppGroup('occurrences', help='Maintain the materialized class occurrences.')
+
+@occurrences_cli.command('rebuild')
+def rebuild_occurrences():
+    """Re-expand the active semester's timetable and add any missing special classes."""
+    active_semester = Semester.query.filter_by(is_active=True).first()
+    if active_semester:
+        sync_semester_occurrences(active_semester)
+    sync_special_occurrences()
+    db.session.commit()
+    click.echo('Class occurrences rebuilt.')
+
+rollup_cli = AppGroup('rollup', help='Maintain the attendance rollup used by reports.')
+
+@rollup_cli.command('rebuild')
+def rebuild_attendance_rollup():
+    """Recompute the per-lecturer daily attendance counts from the attendance records."""
+    rebuild_rollup()
+    db.session.commit()
+    click.echo('Attendance rollup rebuilt.')
+
+reports_cli = AppGroup('reports', help='Run and clean up report jobs.')
+
+@reports_cli.command('work')
+def work_report_jobs():
+    """Run every report job still waiting in the queue, one after another."""
+    count = run_queued_jobs()
+    click.echo(f'Ran {count} queued report jobs.')
+
+@reports_cli.command('prune')
+@click.option('--hours', default=1.0, show_default=True, help='Keep replaced and failed results younger than this.')
+def prune_report_results(hours):
+    """Delete report results that newer ones replaced, and failed jobs, with their files."""
+    count = prune_report_jobs(hours * 3600)
+    db.session.commit()
+    click.echo(f'Pruned {count} report jobs.')
+
+excuses_cli = AppGroup('excuses', help='Process uploaded excuse PDFs.')
+
+@excuses_cli.command('work')
+def work_excuse_jobs():
+    """Process every excuse still waiting in the queue, one after another."""
+    count = run_queued_excuses()
+    click.echo(f'Processed {count} queued excuses.')
+
+changes_cli = AppGroup('changes', help='Maintain the change log behind /api/changes.')
+
+@changes_cli.command('prune')
+@click.option('--days', default=7, show_default=True, help='Keep changes younger than this.')
+def prune_change_log(days):
+    """Delete old change log entries; clients syncing from before them are told to reload."""
+    count = prune_changes(days)
+    db.session.commit()
+    click.echo(f'Pruned {count} change log entries.')
@@ -0,0 +1,133 @@
+# app/conflicts.py
+import heapq
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from sqlalchemy import select
+from .models import db, ClassOccurrence, ClassSchedule, SpecialSchedule, Subject, User
+from .occurrences import DAYS_OF_WEEK, weekly_dates
+
+# Slots are (key, start_time, end_time, ref): the key groups slots that may collide, which is
+# (lecturer_id, weekday) for timetables, and ref is whatever the caller wants reported back.
+# Two slots overlap when each starts before the other ends; back-to-back classes do not.
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+class IntervalIndex:
+    # Each key's slots are kept sorted by start time together with the longest slot length, so a
+    # lookup only inspects slots starting in (start - longest, end): two bisections plus the hits.
+    def __init__(self, slots=()):
+        self._starts = defaultdict(list)
+        self._slots = defaultdict(list)
+        self._longest = defaultdict(int)
+        grouped = defaultdict(list)
+        for key, start, end, ref in slots:
+            grouped[key].append((_minutes(start), _minutes(end), ref))
+        for key, group in grouped.items():
+            group.sort(key=lambda slot: slot[0])
+            self._slots[key] = group
+            self._starts[key] = [slot[0] for slot in group]
+            self._longest[key] = max(end - start for start, end, _ in group)
+
+    def overlapping(self, key, start, end):
+        start, end = _minutes(start), _minutes(end)
+        starts, slots = self._starts[key], self._slots[key]
+        low = bisect_right(starts, start - self._longest[key])
+        high = bisect_left(starts, end)
+        return [ref for slot_start, slot_end, ref in slots[low:high] if slot_end > start]
+
+    def add(self, key, start, end, ref):
+        start, end = _minutes(start), _minutes(end)
+        position = bisect_right(self._starts[key], start)
+        self._starts[key].insert(position, start)
+        self._slots[key].insert(position, (start, end, ref))
+        self._longest[key] = max(self._longest[key], end - start)
+
+def find_conflicts(slots):
+    # Sort-and-sweep per key: O(n log n) plus one step per overlapping pair found
+    grouped = defaultdict(list)
+    for key, start, end, ref in slots:
+        grouped[key].append((_minutes(start), _minutes(end), ref))
+    pairs = []
+    for key, group in grouped.items():
+        group.sort(key=lambda slot: (slot[0], slot[1]))
+        active = []
+        for index, (start, end, ref) in enumerate(group):
+            while active and active[0][0] <= start:
+                heapq.heappop(active)
+            pairs.extend((key, group[other][2], ref) for _, other in active)
+            heapq.heappush(active, (end, index))
+    return pairs
+
+# --- TIMETABLE LOOKUPS ---
+def describe_occurrence(occurrence, subject_name):
+    slot = {
+        'type': 'special' if occurrence.special_schedule_id else 'weekly',
+        'schedule_id': occurrence.special_schedule_id or occurrence.class_schedule_id,
+        'subject_name': subject_name,
+        'start_time': occurrence.start_time.strftime('%H:%M'),
+        'end_time': occurrence.end_time.strftime('%H:%M')
+    }
+    if occurrence.special_schedule_id:
+        slot['class_date'] = occurrence.class_date.isoformat()
+    else:
+        slot['day_of_week'] = DAYS_OF_WEEK[occurrence.class_date.weekday()]
+    return slot
+
+def occurrence_conflicts(lecturer_id, class_dates, start_time, end_time):
+    # Classes the lecturer already teaches on any of the dates that overlap the new slot,
+    # weekly and special alike, each reported once however many weeks it collides
+    if not class_dates:
+        return []
+    rows = db.session.execute(
+        select(ClassOccurrence, Subject.name).join(Subject, Subject.id == ClassOccurrence.subject_id).where(
+            ClassOccurrence.lecturer_id == lecturer_id,
+            ClassOccurrence.class_date.in_(class_dates),
+            ClassOccurrence.start_time < end_time,
+            ClassOccurrence.end_time > start_time
+        ).order_by(ClassOccurrence.class_date, ClassOccurrence.start_time)
+    ).all()
+    conflicts = {}
+    for occurrence, subject_name in rows:
+        conflicts.setdefault((occurrence.class_schedule_id, occurrence.special_schedule_id), describe_occurrence(occurrence, subject_name))
+    return list(conflicts.values())
+
+def weekly_slot_conflicts(lecturer_id, day_of_week, start_time, end_time, semester):
+    return occurrence_conflicts(lecturer_id, list(weekly_dates(day_of_week, semester.start_date, semester.end_date)), start_time, end_time)
+
+def semester_slots(semester, lecturer_ids):
+    # Weekly classes and the special classes falling inside the semester, keyed by lecturer and weekday
+    weekly = db.session.execute(
+        select(ClassSchedule.id, ClassSchedule.lecturer_id, ClassSchedule.day_of_week, ClassSchedule.start_time, ClassSchedule.end_time, Subject.name)
+        .join(Subject, Subject.id == ClassSchedule.subject_id)
+        .where(ClassSchedule.semester_id == semester.id, ClassSchedule.lecturer_id.in_(lecturer_ids))
+    ).all()
+    special = db.session.execute(
+        select(SpecialSchedule.id, SpecialSchedule.lecturer_id, SpecialSchedule.class_date, SpecialSchedule.start_time, SpecialSchedule.end_time, Subject.name)
+        .join(Subject, Subject.id == SpecialSchedule.subject_id)
+        .where(SpecialSchedule.lecturer_id.in_(lecturer_ids), SpecialSchedule.class_date.between(semester.start_date, semester.end_date))
+    ).all()
+    slots = [((row.lecturer_id, row.day_of_week), row.start_time, row.end_time,
+              {'type': 'weekly', 'schedule_id': row.id, 'subject_name': row.name, 'day_of_week': row.day_of_week,
+               'start_time': row.start_time.strftime('%H:%M'), 'end_time': row.end_time.strftime('%H:%M')}) for row in weekly]
+    slots += [((row.lecturer_id, DAYS_OF_WEEK[row.class_date.weekday()]), row.start_time, row.end_time,
+               {'type': 'special', 'schedule_id': row.id, 'subject_name': row.name, 'class_date': row.class_date.isoformat(),
+                'start_time': row.start_time.strftime('%H:%M'), 'end_time': row.end_time.strftime('%H:%M')}) for row in special]
+    return slots
+
+def department_conflicts(semester, department_id):
+    lecturers = dict(db.session.query(User.id, User.full_name).filter_by(role='Lecturer', department_id=department_id).all())
+    conflicts = []
+    for (lecturer_id, day_of_week), first, second in find_conflicts(semester_slots(semester, list(lecturers))):
+        # Special classes on the same weekday only collide when they are on the same date
+        if first.get('class_date') and second.get('class_date') and first['class_date'] != second['class_date']:
+            continue
+        conflicts.append({
+            'lecturer_id': lecturer_id,
+            'lecturer_name': lecturers[lecturer_id],
+            'day_of_week': day_of_week,
+            'class_date': first.get('class_date') or second.get('class_date'),
+            'first': first,
+            'second': second
+        })
+    return sorted(conflicts, key=lambda c: (c['lecturer_name'], DAYS_OF_WEEK.index(c['day_of_week']), c['first']['start_time']))
@@ -0,0 +1,42 @@
+# app/dialects.py
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import mysql, sqlite, postgresql
+from . import db
+
+# Insert statements that skip rows violating a unique constraint instead of raising,
+# so a write can rely on the constraint rather than a read-before-insert. Built on the
+# Core table so the result always reports rowcount, also for executemany.
+def insert_ignore(model):
+    model = model.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        return mysql.insert(model).prefix_with('IGNORE')
+    if dialect == 'sqlite':
+        return sqlite.insert(model).on_conflict_do_nothing()
+    if dialect == 'postgresql':
+        return postgresql.insert(model).on_conflict_do_nothing()
+    return insert(model)
+
+# Insert-or-add: rows whose key already exists have their counter columns increased by the
+# inserted values, so concurrent writers never lose an increment. MySQL, SQLite and PostgreSQL
+# do it in one statement; anywhere else each row is an UPDATE of the counters, then an INSERT
+# when no row matched, retried as an UPDATE if a concurrent writer inserted the key first.
+def upsert_increment(model, key_columns, counter_columns, rows):
+    table = model.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        stmt = mysql.insert(table)
+        return db.session.execute(stmt.on_duplicate_key_update({c: table.c[c] + stmt.inserted[c] for c in counter_columns}), rows)
+    if dialect in ('sqlite', 'postgresql'):
+        stmt = (sqlite if dialect == 'sqlite' else postgresql).insert(table)
+        return db.session.execute(stmt.on_conflict_do_update(index_elements=key_columns, set_={c: table.c[c] + stmt.excluded[c] for c in counter_columns}), rows)
+    for row in rows:
+        increment = update(table).where(*(table.c[k] == row[k] for k in key_columns)).values({c: table.c[c] + row[c] for c in counter_columns})
+        if db.session.execute(increment).rowcount:
+            continue
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(table).values(row))
+        except IntegrityError:
+            db.session.execute(increment)
@@ -0,0 +1,129 @@
+# app/events.py
+import json
+import queue
+import threading
+from flask import current_app
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+from sqlalchemy import event
+from .routing import RoutingSession
+
+# Per-department push behind GET /api/events/stream. Views call publish() while they work; the
+# session passes the events to the in-process bus once the transaction commits and drops them
+# on rollback. Events are small hints ('attendance', 'schedules') and clients refetch or pull
+# /api/changes when one arrives. The bus lives in the process, so with several workers a
+# stream only hears about writes served by its own worker; the dashboards' slow change-feed
+# poll picks up the rest. Each idle stream waits on its queue, which is one blocked thread
+# under the threaded server and only a greenlet under SERVER=gevent (see run.py).
+
+class Subscription:
+    def __init__(self, department_id, limit):
+        self.department_id = department_id
+        self.queue = queue.Queue(maxsize=limit)
+        self.overflowed = False
+
+class EventBus:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._count = 0
+
+    def is_full(self, max_streams):
+        return self._count >= max_streams
+
+    def subscribe(self, department_id, limit, max_streams):
+        with self._lock:
+            if self._count >= max_streams:
+                return None
+            subscription = Subscription(department_id, limit)
+            self._subscribers.setdefault(department_id, set()).add(subscription)
+            self._count += 1
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.department_id, set())
+            if subscription in subscribers:
+                subscribers.discard(subscription)
+                self._count -= 1
+                if not subscribers:
+                    del self._subscribers[subscription.department_id]
+
+    def publish(self, department_id, name, data):
+        message = f'event: {name}\ndata: {json.dumps(data)}\n\n'
+        with self._lock:
+            subscribers = list(self._subscribers.get(department_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(message)
+            except queue.Full:
+                # A client this far behind is told to reload instead of being sent the backlog
+                subscription.overflowed = True
+
+bus = EventBus()
+
+def publish(department_id, name, data):
+    from . import db
+    if department_id is None:
+        return
+    session = db.session()
+    if session.in_transaction():
+        session.info.setdefault('events', []).append((department_id, name, data))
+    else:
+        bus.publish(department_id, name, data)
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _send_events(session):
+    for department_id, name, data in session.info.pop('events', ()):
+        bus.publish(department_id, name, data)
+
+@event.listens_for(RoutingSession, 'after_soft_rollback')
+def _drop_events(session, previous_transaction):
+    session.info.pop('events', None)
+
+# EventSource cannot send an Authorization header, so a stream is opened with ?ticket=<ticket>
+# instead. A ticket only names the department, is signed with its own salt so it is useless
+# anywhere else, and expires within EVENTS_TICKET_SECONDS: the URL, which proxies and access
+# logs keep, never carries the day-long access token.
+def _tickets():
+    return URLSafeTimedSerializer(current_app.config['JWT_SECRET_KEY'], salt='event-stream')
+
+def issue_stream_ticket(department_id):
+    return _tickets().dumps({'department_id': department_id})
+
+def read_stream_ticket(ticket):
+    # The department the ticket was issued for, or None when it is forged or expired
+    try:
+        return _tickets().loads(ticket, max_age=current_app.config['EVENTS_TICKET_SECONDS'])['department_id']
+    except (BadSignature, TypeError, KeyError):
+        return None
+
+def event_stream(department_id):
+    # Runs after the view has returned, so it must not touch the database or the app context
+    heartbeat = current_app.config['EVENTS_HEARTBEAT_SECONDS']
+    limit, max_streams = current_app.config['EVENTS_QUEUE_LIMIT'], current_app.config['EVENTS_MAX_STREAMS']
+
+    def stream():
+        # Subscribed only once the server starts sending the body: a response that is never
+        # iterated (HEAD, a client gone before the first byte) never reaches the finally below
+        subscription = bus.subscribe(department_id, limit, max_streams)
+        if subscription is None:
+            # Filled up since the view checked; EventSource reconnects after the delay
+            yield 'retry: 30000\n\n'
+            return
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    message = subscription.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    # Keeps proxies from closing the connection and notices clients that left
+                    message = ': ping\n\n'
+                if subscription.overflowed:
+                    while not subscription.queue.empty():
+                        subscription.queue.get_nowait()
+                    subscription.overflowed = False
+                    message = 'event: resync\ndata: {}\n\n'
+                yield message
+        finally:
+            bus.unsubscribe(subscription)
+    return stream()
@@ -0,0 +1,231 @@
+# app/excuse_jobs.py
+import io
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import select, update
+from .models import db, Attendance, ClassOccurrence
+from .storage import stored_path, store_bytes
+from .changes import record_changes
+from .events import publish
+
+# Excuse PDFs are checked and prepared after the upload has returned. The attendance row is the
+# queue: the upload marks it 'queued', and whoever processes it first claims it ('processing',
+# with excuse_claimed_at) and hands the file to a pool of worker processes (PDF parsing is pure
+# Python and would hold the GIL on the request threads). The outcome goes back on the row:
+# 'ready' with the page count, a first-page thumbnail and possibly a compressed copy of the
+# file, 'rejected' when it is not a usable PDF, or 'failed' when processing broke.
+# A claim older than EXCUSE_JOB_TIMEOUT_SECONDS was lost with the process that held it (a
+# restart, a recycled worker) and is queued again. Every web worker sweeps the queue for such
+# rows once per timeout period; `flask excuses work` does the same on demand.
+IMAGE_MAX_WIDTH = 1600
+IMAGE_QUALITY = 70
+THUMBNAIL_QUALITY = 80
+
+_pool = None
+_pool_lock = threading.Lock()
+_last_sweep = None
+
+def get_excuse_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=current_app.config['EXCUSE_JOB_WORKERS'],
+                mp_context=multiprocessing.get_context('spawn')
+            )
+    return _pool
+
+# --- PROCESSING (in a worker process, no app context) ---
+# pypdf and Pillow are imported here rather than at the top: only the worker processes and
+# `flask excuses work` use them, and web workers should not pay for loading them.
+def _compressed(reader):
+    from pypdf import PdfWriter
+    # Oversized excuses are nearly always phone scans: downscale and re-encode their images
+    writer = PdfWriter(clone_from=reader)
+    for page in writer.pages:
+        for image in page.images:
+            picture = image.image
+            if picture.width > IMAGE_MAX_WIDTH:
+                picture = picture.convert('RGB') if picture.mode not in ('RGB', 'L') else picture.copy()
+                picture.thumbnail((IMAGE_MAX_WIDTH, picture.height))
+                image.replace(picture, quality=IMAGE_QUALITY)
+        page.compress_content_streams()
+    writer.compress_identical_objects()
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+def _thumbnail(path, reader, width):
+    from PIL import Image
+    pdftoppm = shutil.which('pdftoppm')
+    if pdftoppm:
+        with tempfile.TemporaryDirectory() as directory:
+            subprocess.run([pdftoppm, '-f', '1', '-l', '1', '-singlefile', '-jpeg', '-scale-to-x', str(width), '-scale-to-y', '-1',
+                            path, os.path.join(directory, 'page')], check=True, capture_output=True, timeout=60)
+            picture = Image.open(os.path.join(directory, 'page.jpg'))
+            picture.load()
+    else:
+        # Without poppler installed to render the page, a scanned page is its largest image
+        images = [image.image for image in reader.pages[0].images]
+        if not images:
+            return None
+        picture = max(images, key=lambda image: image.width * image.height)
+    picture = picture.convert('RGB')
+    picture.thumbnail((width, width * 2))
+    output = io.BytesIO()
+    picture.save(output, 'JPEG', quality=THUMBNAIL_QUALITY)
+    return output.getvalue()
+
+def process_excuse(path, root, max_pages, compress_bytes, thumbnail_width):
+    from pypdf import PdfReader
+    try:
+        reader = PdfReader(path, strict=True)
+        if reader.is_encrypted:
+            return {'status': 'rejected', 'error': 'Password-protected PDFs cannot be reviewed'}
+        pages = len(reader.pages)
+    except Exception:
+        return {'status': 'rejected', 'error': 'The file is not a readable PDF'}
+    if pages == 0:
+        return {'status': 'rejected', 'error': 'The PDF has no pages'}
+    if pages > max_pages:
+        return {'status': 'rejected', 'error': f'Excuses may have at most {max_pages} pages'}
+
+    result = {'status': 'ready', 'pages': pages, 'file': None, 'thumbnail': None, 'error': None}
+    # Compression and the thumbnail are extras: a file they trip over is still a valid excuse
+    if os.path.getsize(path) > compress_bytes:
+        try:
+            data = _compressed(reader)
+            if len(data) < os.path.getsize(path):
+                result['file'] = store_bytes(root, data, 'pdf')
+        except Exception:
+            pass
+    try:
+        thumbnail = _thumbnail(path, reader, thumbnail_width)
+        if thumbnail:
+            result['thumbnail'] = store_bytes(root, thumbnail, 'jpg')
+    except Exception:
+        pass
+    return result
+
+# --- SUBMISSION AND RESULTS ---
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _arguments(app, filename):
+    root = os.path.abspath(app.config['UPLOAD_FOLDER'])
+    return (stored_path(filename, root), root, app.config['EXCUSE_MAX_PAGES'],
+            app.config['EXCUSE_COMPRESS_BYTES'], app.config['EXCUSE_THUMBNAIL_WIDTH'])
+
+def _claim(attendance_id, filename):
+    # Returns the claim time, or None when someone else has the row or a newer upload replaced it
+    claimed_at = _now().replace(microsecond=0)
+    claimed = db.session.execute(
+        update(Attendance).where(Attendance.id == attendance_id, Attendance.excuse_file == filename, Attendance.excuse_status == 'queued')
+        .values(excuse_status='processing', excuse_claimed_at=claimed_at).execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return claimed_at if claimed else None
+
+def requeue_stale_excuses():
+    cutoff = _now() - timedelta(seconds=current_app.config['EXCUSE_JOB_TIMEOUT_SECONDS'])
+    requeued = db.session.execute(
+        update(Attendance).where(Attendance.excuse_status == 'processing', Attendance.excuse_claimed_at < cutoff)
+        .values(excuse_status='queued', excuse_claimed_at=None).execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    if requeued:
+        current_app.logger.warning('Requeued %s stale excuses', requeued)
+    return requeued
+
+def _queued():
+    return db.session.query(Attendance.id, Attendance.excuse_file).filter(Attendance.excuse_status == 'queued').order_by(Attendance.id).all()
+
+def _record_result(app, attendance_id, filename, claimed_at, result):
+    with app.app_context():
+        try:
+            values = {
+                'excuse_status': result['status'], 'excuse_pages': result.get('pages'),
+                'excuse_thumbnail': result.get('thumbnail'), 'excuse_error': (result.get('error') or '')[:255] or None
+            }
+            if result.get('file'):
+                values['excuse_file'] = result['file']
+            # Only while this claim still holds; a newer upload or a requeue has a job of its own
+            updated = db.session.execute(
+                update(Attendance).where(Attendance.id == attendance_id, Attendance.excuse_file == filename,
+                                         Attendance.excuse_status == 'processing', Attendance.excuse_claimed_at == claimed_at)
+                .values(**values).execution_options(synchronize_session=False)
+            ).rowcount
+            if updated:
+                record_changes('attendance', Attendance.id == attendance_id)
+                department_id = db.session.execute(
+                    select(ClassOccurrence.department_id).join(Attendance, Attendance.occurrence_id == ClassOccurrence.id).where(Attendance.id == attendance_id)
+                ).scalar()
+                publish(department_id, 'attendance', {'action': 'excuse_processed', 'ids': [attendance_id]})
+            db.session.commit()
+        finally:
+            db.session.remove()
+
+def _finished(app, attendance_id, filename, claimed_at, future):
+    try:
+        result = future.result()
+    except Exception as error:
+        app.logger.exception('Processing the excuse for attendance %s failed', attendance_id)
+        result = {'status': 'failed', 'error': str(error) or type(error).__name__}
+    _record_result(app, attendance_id, filename, claimed_at, result)
+
+def _sweep():
+    # At most once per timeout period in each process: pick up rows whose job was lost
+    global _last_sweep
+    timeout = current_app.config['EXCUSE_JOB_TIMEOUT_SECONDS']
+    with _pool_lock:
+        if _last_sweep is not None and time.monotonic() - _last_sweep < timeout:
+            return []
+        _last_sweep = time.monotonic()
+    requeue_stale_excuses()
+    return _queued()
+
+def submit_excuse_job(attendance_id, filename):
+    app = current_app._get_current_object()
+    for queued_id, queued_file in [(attendance_id, filename), *_sweep()]:
+        claimed_at = _claim(queued_id, queued_file)
+        if claimed_at is None:
+            continue
+        try:
+            future = get_excuse_pool().submit(process_excuse, *_arguments(app, queued_file))
+        except Exception:
+            # Back in the queue for the next sweep or `flask excuses work`
+            app.logger.exception('Could not queue the excuse for attendance %s', queued_id)
+            db.session.execute(
+                update(Attendance).where(Attendance.id == queued_id, Attendance.excuse_claimed_at == claimed_at)
+                .values(excuse_status='queued', excuse_claimed_at=None).execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            return
+        future.add_done_callback(lambda done, queued_id=queued_id, queued_file=queued_file, claimed_at=claimed_at:
+                                 _finished(app, queued_id, queued_file, claimed_at, done))
+
+def run_queued_excuses():
+    app = current_app._get_current_object()
+    requeue_stale_excuses()
+    processed = 0
+    for attendance_id, filename in _queued():
+        claimed_at = _claim(attendance_id, filename)
+        if claimed_at is None:
+            continue
+        db.session.remove()
+        try:
+            result = process_excuse(*_arguments(app, filename))
+        except Exception as error:
+            app.logger.exception('Processing the excuse for attendance %s failed', attendance_id)
+            result = {'status': 'failed', 'error': str(error) or type(error).__name__}
+        _record_result(app, attendance_id, filename, claimed_at, result)
+        processed += 1
+    return processed
@@ -0,0 +1,70 @@
+# app/hashing.py
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Password hashes are deliberately slow, so they run in a pool of worker processes
+# instead of on the request thread. The pool is created on first use and at most
+# PASSWORD_HASH_QUEUE_LIMIT interactive jobs may be queued or running at once: beyond
+# that a caller waits up to PASSWORD_HASH_QUEUE_TIMEOUT seconds for a slot, then gets
+# HashPoolBusy so the route can shed load with a 503 instead of piling up.
+# Bulk imports hold slots of their own, at most PASSWORD_HASH_BULK_WORKERS jobs in
+# flight, so the remaining workers are always free for logins.
+_pool = None
+_slots = None
+_bulk_slots = None
+_pool_lock = threading.Lock()
+# Passwords per bulk job, kept small so a login queued behind one is not held up for long
+BULK_CHUNK_SIZE = 8
+
+class HashPoolBusy(Exception):
+    pass
+
+def get_hash_pool():
+    global _pool, _slots, _bulk_slots
+    with _pool_lock:
+        if _pool is None:
+            _slots = threading.BoundedSemaphore(current_app.config['PASSWORD_HASH_QUEUE_LIMIT'])
+            _bulk_slots = threading.BoundedSemaphore(current_app.config['PASSWORD_HASH_BULK_WORKERS'])
+            _pool = ProcessPoolExecutor(
+                max_workers=current_app.config['PASSWORD_HASH_WORKERS'],
+                mp_context=multiprocessing.get_context('spawn')
+            )
+    return _pool
+
+def _submit(fn, *args, bulk=False):
+    pool = get_hash_pool()
+    # Imports are not latency sensitive, so they wait for a free slot instead of timing out
+    slots = _bulk_slots if bulk else _slots
+    if not slots.acquire(timeout=None if bulk else current_app.config['PASSWORD_HASH_QUEUE_TIMEOUT']):
+        raise HashPoolBusy()
+    try:
+        future = pool.submit(fn, *args)
+    except Exception:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+def _hash_many(passwords, method):
+    return [generate_password_hash(password, method) for password in passwords]
+
+def hash_method():
+    return current_app.config['PASSWORD_HASH_METHOD']
+
+def hash_password(password):
+    return _submit(generate_password_hash, password, hash_method()).result()
+
+def hash_passwords(passwords):
+    # Chunks go out as earlier ones finish, never more than PASSWORD_HASH_BULK_WORKERS at a time
+    futures = [_submit(_hash_many, passwords[i:i + BULK_CHUNK_SIZE], hash_method(), bulk=True) for i in range(0, len(passwords), BULK_CHUNK_SIZE)]
+    return [hashed for future in futures for hashed in future.result()]
+
+def verify_password(password_hash, password):
+    return _submit(check_password_hash, password_hash, password).result()
+
+def needs_rehash(password_hash):
+    # Stored hashes look like "<method>$<salt>$<hash>"; any other method is outdated
+    return password_hash.split('$', 1)[0] != hash_method()
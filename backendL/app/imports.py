@@ -0,0 +1,191 @@
+# app/imports.py
+import csv
+import io
+from datetime import time
+from itertools import islice
+from flask import current_app
+from sqlalchemy import insert
+from .models import db, Department, Program, Subject, User, ClassSchedule
+from .hashing import hash_passwords
+from .occurrences import DAYS_OF_WEEK, sync_semester_occurrences
+from .cache import bump_version, USERS, SUBJECTS
+from .changes import record_reset
+from .conflicts import IntervalIndex, semester_slots
+
+IMPORT_ROLES = ('HOD', 'Lecturer', 'CR')
+USER_COLUMNS = ['full_name', 'email', 'password', 'role', 'department']
+SUBJECT_COLUMNS = ['name', 'code', 'program', 'year_of_study']
+SCHEDULE_COLUMNS = ['subject_code', 'lecturer_email', 'day_of_week', 'start_time', 'end_time']
+
+# --- CSV READING ---
+def read_csv_batches(file_storage, required_columns):
+    # Rows are read straight from the upload stream in batches, never as a whole file
+    reader = csv.DictReader(io.TextIOWrapper(file_storage.stream, encoding='utf-8-sig', newline=''))
+    missing = [column for column in required_columns if column not in (reader.fieldnames or [])]
+    if missing:
+        return None, f"Missing CSV columns: {', '.join(missing)}"
+
+    def batches():
+        row_number = 1
+        while True:
+            batch = []
+            for row in islice(reader, current_app.config['IMPORT_BATCH_SIZE']):
+                row_number += 1
+                batch.append((row_number, {key: (value or '').strip() for key, value in row.items() if key}))
+            if not batch:
+                return
+            yield batch
+    return batches(), None
+
+def run_import(batches, validate_batch, model):
+    total_rows = 0
+    inserted = 0
+    errors = []
+    for batch in batches:
+        total_rows += len(batch)
+        rows, batch_errors = validate_batch(batch)
+        errors.extend(batch_errors)
+        if rows:
+            db.session.execute(insert(model.__table__), rows)
+            inserted += len(rows)
+    return {'total_rows': total_rows, 'inserted': inserted, 'errors': errors}
+
+def _missing_fields(row, columns):
+    return [f"{column} is required" for column in columns if not row.get(column)]
+
+def _lookup_map(pairs):
+    # Lets a CSV refer to a department or program by name (any case) or by id
+    lookup = {}
+    for id_, name in pairs:
+        lookup[str(id_)] = id_
+        lookup[name.lower()] = id_
+    return lookup
+
+# --- USERS ---
+def import_users(file_storage):
+    batches, error = read_csv_batches(file_storage, USER_COLUMNS)
+    if error:
+        return None, error
+    departments = _lookup_map(db.session.query(Department.id, Department.name))
+    seen_emails = set()
+
+    def validate_batch(batch):
+        emails = [row['email'] for _, row in batch if row.get('email')]
+        taken = {email.lower() for (email,) in db.session.query(User.email).filter(User.email.in_(emails))}
+        rows, errors = [], []
+        for row_number, row in batch:
+            problems = _missing_fields(row, USER_COLUMNS)
+            email = row.get('email', '').lower()
+            if email and (email in taken or email in seen_emails):
+                problems.append('email already exists')
+            if row.get('role') and row['role'] not in IMPORT_ROLES:
+                problems.append(f"role must be one of {', '.join(IMPORT_ROLES)}")
+            if row.get('department') and row['department'].lower() not in departments:
+                problems.append('department not found')
+            if problems:
+                errors.append({'row': row_number, 'errors': problems})
+                continue
+            seen_emails.add(email)
+            rows.append({'full_name': row['full_name'], 'email': row['email'], 'password': row['password'],
+                         'role': row['role'], 'department_id': departments[row['department'].lower()]})
+        for new_user, hashed_password in zip(rows, hash_passwords([r['password'] for r in rows])):
+            new_user['password'] = hashed_password
+        return rows, errors
+
+    result = run_import(batches, validate_batch, User)
+    if result['inserted']:
+        bump_version(USERS)
+        record_reset('users')
+    db.session.commit()
+    return result, None
+
+# --- SUBJECTS ---
+def import_subjects(file_storage):
+    batches, error = read_csv_batches(file_storage, SUBJECT_COLUMNS)
+    if error:
+        return None, error
+    programs = _lookup_map(db.session.query(Program.id, Program.name))
+    codes = {code.lower() for (code,) in db.session.query(Subject.code)}
+
+    def validate_batch(batch):
+        rows, errors = [], []
+        for row_number, row in batch:
+            problems = _missing_fields(row, SUBJECT_COLUMNS)
+            code = row.get('code', '').lower()
+            if code and code in codes:
+                problems.append('subject code already exists')
+            if row.get('program') and row['program'].lower() not in programs:
+                problems.append('program not found')
+            if row.get('year_of_study') and not row['year_of_study'].isdigit():
+                problems.append('year_of_study must be a number')
+            if problems:
+                errors.append({'row': row_number, 'errors': problems})
+                continue
+            codes.add(code)
+            rows.append({'name': row['name'], 'code': row['code'], 'program_id': programs[row['program'].lower()],
+                         'year_of_study': int(row['year_of_study'])})
+        return rows, errors
+
+    result = run_import(batches, validate_batch, Subject)
+    if result['inserted']:
+        bump_version(SUBJECTS)
+        record_reset('subjects')
+    db.session.commit()
+    return result, None
+
+# --- TIMETABLE ---
+def _parse_time(value):
+    try:
+        return time.fromisoformat(value)
+    except ValueError:
+        return None
+
+def _describe_slot(slot):
+    when = slot.get('class_date') or slot['day_of_week']
+    return f"{slot['subject_name']} on {when} {slot['start_time']}-{slot['end_time']}"
+
+def import_schedules(file_storage, department_id, semester):
+    batches, error = read_csv_batches(file_storage, SCHEDULE_COLUMNS)
+    if error:
+        return None, error
+    subjects = {code.lower(): id_ for id_, code in db.session.query(Subject.id, Subject.code).join(Program).filter(Program.department_id == department_id)}
+    lecturers = {email.lower(): id_ for id_, email in db.session.query(User.id, User.email).filter_by(role='Lecturer', department_id=department_id)}
+    days = {day.lower(): day for day in DAYS_OF_WEEK}
+    # Every lecturer's existing slots for the semester, loaded once, so each row is checked
+    # for clashes with a bisection instead of a query
+    timetable = IntervalIndex(semester_slots(semester, list(lecturers.values())))
+
+    def validate_batch(batch):
+        rows, errors = [], []
+        for row_number, row in batch:
+            problems = _missing_fields(row, SCHEDULE_COLUMNS)
+            start_time, end_time = _parse_time(row.get('start_time', '')), _parse_time(row.get('end_time', ''))
+            if row.get('subject_code') and row['subject_code'].lower() not in subjects:
+                problems.append('subject not found in your department')
+            if row.get('lecturer_email') and row['lecturer_email'].lower() not in lecturers:
+                problems.append('lecturer not found in your department')
+            if row.get('day_of_week') and row['day_of_week'].lower() not in days:
+                problems.append('day_of_week must be a weekday name')
+            if (row.get('start_time') and not start_time) or (row.get('end_time') and not end_time):
+                problems.append('times must be HH:MM')
+            elif start_time and end_time and end_time <= start_time:
+                problems.append('end_time must be after start_time')
+            if not problems:
+                key = (lecturers[row['lecturer_email'].lower()], days[row['day_of_week'].lower()])
+                problems.extend(f"conflicts with {_describe_slot(slot)}" for slot in timetable.overlapping(key, start_time, end_time))
+            if problems:
+                errors.append({'row': row_number, 'errors': problems})
+                continue
+            timetable.add(key, start_time, end_time, {'subject_name': f"row {row_number}", 'day_of_week': key[1],
+                                                      'start_time': start_time.strftime('%H:%M'), 'end_time': end_time.strftime('%H:%M')})
+            rows.append({'subject_id': subjects[row['subject_code'].lower()], 'lecturer_id': lecturers[row['lecturer_email'].lower()],
+                         'semester_id': semester.id, 'day_of_week': days[row['day_of_week'].lower()],
+                         'start_time': start_time, 'end_time': end_time})
+        return rows, errors
+
+    result = run_import(batches, validate_batch, ClassSchedule)
+    if result['inserted']:
+        sync_semester_occurrences(semester)
+        record_reset('schedules', department_id)
+    db.session.commit()
+    return result, None
@@ -0,0 +1,128 @@
+# app/metrics.py
+import os
+import time
+from collections import Counter
+from flask import Blueprint, Response, current_app, g, has_app_context, request
+from prometheus_client import Counter as MetricCounter, REGISTRY, CONTENT_TYPE_LATEST, CollectorRegistry, Histogram, generate_latest, multiprocess
+from sqlalchemy import event
+
+# Per-endpoint request metrics in the Prometheus text format. Every request gets a tracker
+# in g that the engine events below feed with the statements it runs. Responses of unknown
+# length are recorded when they are closed, so streamed downloads are measured to the last byte.
+# Under gunicorn every worker counts its own requests; gunicorn.conf.py points
+# PROMETHEUS_MULTIPROC_DIR at a shared directory so whichever worker answers a scrape reports
+# the sum over all of them, including workers that have since been recycled.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+REQUEST_DURATION = Histogram('http_request_duration_seconds', 'Time from request start until the response body was sent.',
+                             ['endpoint', 'method', 'status'], buckets=LATENCY_BUCKETS)
+REQUEST_STATEMENTS = Histogram('http_request_sql_statements', 'SQL statements executed per request.',
+                               ['endpoint', 'method'], buckets=STATEMENT_BUCKETS)
+REQUEST_DB_TIME = MetricCounter('http_request_db_seconds', 'Time spent executing SQL statements.', ['endpoint', 'method'])
+RESPONSE_SIZE = Histogram('http_response_size_bytes', 'Response body size.', ['endpoint', 'method'], buckets=SIZE_BUCKETS)
+
+def render():
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+class RequestTracker:
+    def __init__(self, capture):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.db_time = 0.0
+        self.size = 0
+        self.captured = [] if capture else None
+
+    def add(self, statement, elapsed):
+        self.statements += 1
+        self.db_time += elapsed
+        if self.captured is not None:
+            self.captured.append((statement, elapsed))
+
+# --- ENGINE EVENTS ---
+# The start time rides on the statement's own execution context: after_cursor_execute never
+# fires for a statement that raises, so anything kept on the pooled connection would pile up
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.query_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'query_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    tracker = g.get('request_tracker') if has_app_context() else None
+    if tracker:
+        tracker.add(statement, elapsed)
+
+# --- REQUEST HOOKS ---
+def _start_request():
+    g.request_tracker = RequestTracker(capture=current_app.config['SLOW_REQUEST_MS'] > 0)
+
+def _counted(body, tracker):
+    try:
+        for chunk in body:
+            tracker.size += len(chunk)
+            yield chunk
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+
+def _finish_request(response):
+    tracker = g.get('request_tracker')
+    # Event streams stay open for as long as the client does, which says nothing about latency
+    if tracker is None or request.endpoint == 'metrics.metrics' or response.mimetype == 'text/event-stream':
+        return response
+    app = current_app._get_current_object()
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    method = request.method
+    if response.content_length is not None or response.direct_passthrough:
+        tracker.size = response.content_length or 0
+        _record(app, tracker, endpoint, method, response.status_code)
+    else:
+        response.response = _counted(response.response, tracker)
+        response.call_on_close(lambda: _record(app, tracker, endpoint, method, response.status_code))
+    return response
+
+def _record(app, tracker, endpoint, method, status):
+    elapsed = time.perf_counter() - tracker.started
+    REQUEST_DURATION.labels(endpoint, method, str(status)).observe(elapsed)
+    REQUEST_STATEMENTS.labels(endpoint, method).observe(tracker.statements)
+    REQUEST_DB_TIME.labels(endpoint, method).inc(tracker.db_time)
+    RESPONSE_SIZE.labels(endpoint, method).observe(tracker.size)
+    threshold = app.config['SLOW_REQUEST_MS']
+    if threshold > 0 and elapsed * 1000 >= threshold:
+        # Identical statements are folded together so an N+1 shows up as one line with a big count
+        counts, times = Counter(), Counter()
+        for statement, statement_time in tracker.captured:
+            counts[statement] += 1
+            times[statement] += statement_time
+        details = ''.join(f'\n  {counts[s]}x {times[s] * 1000:.1f} ms  {" ".join(s.split())}' for s, _ in counts.most_common())
+        app.logger.warning('Slow request %s %s -> %s: %.0f ms, %d statements, %.0f ms in the database%s',
+                           method, endpoint, status, elapsed * 1000, tracker.statements, tracker.db_time * 1000, details)
+
+# --- ENDPOINT ---
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    # Route names and latencies are not for the public: without METRICS_TOKEN nobody may scrape
+    token = current_app.config['METRICS_TOKEN']
+    if not token or request.headers.get('Authorization') != f'Bearer {token}':
+        return Response('Forbidden\n', status=403, mimetype='text/plain')
+    return Response(render(), mimetype=CONTENT_TYPE_LATEST)
+
+def init_metrics(app, db):
+    if not app.config['METRICS_ENABLED']:
+        return
+    app.register_blueprint(metrics_bp)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    for engine in db.engines.values():
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
@@ -1,6 +1,11 @@
 # app/models.py
+import json
 from . import db
-from datetime import datetime, timezone
+from datetime import datetime, date, timezone
+from sqlalchemy.orm import joinedload
+
+# Each model that follows relationships in to_dict() declares matching loader options;
+# list endpoints pass them to .options() so serializing N rows costs a constant number of queries.
 
 class Department(db.Model):
     __tablename__ = 'departments'
@@ -20,7 +25,12 @@ class User(db.Model):
     password = db.Column(db.String(256), nullable=False)
     role = db.Column(db.String(20), nullable=False)
     department_id = db.Column(db.Integer, db.ForeignKey('departments.id'), nullable=True)
+    __table_args__ = (db.Index('ix_user_role', 'role'),)
     
+    @classmethod
+    def to_dict_options(cls):
+        return (joinedload(cls.department),)
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -59,6 +69,10 @@ class Program(db.Model):
     department_id = db.Column(db.Integer, db.ForeignKey('departments.id'), nullable=False)
     duration_in_years = db.Column(db.Integer, nullable=False)
     
+    @classmethod
+    def to_dict_options(cls):
+        return (joinedload(cls.department),)
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -77,7 +91,12 @@ class Subject(db.Model):
     program_id = db.Column(db.Integer, db.ForeignKey('program.id'), nullable=False)
     program = db.relationship('Program', backref='subjects')
     year_of_study = db.Column(db.Integer, nullable=False, default=1)
+    __table_args__ = (db.Index('ix_subject_name', 'name'),)
     
+    @classmethod
+    def to_dict_options(cls):
+        return (joinedload(cls.program),)
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -100,7 +119,12 @@ class ClassSchedule(db.Model):
     subject = db.relationship('Subject')
     lecturer = db.relationship('User')
     semester = db.relationship('Semester')
+    __table_args__ = (db.Index('ix_class_schedule_semester_day', 'semester_id', 'day_of_week'),)
     
+    @classmethod
+    def to_dict_options(cls):
+        return (joinedload(cls.subject), joinedload(cls.lecturer))
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -114,18 +138,39 @@ class ClassSchedule(db.Model):
 class Attendance(db.Model):
     __tablename__ = 'attendance'
     id = db.Column(db.Integer, primary_key=True)
-    class_schedule_id = db.Column(db.Integer, db.ForeignKey('class_schedule.id'), nullable=False)
+    class_schedule_id = db.Column(db.Integer, db.ForeignKey('class_schedule.id'), nullable=True)
+    occurrence_id = db.Column(db.Integer, db.ForeignKey('class_occurrence.id'), nullable=True, index=True)
     cr_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     present = db.Column(db.Boolean, nullable=False)
     timestamp = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    attendance_date = db.Column(db.Date, nullable=False, default=date.today)
     verified = db.Column(db.Boolean, default=False)
+    # Random per bulk request, so a request can find the rows it wrote itself
+    submission_id = db.Column(db.String(32))
     excuse_comment = db.Column(db.Text)
     excuse_file = db.Column(db.String(300))
     excuse_uploaded_at = db.Column(db.DateTime)
+    # Set by the excuse pipeline (app/excuse_jobs.py): queued -> processing -> ready, rejected or failed
+    excuse_status = db.Column(db.String(10))
+    excuse_claimed_at = db.Column(db.DateTime)
+    excuse_pages = db.Column(db.Integer)
+    excuse_thumbnail = db.Column(db.String(100))
+    excuse_error = db.Column(db.String(255))
     schedule = db.relationship('ClassSchedule', backref='attendances')
+    occurrence = db.relationship('ClassOccurrence')
+    cr = db.relationship('User', foreign_keys=[cr_id])
+    __table_args__ = (
+        db.Index('ix_attendance_schedule_timestamp', 'class_schedule_id', 'timestamp'),
+        db.Index('ix_attendance_verified_timestamp', 'verified', 'timestamp'),
+        db.UniqueConstraint('occurrence_id', 'attendance_date', name='uq_attendance_occurrence_date'),
+    )
     
+    @classmethod
+    def to_dict_options(cls):
+        return (joinedload(cls.cr),)
+
     def to_dict(self):
-        cr_user = db.session.get(User, self.cr_id)
+        cr_user = self.cr
         return {
             'id': self.id,
             'present': self.present,
@@ -134,6 +179,10 @@ class Attendance(db.Model):
             'cr_name': cr_user.full_name if cr_user else 'N/A',
             'excuse_comment': self.excuse_comment,
             'excuse_file': self.excuse_file,
+            'excuse_status': self.excuse_status,
+            'excuse_pages': self.excuse_pages,
+            'excuse_thumbnail': self.excuse_thumbnail,
+            'excuse_error': self.excuse_error,
         }
         
 
@@ -153,7 +202,15 @@ class SpecialSchedule(db.Model):
     lecturer = db.relationship('User', foreign_keys=[lecturer_id])
     hod = db.relationship('User', foreign_keys=[creating_hod_id])
     target_department = db.relationship('Department')
+    __table_args__ = (
+        db.Index('ix_special_schedule_date_department', 'class_date', 'target_department_id'),
+        db.Index('ix_special_schedule_lecturer_date', 'lecturer_id', 'class_date'),
+    )
     
+    @classmethod
+    def to_dict_options(cls):
+        return (joinedload(cls.subject), joinedload(cls.lecturer))
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -162,4 +219,114 @@ class SpecialSchedule(db.Model):
             'class_date': self.class_date.isoformat(),
             'start_time': self.start_time.strftime('%H:%M'),
             'end_time': self.end_time.strftime('%H:%M')
-        }
\ No newline at end of file
+        }
+
+class ClassOccurrence(db.Model):
+    # One dated class: a weekly ClassSchedule expanded over the active semester, or a SpecialSchedule.
+    # Kept in sync by app/occurrences.py; CRs record attendance against these rows.
+    __tablename__ = 'class_occurrence'
+    id = db.Column(db.Integer, primary_key=True)
+    occurrence_key = db.Column(db.String(64), unique=True, nullable=False)
+    class_schedule_id = db.Column(db.Integer, db.ForeignKey('class_schedule.id'), nullable=True, index=True)
+    special_schedule_id = db.Column(db.Integer, db.ForeignKey('special_schedule.id'), nullable=True, index=True)
+    department_id = db.Column(db.Integer, db.ForeignKey('departments.id'), nullable=False)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False)
+    lecturer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    class_date = db.Column(db.Date, nullable=False)
+    start_time = db.Column(db.Time, nullable=False)
+    end_time = db.Column(db.Time, nullable=False)
+
+    subject = db.relationship('Subject')
+    lecturer = db.relationship('User')
+    schedule = db.relationship('ClassSchedule')
+    special_schedule = db.relationship('SpecialSchedule')
+    __table_args__ = (db.Index('ix_class_occurrence_department_date', 'department_id', 'class_date'),)
+
+    @classmethod
+    def to_dict_options(cls):
+        return (joinedload(cls.subject), joinedload(cls.lecturer))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'schedule_id': self.class_schedule_id or self.special_schedule_id,
+            'is_special': self.special_schedule_id is not None,
+            'subject_name': self.subject.name if self.subject else None,
+            'lecturer_name': self.lecturer.full_name if self.lecturer else None,
+            'class_date': self.class_date.isoformat(),
+            'start_time': self.start_time.strftime('%H:%M'),
+            'end_time': self.end_time.strftime('%H:%M')
+        }
+
+
+class CacheVersion(db.Model):
+    __tablename__ = 'cache_version'
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class AttendanceRollup(db.Model):
+    # Per-lecturer, per-day attendance counts that reports read instead of raw Attendance rows.
+    # Maintained incrementally by app/rollups.py; `flask rollup rebuild` recomputes it.
+    __tablename__ = 'attendance_rollup'
+    id = db.Column(db.Integer, primary_key=True)
+    lecturer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    recorded = db.Column(db.Integer, nullable=False, default=0)
+    present = db.Column(db.Integer, nullable=False, default=0)
+    absent = db.Column(db.Integer, nullable=False, default=0)
+    verified = db.Column(db.Integer, nullable=False, default=0)
+    verified_present = db.Column(db.Integer, nullable=False, default=0)
+    __table_args__ = (
+        db.UniqueConstraint('lecturer_id', 'day', name='uq_attendance_rollup_lecturer_day'),
+        db.Index('ix_attendance_rollup_day', 'day'),
+    )
+
+
+class ReportJob(db.Model):
+    # A queued report. The table doubles as the job queue and as the result cache: a job is
+    # reused for any later request with the same fingerprint (kind + filters) and data stamp.
+    __tablename__ = 'report_job'
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)
+    filters = db.Column(db.Text, nullable=False)
+    fingerprint = db.Column(db.String(64), nullable=False)
+    data_stamp = db.Column(db.String(200), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    requested_by = db.Column(db.String(150))
+    error = db.Column(db.Text)
+    result_file = db.Column(db.String(300))
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    __table_args__ = (
+        db.Index('ix_report_job_fingerprint_stamp', 'fingerprint', 'data_stamp'),
+        db.Index('ix_report_job_status', 'status'),
+    )
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'filters': json.loads(self.filters),
+            'status': self.status,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class ChangeLog(db.Model):
+    # One row per insert, update or delete of a tracked model, in commit-ish order; the id is
+    # the cursor clients sync from. Written by app/changes.py, read by GET /api/changes.
+    __tablename__ = 'change_log'
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(30), nullable=False)
+    entity_id = db.Column(db.Integer)
+    action = db.Column(db.String(10), nullable=False)
+    department_id = db.Column(db.Integer)
+    lecturer_id = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    # Ids must never be reused, or a client could skip changes; AUTOINCREMENT makes SQLite agree
+    __table_args__ = (db.Index('ix_change_log_created_at', 'created_at'), {'sqlite_autoincrement': True})
@@ -0,0 +1,123 @@
+# app/occurrences.py
+from datetime import timedelta
+from sqlalchemy import select, insert, update, delete, exists, cast, literal, String
+from .models import db, Semester, Subject, Program, ClassSchedule, SpecialSchedule, ClassOccurrence, Attendance
+
+DAYS_OF_WEEK = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+SYNCED_FIELDS = ('department_id', 'subject_id', 'lecturer_id', 'start_time', 'end_time')
+
+def weekly_occurrence_key(schedule_id, class_date):
+    return f"weekly:{schedule_id}:{class_date.isoformat()}"
+
+def special_occurrence_key(special_id):
+    return f"special:{special_id}"
+
+def weekly_dates(day_of_week, start_date, end_date):
+    if day_of_week not in DAYS_OF_WEEK:
+        return
+    class_date = start_date + timedelta(days=(DAYS_OF_WEEK.index(day_of_week) - start_date.weekday()) % 7)
+    while class_date <= end_date:
+        yield class_date
+        class_date += timedelta(days=7)
+
+def _weekly_rows(schedule, department_id, semester):
+    return [{
+        'occurrence_key': weekly_occurrence_key(schedule.id, class_date),
+        'class_schedule_id': schedule.id,
+        'department_id': department_id,
+        'subject_id': schedule.subject_id,
+        'lecturer_id': schedule.lecturer_id,
+        'class_date': class_date,
+        'start_time': schedule.start_time,
+        'end_time': schedule.end_time,
+    } for class_date in weekly_dates(schedule.day_of_week, semester.start_date, semester.end_date)]
+
+def _special_row(special):
+    return {
+        'occurrence_key': special_occurrence_key(special.id),
+        'special_schedule_id': special.id,
+        'department_id': special.target_department_id,
+        'subject_id': special.subject_id,
+        'lecturer_id': special.lecturer_id,
+        'class_date': special.class_date,
+        'start_time': special.start_time,
+        'end_time': special.end_time,
+    }
+
+def _delete_unrecorded(occurrence_filter):
+    # Occurrences that already carry attendance are history and are never removed
+    recorded = exists().where(Attendance.occurrence_id == ClassOccurrence.id)
+    db.session.execute(delete(ClassOccurrence).where(occurrence_filter, ~recorded))
+
+# --- SYNC HOOKS (called in the same transaction as the schedule change) ---
+def add_weekly_schedule_occurrences(schedule):
+    semester = db.session.get(Semester, schedule.semester_id)
+    department_id = db.session.execute(
+        select(Program.department_id).join(Subject, Subject.program_id == Program.id).where(Subject.id == schedule.subject_id)
+    ).scalar()
+    rows = _weekly_rows(schedule, department_id, semester)
+    if rows:
+        db.session.execute(insert(ClassOccurrence), rows)
+
+def _detach(occurrence_filter):
+    # Recorded occurrences outlive their schedule: they keep their subject, lecturer and date
+    # but drop the reference, and a key of their own so a reused schedule id cannot clash
+    db.session.execute(update(ClassOccurrence).where(occurrence_filter).values(
+        class_schedule_id=None, special_schedule_id=None,
+        occurrence_key=literal('detached:') + cast(ClassOccurrence.id, String)
+    ))
+
+def remove_weekly_schedule_occurrences(schedule_id):
+    # Called before the schedule itself is deleted
+    _delete_unrecorded(ClassOccurrence.class_schedule_id == schedule_id)
+    _detach(ClassOccurrence.class_schedule_id == schedule_id)
+
+def add_special_schedule_occurrence(special):
+    db.session.execute(insert(ClassOccurrence), [_special_row(special)])
+
+def remove_special_schedule_occurrence(special_id):
+    _delete_unrecorded(ClassOccurrence.special_schedule_id == special_id)
+    _detach(ClassOccurrence.special_schedule_id == special_id)
+
+def sync_semester_occurrences(semester):
+    # Brings the semester's weekly occurrences in line with its timetable and dates:
+    # inserts missing ones, refreshes changed ones and drops unrecorded ones that no longer apply.
+    schedules = db.session.execute(
+        select(ClassSchedule, Program.department_id).join(Subject, Subject.id == ClassSchedule.subject_id)
+        .join(Program, Program.id == Subject.program_id).where(ClassSchedule.semester_id == semester.id)
+    ).all()
+    desired = {}
+    for schedule, department_id in schedules:
+        for row in _weekly_rows(schedule, department_id, semester):
+            desired[row['occurrence_key']] = row
+
+    existing = db.session.execute(
+        select(ClassOccurrence.id, ClassOccurrence.occurrence_key, *[getattr(ClassOccurrence, f) for f in SYNCED_FIELDS])
+        .join(ClassSchedule, ClassSchedule.id == ClassOccurrence.class_schedule_id).where(ClassSchedule.semester_id == semester.id)
+    ).all()
+    stale_ids = []
+    changed = []
+    for occurrence in existing:
+        row = desired.pop(occurrence.occurrence_key, None)
+        if row is None:
+            stale_ids.append(occurrence.id)
+        elif any(getattr(occurrence, f) != row[f] for f in SYNCED_FIELDS):
+            changed.append({'id': occurrence.id, **{f: row[f] for f in SYNCED_FIELDS}})
+
+    if desired:
+        db.session.execute(insert(ClassOccurrence), list(desired.values()))
+    if changed:
+        db.session.execute(update(ClassOccurrence), changed)
+    if stale_ids:
+        _delete_unrecorded(ClassOccurrence.id.in_(stale_ids))
+
+def remove_semester_occurrences(semester):
+    # A semester that is no longer active has no upcoming classes; recorded ones stay as history
+    _delete_unrecorded(ClassOccurrence.class_schedule_id.in_(select(ClassSchedule.id).where(ClassSchedule.semester_id == semester.id)))
+
+def sync_special_occurrences():
+    missing = SpecialSchedule.query.outerjoin(
+        ClassOccurrence, ClassOccurrence.special_schedule_id == SpecialSchedule.id
+    ).filter(ClassOccurrence.id.is_(None)).all()
+    if missing:
+        db.session.execute(insert(ClassOccurrence), [_special_row(special) for special in missing])
@@ -0,0 +1,72 @@
+# app/pagination.py
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from flask import request, jsonify
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+class BadPageRequest(Exception):
+    pass
+
+def wants_page():
+    # List endpoints keep returning a plain array unless the client asks for pages
+    return 'limit' in request.args or 'cursor' in request.args
+
+def encode_cursor(values):
+    raw = json.dumps([v.isoformat() if isinstance(v, (date, datetime)) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, columns):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError
+        return [c.type.python_type.fromisoformat(v) if c.type.python_type in (date, datetime) else v
+                for c, v in zip(columns, values)]
+    except (ValueError, TypeError, binascii.Error):
+        raise BadPageRequest('Invalid cursor')
+
+def page_size():
+    try:
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise BadPageRequest('limit must be a number')
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def _after(columns, values, descending):
+    # (a, b) > (x, y) spelled out as a > x OR (a = x AND b > y), which every backend can
+    # turn into an index range scan
+    column, value = columns[0], values[0]
+    past = column < value if descending else column > value
+    if len(columns) == 1:
+        return past
+    return or_(past, and_(column == value, _after(columns[1:], values[1:], descending)))
+
+def keyset_page(query, columns, descending=False):
+    # Seeks past the last row of the previous page on an ordered, unique column tuple,
+    # so every page costs one index range scan however deep the client has paged.
+    limit = page_size()
+    cursor = request.args.get('cursor')
+    if cursor:
+        query = query.filter(_after(columns, decode_cursor(cursor, columns), descending))
+    query = query.order_by(*[c.desc() if descending else c for c in columns])
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], c.key) for c in columns])
+    return rows, next_cursor
+
+def list_response(query, columns, serialize, descending=False):
+    try:
+        if wants_page():
+            rows, next_cursor = keyset_page(query, columns, descending)
+            return jsonify({'items': [serialize(row) for row in rows], 'next_cursor': next_cursor})
+    except BadPageRequest as error:
+        return jsonify({'msg': str(error)}), 400
+    rows = query.order_by(*[c.desc() if descending else c for c in columns]).all()
+    return jsonify([serialize(row) for row in rows])
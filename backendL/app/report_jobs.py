@@ -0,0 +1,189 @@
+# app/report_jobs.py
+import hashlib
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import or_, update
+from .models import db, ReportJob
+from .reports import get_report_data, get_row_export_query, stream_rows_csv, summary_csv, attendance_stamp
+from .routing import replica_reads
+
+# Reports run on a small pool of background threads instead of inside the request. The
+# report_job table is the queue: a request inserts a queued row and hands its id to the
+# pool, and `flask reports work` drains anything left queued (for example after a restart).
+# A job queued or running for longer than REPORT_JOB_TIMEOUT_SECONDS is taken to be lost with
+# the process that held it: it is no longer handed out, and `flask reports work` runs it again.
+REPORT_KINDS = {
+    'summary': '.json',
+    'summary-csv': '.csv',
+    'rows-csv': '.csv',
+}
+FILTER_KEYS = ('start_date', 'end_date', 'department_id')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_job_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=current_app.config['REPORT_JOB_WORKERS'], thread_name_prefix='report-job')
+    return _executor
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _stale_before():
+    return _now() - timedelta(seconds=current_app.config['REPORT_JOB_TIMEOUT_SECONDS'])
+
+def _result_exists(job):
+    return os.path.exists(os.path.join(current_app.config['REPORT_FOLDER'], job.result_file or ''))
+
+def normalize_filters(filters):
+    return {key: str(filters[key]) for key in FILTER_KEYS if filters.get(key) not in (None, '')}
+
+def job_fingerprint(kind, filters):
+    return hashlib.sha256(json.dumps([kind, filters], sort_keys=True).encode()).hexdigest()
+
+def validate_job(kind, filters):
+    if kind not in REPORT_KINDS:
+        return f"kind must be one of {', '.join(REPORT_KINDS)}"
+    if kind != 'rows-csv' and not all(filters.get(key) for key in FILTER_KEYS):
+        return "Missing required report filters"
+    # Building the row query checks the period and the department without running anything
+    _, error = get_row_export_query(filters)
+    return error
+
+# --- SUBMISSION ---
+def submit_report_job(kind, filters, requested_by):
+    filters = normalize_filters(filters)
+    error = validate_job(kind, filters)
+    if error:
+        return None, error
+    fingerprint = job_fingerprint(kind, filters)
+    data_stamp = attendance_stamp(filters)
+    # An identical report over unchanged data is served from the job that already built it,
+    # or that is still building it, as long as that job has not been lost
+    stale_before = _stale_before()
+    candidates = ReportJob.query.filter(
+        ReportJob.fingerprint == fingerprint, ReportJob.data_stamp == data_stamp,
+        or_(ReportJob.status == 'done',
+            (ReportJob.status == 'queued') & (ReportJob.created_at >= stale_before),
+            (ReportJob.status == 'running') & (ReportJob.started_at >= stale_before))
+    ).order_by(ReportJob.created_at.desc()).all()
+    for existing in candidates:
+        if existing.status != 'done' or _result_exists(existing):
+            return existing, None
+    job = ReportJob(id=uuid.uuid4().hex, kind=kind, filters=json.dumps(filters), fingerprint=fingerprint,
+                    data_stamp=data_stamp, requested_by=requested_by)
+    db.session.add(job)
+    db.session.commit()
+    get_job_executor().submit(run_job, current_app._get_current_object(), job.id)
+    return job, None
+
+# --- EXECUTION ---
+def _write_result(job, path):
+    filters = json.loads(job.filters)
+    with open(path, 'w', newline='', encoding='utf-8') as output:
+        if job.kind == 'rows-csv':
+            query, error = get_row_export_query(filters)
+            if error:
+                raise ValueError(error)
+            for chunk in stream_rows_csv(query):
+                output.write(chunk)
+            return
+        report_data, error = get_report_data(filters)
+        if error:
+            raise ValueError(error)
+        output.write(summary_csv(report_data) if job.kind == 'summary-csv' else json.dumps(report_data))
+
+def run_job(app, job_id):
+    with app.app_context():
+        try:
+            # Claim the job; another worker may have taken it already
+            started_at = _now().replace(microsecond=0)
+            claimed = db.session.execute(
+                update(ReportJob).where(ReportJob.id == job_id, ReportJob.status == 'queued').values(status='running', started_at=started_at)
+            ).rowcount
+            db.session.commit()
+            if not claimed:
+                return
+            job = db.session.get(ReportJob, job_id)
+            result_file = f"{job.id}{REPORT_KINDS[job.kind]}"
+            os.makedirs(app.config['REPORT_FOLDER'], exist_ok=True)
+            path = os.path.join(app.config['REPORT_FOLDER'], result_file)
+            # Unique per run: a job requeued as stale may still be finishing somewhere else
+            part = f'{path}.{uuid.uuid4().hex}.part'
+            values = {'finished_at': _now()}
+            try:
+                with replica_reads(db.session):
+                    _write_result(job, part)
+                os.replace(part, path)
+            except Exception as error:
+                db.session.rollback()
+                if os.path.exists(part):
+                    os.remove(part)
+                values.update(status='failed', error=str(error))
+                app.logger.exception('Report job %s failed', job_id)
+            else:
+                values.update(status='done', result_file=result_file)
+            # Only while this run still holds the claim
+            db.session.execute(
+                update(ReportJob).where(ReportJob.id == job_id, ReportJob.status == 'running', ReportJob.started_at == started_at)
+                .values(**values).execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            if values['status'] == 'done':
+                prune_report_jobs(app.config['REPORT_RESULT_GRACE_SECONDS'])
+                db.session.commit()
+        finally:
+            db.session.remove()
+
+# --- CLEANUP ---
+def prune_report_jobs(grace_seconds):
+    # A newer result makes older ones for the same report unreachable for new requests, but a
+    # client may still be polling or downloading one, so each is kept for grace_seconds after
+    # the result that replaced it was finished. Failed jobs go after the same grace period.
+    cutoff = _now() - timedelta(seconds=grace_seconds)
+    jobs = ReportJob.query.filter(ReportJob.status.in_(['done', 'failed']), ReportJob.finished_at.isnot(None)).order_by(
+        ReportJob.fingerprint, ReportJob.finished_at.desc()
+    ).all()
+    expired = []
+    replaced_at = {}
+    for job in jobs:
+        if job.status == 'failed':
+            if job.finished_at < cutoff:
+                expired.append(job)
+            continue
+        # Newest first, so the done job seen before this one is the result that replaced it
+        if job.fingerprint in replaced_at and replaced_at[job.fingerprint] < cutoff:
+            expired.append(job)
+        replaced_at[job.fingerprint] = job.finished_at
+    for job in expired:
+        if job.result_file:
+            try:
+                os.remove(os.path.join(current_app.config['REPORT_FOLDER'], job.result_file))
+            except FileNotFoundError:
+                pass
+    if expired:
+        ReportJob.query.filter(ReportJob.id.in_([job.id for job in expired])).delete(synchronize_session=False)
+    return len(expired)
+
+def run_queued_jobs():
+    app = current_app._get_current_object()
+    # Running jobs whose claim has gone stale were lost with their worker
+    requeued = db.session.execute(
+        update(ReportJob).where(ReportJob.status == 'running', ReportJob.started_at < _stale_before())
+        .values(status='queued', started_at=None).execution_options(synchronize_session=False)
+    ).rowcount
+    if requeued:
+        app.logger.warning('Requeued %s stale report jobs', requeued)
+    db.session.commit()
+    job_ids = [job_id for (job_id,) in db.session.query(ReportJob.id).filter_by(status='queued').order_by(ReportJob.created_at)]
+    for job_id in job_ids:
+        run_job(app, job_id)
+    return len(job_ids)
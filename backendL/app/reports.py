@@ -0,0 +1,288 @@
+# app/reports.py
+import csv
+import io
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, time
+from flask import current_app, g
+from sqlalchemy import select, func
+from sqlalchemy.orm import aliased
+from .models import db, Attendance, AttendanceRollup, ClassOccurrence, ClassSchedule, User, Subject, Department
+from .cache import get_versions, DEPARTMENTS, SUBJECTS, USERS
+
+ALL_DEPARTMENTS = 'all'
+ROW_EXPORT_CHUNK_SIZE = 1000
+ROW_EXPORT_HEADER = ['Date', 'Subject', 'Lecturer', 'CR', 'Present', 'Verified']
+
+def parse_period(start_date_str, end_date_str):
+    try:
+        return date.fromisoformat(start_date_str), date.fromisoformat(end_date_str)
+    except (TypeError, ValueError):
+        return None, None
+
+# --- AGGREGATION ENGINE ---
+def unlinked_marks(department_id, start_date, end_date):
+    # Marks detached from their class by migrations 0004 and 0005 (repeat submissions and legacy
+    # rows that matched no class) are left out of the rollup the totals come from; reports say
+    # how many there were. A department's are found through the weekly schedule's lecturer.
+    query = db.session.query(func.count(Attendance.id)).filter(
+        Attendance.occurrence_id.is_(None),
+        Attendance.attendance_date >= start_date,
+        Attendance.attendance_date <= end_date
+    )
+    if department_id is not None:
+        query = query.join(ClassSchedule, ClassSchedule.id == Attendance.class_schedule_id).join(
+            User, User.id == ClassSchedule.lecturer_id
+        ).filter(User.department_id == department_id)
+    return query.scalar()
+
+def lecturer_totals(department_ids, start_date, end_date):
+    # One row per lecturer: (department_id, id, name, total_classes, classes_attended), summed
+    # from the daily rollup in a single grouped query; department_ids=None covers every department
+    query = db.session.query(
+        User.department_id, User.id, User.full_name, func.sum(AttendanceRollup.verified), func.sum(AttendanceRollup.verified_present)
+    ).select_from(AttendanceRollup).join(
+        User, User.id == AttendanceRollup.lecturer_id
+    ).filter(
+        AttendanceRollup.day >= start_date,
+        AttendanceRollup.day <= end_date
+    )
+    if department_ids is not None:
+        query = query.filter(User.department_id.in_(department_ids))
+    return query.group_by(User.department_id, User.id, User.full_name).having(
+        func.sum(AttendanceRollup.verified) > 0
+    ).order_by(User.full_name, User.id).all()
+
+def parallel_lecturer_totals(department_ids, start_date, end_date, workers):
+    # One query per department spread over a thread pool, each on its own connection; only
+    # worth it when the departments live on different databases or replicas
+    app = current_app._get_current_object()
+    replica = g.get('read_replica')
+
+    def department_totals(department_id):
+        with app.app_context():
+            g.read_replica = replica
+            try:
+                return lecturer_totals([department_id], start_date, end_date)
+            finally:
+                db.session.remove()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='report-department') as pool:
+        return [row for rows in pool.map(department_totals, department_ids) for row in rows]
+
+def build_breakdown(rows):
+    detailed_breakdown = []
+    for department_id, lecturer_id, lecturer_name, total, attended in rows:
+        total = int(total or 0)
+        attended = int(attended or 0)
+        rate = (attended / total * 100) if total > 0 else 0
+        detailed_breakdown.append({
+            'lecturer_name': lecturer_name,
+            'total_classes': total,
+            'classes_attended': attended,
+            'classes_missed': total - attended,
+            'attendance_rate': round(rate, 2)
+        })
+    return detailed_breakdown
+
+def build_highlights(detailed_breakdown):
+    highlights = {
+        'most_present_lecturer': None,
+        'highest_absence_lecturer': None
+    }
+    if detailed_breakdown:
+        most_present = max(detailed_breakdown, key=lambda x: x['classes_attended'])
+        highlights['most_present_lecturer'] = f"{most_present['lecturer_name']} ({most_present['classes_attended']} classes)"
+
+        highest_absence = max(detailed_breakdown, key=lambda x: (x['classes_missed'] / x['total_classes'] if x['total_classes'] > 0 else 0))
+        highlights['highest_absence_lecturer'] = f"{highest_absence['lecturer_name']} ({highest_absence['classes_missed']} missed)"
+    return highlights
+
+def build_summary(name, period, detailed_breakdown):
+    total_classes = sum(item['total_classes'] for item in detailed_breakdown)
+    total_present = sum(item['classes_attended'] for item in detailed_breakdown)
+    overall_attendance_rate = (total_present / total_classes * 100) if total_classes > 0 else 0
+    return {
+        'department_name': name,
+        'period': period,
+        'total_classes_recorded': total_classes,
+        'overall_attendance_rate': round(overall_attendance_rate, 2)
+    }
+
+def get_report_data(filters):
+    start_date_str = filters.get('start_date')
+    end_date_str = filters.get('end_date')
+    department_id = filters.get('department_id')
+    if not all([start_date_str, end_date_str, department_id]):
+        return None, "Missing required report filters"
+    start_date, end_date = parse_period(start_date_str, end_date_str)
+    if not start_date:
+        return None, "Dates must be YYYY-MM-DD"
+    period = f"{start_date_str} to {end_date_str}"
+    if str(department_id) == ALL_DEPARTMENTS:
+        return get_institution_report_data(start_date, end_date, period), None
+    department = db.session.get(Department, int(department_id))
+    if not department:
+        return None, "Department not found"
+
+    detailed_breakdown = build_breakdown(lecturer_totals([department.id], start_date, end_date))
+    final_report = {
+        'summary': build_summary(department.name, period, detailed_breakdown),
+        'breakdown': sorted(detailed_breakdown, key=lambda x: x['lecturer_name']),
+        'highlights': build_highlights(detailed_breakdown),
+        'unlinked_records': unlinked_marks(department.id, start_date, end_date)
+    }
+    return final_report, None
+
+def get_institution_report_data(start_date, end_date, period):
+    # Every department from one grouped query (or one query per department in parallel when
+    # REPORT_DEPARTMENT_WORKERS is set). The top level has the same shape as a department report,
+    # covering all lecturers, with the per-department reports under 'departments'.
+    departments = Department.query.order_by(Department.name).all()
+    workers = current_app.config['REPORT_DEPARTMENT_WORKERS']
+    if workers > 1 and len(departments) > 1:
+        rows = parallel_lecturer_totals([d.id for d in departments], start_date, end_date, workers)
+    else:
+        rows = lecturer_totals(None, start_date, end_date)
+    rows_by_department = {}
+    for row in rows:
+        rows_by_department.setdefault(row[0], []).append(row)
+
+    department_reports = []
+    institution_breakdown = []
+    for department in departments:
+        detailed_breakdown = sorted(build_breakdown(rows_by_department.get(department.id, [])), key=lambda x: x['lecturer_name'])
+        department_reports.append({
+            'department_id': department.id,
+            'summary': build_summary(department.name, period, detailed_breakdown),
+            'breakdown': detailed_breakdown,
+            'highlights': build_highlights(detailed_breakdown)
+        })
+        institution_breakdown.extend(dict(item, department_name=department.name) for item in detailed_breakdown)
+
+    return {
+        'summary': build_summary('All departments', period, institution_breakdown),
+        'breakdown': sorted(institution_breakdown, key=lambda x: x['lecturer_name']),
+        'highlights': build_highlights(institution_breakdown),
+        'unlinked_records': unlinked_marks(None, start_date, end_date),
+        'departments': department_reports
+    }
+
+def summary_csv(report_data):
+    summary = report_data['summary']
+    breakdown = report_data['breakdown']
+    highlights = report_data['highlights']
+    
+    output = io.StringIO()
+    writer = csv.writer(output)
+    
+    writer.writerow(['Lecturer Attendance Report'])
+    writer.writerow(['Department:', summary['department_name']])
+    writer.writerow(['Period:', summary['period']])
+    if report_data.get('unlinked_records'):
+        writer.writerow(['Records not linked to a class (not counted):', report_data['unlinked_records']])
+    writer.writerow([])
+    writer.writerow(['STATISTICAL HIGHLIGHTS'])
+    writer.writerow(['Most Present:', highlights.get('most_present_lecturer', 'N/A')])
+    writer.writerow(['Most Absences:', highlights.get('highest_absence_lecturer', 'N/A')])
+    writer.writerow([])
+    # Institution reports add a per-department summary and a department column
+    departments = report_data.get('departments')
+    if departments is not None:
+        writer.writerow(['DEPARTMENT SUMMARY'])
+        writer.writerow(['Department', 'Total Classes', 'Attendance Rate (%)'])
+        for department in departments:
+            writer.writerow([
+                department['summary']['department_name'],
+                department['summary']['total_classes_recorded'],
+                department['summary']['overall_attendance_rate']
+            ])
+        writer.writerow([])
+    writer.writerow(['DETAILED BREAKDOWN'])
+    writer.writerow((['Department'] if departments is not None else []) + ['Lecturer Name', 'Attended', 'Missed', 'Total Classes', 'Attendance Rate (%)'])
+    
+    for item in breakdown:
+        writer.writerow(([item['department_name']] if departments is not None else []) + [
+            item['lecturer_name'],
+            item['classes_attended'],
+            item['classes_missed'],
+            item['total_classes'],
+            item['attendance_rate']
+        ])
+    return output.getvalue()
+
+def summary_csv_filename(report_data):
+    return f"attendance_report_{report_data['summary']['department_name'].replace(' ', '_')}.csv"
+
+# --- ROW-LEVEL EXPORT ---
+def get_row_export_query(filters):
+    start_date_str = filters.get('start_date')
+    end_date_str = filters.get('end_date')
+    department_id = filters.get('department_id')
+    if not all([start_date_str, end_date_str]):
+        return None, "Missing required report filters"
+    start_date, end_date = parse_period(start_date_str, end_date_str)
+    if not start_date:
+        return None, "Dates must be YYYY-MM-DD"
+
+    lecturer = aliased(User)
+    cr = aliased(User)
+    # Every record is exported; one detached from its class (migrations 0004 and 0005) takes its
+    # subject and lecturer from the weekly schedule it was recorded against, if that still exists
+    query = select(
+        Attendance.timestamp, Subject.name, lecturer.full_name, cr.full_name, Attendance.present, Attendance.verified
+    ).select_from(Attendance).outerjoin(
+        ClassOccurrence, Attendance.occurrence_id == ClassOccurrence.id
+    ).outerjoin(
+        ClassSchedule, ClassSchedule.id == Attendance.class_schedule_id
+    ).outerjoin(
+        Subject, Subject.id == func.coalesce(ClassOccurrence.subject_id, ClassSchedule.subject_id)
+    ).outerjoin(
+        lecturer, lecturer.id == func.coalesce(ClassOccurrence.lecturer_id, ClassSchedule.lecturer_id)
+    ).join(
+        cr, cr.id == Attendance.cr_id
+    ).filter(
+        Attendance.timestamp >= start_date,
+        Attendance.timestamp <= datetime.combine(end_date, time.max)
+    )
+    if department_id and str(department_id) != ALL_DEPARTMENTS:
+        department = db.session.get(Department, int(department_id))
+        if not department:
+            return None, "Department not found"
+        query = query.filter(lecturer.department_id == department.id)
+    query = query.order_by(Attendance.timestamp, Attendance.id).execution_options(yield_per=ROW_EXPORT_CHUNK_SIZE)
+    return query, None
+
+def stream_rows_csv(query):
+    # Server-side cursor: rows arrive ROW_EXPORT_CHUNK_SIZE at a time and each chunk is flushed as one CSV piece
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(ROW_EXPORT_HEADER)
+    yield output.getvalue()
+    for partition in db.session.execute(query).partitions():
+        output.seek(0)
+        output.truncate(0)
+        for timestamp, subject_name, lecturer_name, cr_name, present, verified in partition:
+            writer.writerow([
+                timestamp.date().isoformat() if timestamp else '',
+                subject_name or '',
+                lecturer_name or '',
+                cr_name,
+                'Yes' if present else 'No',
+                'Yes' if verified else 'No'
+            ])
+        yield output.getvalue()
+
+# --- DATA STAMP ---
+def attendance_stamp(filters):
+    # Changes whenever attendance inside the report's period is recorded or verified (the rollup
+    # counters only grow), or when the names and departments a report shows are edited.
+    start_date, end_date = parse_period(filters.get('start_date'), filters.get('end_date'))
+    query = db.session.query(
+        func.count(AttendanceRollup.id), func.sum(AttendanceRollup.recorded),
+        func.sum(AttendanceRollup.present), func.sum(AttendanceRollup.verified), func.sum(AttendanceRollup.verified_present)
+    ).filter(AttendanceRollup.day >= start_date, AttendanceRollup.day <= end_date)
+    if filters.get('department_id') and str(filters['department_id']) != ALL_DEPARTMENTS:
+        query = query.join(User, User.id == AttendanceRollup.lecturer_id).filter(User.department_id == int(filters['department_id']))
+    totals = ':'.join(str(int(value or 0)) for value in query.one())
+    versions = get_versions([DEPARTMENTS, SUBJECTS, USERS])
+    return f"{totals}|" + ':'.join(str(versions[name]) for name in sorted(versions))
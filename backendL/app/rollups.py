@@ -0,0 +1,48 @@
+# app/rollups.py
+from collections import Counter
+from sqlalchemy import select, insert, delete, func, case
+from .models import db, Attendance, ClassOccurrence, AttendanceRollup
+from .dialects import upsert_increment
+
+ROLLUP_KEYS = ['lecturer_id', 'day']
+ROLLUP_COUNTERS = ['recorded', 'present', 'absent', 'verified', 'verified_present']
+
+def _apply(deltas):
+    if not deltas:
+        return
+    rows = [{'lecturer_id': lecturer_id, 'day': day, **{c: counts.get(c, 0) for c in ROLLUP_COUNTERS}}
+            for (lecturer_id, day), counts in deltas.items()]
+    upsert_increment(AttendanceRollup, ROLLUP_KEYS, ROLLUP_COUNTERS, rows)
+
+# --- INCREMENTAL UPDATES (called in the same transaction as the attendance change) ---
+def record_marks(marks):
+    # marks: (lecturer_id, day, present) for newly inserted attendance rows
+    deltas = {}
+    for lecturer_id, day, present in marks:
+        counts = deltas.setdefault((lecturer_id, day), Counter())
+        counts['recorded'] += 1
+        counts['present' if present else 'absent'] += 1
+    _apply(deltas)
+
+def record_verifications(marks):
+    # marks: (lecturer_id, day, present) for rows that just went from unverified to verified
+    deltas = {}
+    for lecturer_id, day, present in marks:
+        counts = deltas.setdefault((lecturer_id, day), Counter())
+        counts['verified'] += 1
+        counts['verified_present'] += 1 if present else 0
+    _apply(deltas)
+
+# --- REBUILD ---
+def rebuild_rollup():
+    def count_if(condition):
+        return func.sum(case((condition, 1), else_=0))
+    source = select(
+        ClassOccurrence.lecturer_id, Attendance.attendance_date, func.count(Attendance.id),
+        count_if(Attendance.present == True), count_if(Attendance.present == False),
+        count_if(Attendance.verified == True), count_if((Attendance.verified == True) & (Attendance.present == True))
+    ).join(ClassOccurrence, Attendance.occurrence_id == ClassOccurrence.id).group_by(
+        ClassOccurrence.lecturer_id, Attendance.attendance_date
+    )
+    db.session.execute(delete(AttendanceRollup))
+    db.session.execute(insert(AttendanceRollup).from_select(ROLLUP_KEYS + ROLLUP_COUNTERS, source))
@@ -1,21 +1,27 @@
 # app/routes/admin.py
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt
-from werkzeug.security import generate_password_hash
 from datetime import date
 from ..models import db, Department, Semester, Program, Subject, User, ClassSchedule, Attendance
 from sqlalchemy.exc import IntegrityError
+from ..cache import bump_version, get_active_semester, conditional_response, SEMESTER, DEPARTMENTS, PROGRAMS, SUBJECTS, USERS
+from ..occurrences import sync_semester_occurrences, remove_semester_occurrences
+from ..imports import import_users, import_subjects
+from ..hashing import hash_password, HashPoolBusy
+from ..pagination import list_response
+from ..routing import read_replica
+from ..changes import record_changes
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
 # --- DEPARTMENT ROUTES ---
 @admin_bp.route('/departments', methods=['GET'])
 @jwt_required()
+@read_replica('GET')
 def get_departments():
     claims = get_jwt()
     if claims.get('role') != 'Admin': return jsonify({'msg': 'Forbidden'}), 403
-    departments = Department.query.order_by(Department.name).all()
-    return jsonify([d.to_dict() for d in departments])
+    return conditional_response([DEPARTMENTS], lambda: jsonify([d.to_dict() for d in Department.query.order_by(Department.name)]))
 
 @admin_bp.route('/departments', methods=['POST'])
 @jwt_required()
@@ -26,6 +32,7 @@ def create_department():
     new_department = Department(name=data['name'])
     try:
         db.session.add(new_department)
+        bump_version(DEPARTMENTS)
         db.session.commit()
     except IntegrityError:
         db.session.rollback()
@@ -42,6 +49,7 @@ def manage_single_department(department_id):
     if request.method == 'PUT':
         data = request.json
         department.name = data.get('name', department.name)
+        bump_version(DEPARTMENTS)
         try:
             db.session.commit()
         except IntegrityError:
@@ -52,23 +60,26 @@ def manage_single_department(department_id):
         if department.programs or department.users:
             return jsonify({'msg': 'Cannot delete: Department has programs or users'}), 400
         db.session.delete(department)
+        bump_version(DEPARTMENTS)
         db.session.commit()
         return jsonify({'msg': 'Department deleted'})
 
 # --- SEMESTER ROUTES ---
 @admin_bp.route('/semesters', methods=['GET', 'POST'])
 @jwt_required()
+@read_replica('GET')
 def manage_semesters():
     claims = get_jwt()
     if claims.get('role') != 'Admin': return jsonify({'msg': 'Forbidden'}), 403
     if request.method == 'GET':
-        semesters = Semester.query.order_by(Semester.year.desc(), Semester.semester_number.desc()).all()
-        return jsonify([s.to_dict() for s in semesters])
+        semesters = Semester.query.order_by(Semester.year.desc(), Semester.semester_number.desc())
+        return conditional_response([SEMESTER], lambda: jsonify([s.to_dict() for s in semesters]))
     if request.method == 'POST':
         data = request.json
         new_semester = Semester(year=int(data['year']), semester_number=int(data['semester_number']), start_date=date.fromisoformat(data['start_date']), end_date=date.fromisoformat(data['end_date']))
         try:
             db.session.add(new_semester)
+            bump_version(SEMESTER)
             db.session.commit()
         except IntegrityError:
             db.session.rollback()
@@ -88,7 +99,11 @@ def manage_single_semester(semester_id):
         semester.semester_number = data.get('semester_number', semester.semester_number)
         semester.start_date = date.fromisoformat(data.get('start_date', semester.start_date.isoformat()))
         semester.end_date = date.fromisoformat(data.get('end_date', semester.end_date.isoformat()))
+        bump_version(SEMESTER)
         try:
+            db.session.flush()
+            if semester.is_active:
+                sync_semester_occurrences(semester)
             db.session.commit()
         except IntegrityError:
             db.session.rollback()
@@ -98,6 +113,7 @@ def manage_single_semester(semester_id):
         if ClassSchedule.query.filter_by(semester_id=semester.id).first():
             return jsonify({'msg': 'Cannot delete: Semester is used in a timetable'}), 400
         db.session.delete(semester)
+        bump_version(SEMESTER)
         db.session.commit()
         return jsonify({'msg': 'Semester deleted'})
 
@@ -106,10 +122,15 @@ def manage_single_semester(semester_id):
 def activate_semester(semester_id):
     claims = get_jwt()
     if claims.get('role') != 'Admin': return jsonify({'msg': 'Forbidden'}), 403
-    Semester.query.filter_by(is_active=True).update({'is_active': False})
     target_semester = db.session.get(Semester, semester_id)
     if not target_semester: return jsonify({'msg': 'Semester not found'}), 404
+    for previous in Semester.query.filter(Semester.is_active == True, Semester.id != semester_id).all():
+        remove_semester_occurrences(previous)
+    record_changes('semesters', Semester.is_active == True)
+    Semester.query.filter_by(is_active=True).update({'is_active': False})
     target_semester.is_active = True
+    bump_version(SEMESTER)
+    sync_semester_occurrences(target_semester)
     db.session.commit()
     return jsonify({'msg': f"Semester {target_semester.year} - {target_semester.semester_number} has been activated."})
 
@@ -121,6 +142,8 @@ def deactivate_semester():
     active_semester = Semester.query.filter_by(is_active=True).first()
     if active_semester:
         active_semester.is_active = False
+        bump_version(SEMESTER)
+        remove_semester_occurrences(active_semester)
         db.session.commit()
         return jsonify({'msg': 'Semester deactivated successfully.'})
     return jsonify({'msg': 'No active semester to deactivate.'})
@@ -128,17 +151,24 @@ def deactivate_semester():
 # --- PROGRAM ROUTES ---
 @admin_bp.route('/programs', methods=['GET', 'POST'])
 @jwt_required()
+@read_replica('GET')
 def manage_programs():
     claims = get_jwt()
     if claims.get('role') != 'Admin': return jsonify({'msg': 'Forbidden'}), 403
     if request.method == 'GET':
-        programs = Program.query.join(Department).order_by(Program.name).all()
-        return jsonify([p.to_dict() for p in programs])
+        programs = Program.query.options(*Program.to_dict_options())
+        department_id = request.args.get('department_id', type=int)
+        if department_id:
+            programs = programs.filter(Program.department_id == department_id)
+        if request.args.get('search'):
+            programs = programs.filter(Program.name.icontains(request.args['search'], autoescape=True))
+        return conditional_response([PROGRAMS, DEPARTMENTS], lambda: list_response(programs, [Program.name, Program.id], Program.to_dict))
     if request.method == 'POST':
         data = request.json
         new_program = Program(name=data['name'], level=data['level'], department_id=data['department_id'], duration_in_years=data['duration_in_years'])
         try:
             db.session.add(new_program)
+            bump_version(PROGRAMS)
             db.session.commit()
         except IntegrityError:
             db.session.rollback()
@@ -154,11 +184,18 @@ def manage_single_program(program_id):
     if not program: return jsonify({'msg': 'Program not found'}), 404
     if request.method == 'PUT':
         data = request.json
+        department_changed = 'department_id' in data and str(data['department_id']) != str(program.department_id)
         program.name = data.get('name', program.name)
         program.level = data.get('level', program.level)
         program.department_id = data.get('department_id', program.department_id)
         program.duration_in_years = data.get('duration_in_years', program.duration_in_years)
+        bump_version(PROGRAMS)
         try:
+            db.session.flush()
+            active_semester = get_active_semester()
+            if active_semester and department_changed:
+                # The program's classes move to the new department's timetable and CR view
+                sync_semester_occurrences(active_semester)
             db.session.commit()
         except IntegrityError:
             db.session.rollback()
@@ -168,23 +205,32 @@ def manage_single_program(program_id):
         if program.subjects:
             return jsonify({'msg': 'Cannot delete: Program has subjects'}), 400
         db.session.delete(program)
+        bump_version(PROGRAMS)
         db.session.commit()
         return jsonify({'msg': 'Program deleted'})
 
 # --- SUBJECT ROUTES ---
 @admin_bp.route('/subjects', methods=['GET', 'POST'])
 @jwt_required()
+@read_replica('GET')
 def manage_subjects():
     claims = get_jwt()
     if claims.get('role') != 'Admin': return jsonify({'msg': 'Forbidden'}), 403
     if request.method == 'GET':
-        subjects = Subject.query.join(Program).order_by(Subject.name).all()
-        return jsonify([s.to_dict() for s in subjects])
+        subjects = Subject.query.options(*Subject.to_dict_options())
+        program_id = request.args.get('program_id', type=int)
+        if program_id:
+            subjects = subjects.filter(Subject.program_id == program_id)
+        if request.args.get('search'):
+            search = request.args['search']
+            subjects = subjects.filter(Subject.name.icontains(search, autoescape=True) | Subject.code.icontains(search, autoescape=True))
+        return list_response(subjects, [Subject.name, Subject.id], Subject.to_dict)
     if request.method == 'POST':
         data = request.json
         new_subject = Subject(name=data['name'], code=data['code'], program_id=data['program_id'], year_of_study=data['year_of_study'])
         try:
             db.session.add(new_subject)
+            bump_version(SUBJECTS)
             db.session.commit()
         except IntegrityError:
             db.session.rollback()
@@ -200,11 +246,17 @@ def manage_single_subject(subject_id):
     if not subject: return jsonify({'msg': 'Subject not found'}), 404
     if request.method == 'PUT':
         data = request.json
+        program_changed = 'program_id' in data and str(data['program_id']) != str(subject.program_id)
         subject.name = data.get('name', subject.name)
         subject.code = data.get('code', subject.code)
         subject.program_id = data.get('program_id', subject.program_id)
         subject.year_of_study = data.get('year_of_study', subject.year_of_study)
+        bump_version(SUBJECTS)
         try:
+            db.session.flush()
+            active_semester = get_active_semester()
+            if active_semester and program_changed:
+                sync_semester_occurrences(active_semester)
             db.session.commit()
         except IntegrityError:
             db.session.rollback()
@@ -214,23 +266,38 @@ def manage_single_subject(subject_id):
         if ClassSchedule.query.filter_by(subject_id=subject.id).first():
             return jsonify({'msg': 'Cannot delete: Subject is in a timetable'}), 400
         db.session.delete(subject)
+        bump_version(SUBJECTS)
         db.session.commit()
         return jsonify({'msg': 'Subject deleted'})
 
 # --- USER ROUTES ---
 @admin_bp.route('/users', methods=['GET', 'POST'])
 @jwt_required()
+@read_replica('GET')
 def manage_users():
     claims = get_jwt()
     if claims.get('role') != 'Admin': return jsonify({'msg': 'Forbidden'}), 403
     if request.method == 'GET':
-        users = User.query.order_by(User.id).all()
-        return jsonify([u.to_dict() for u in users])
+        users = User.query.options(*User.to_dict_options())
+        department_id = request.args.get('department_id', type=int)
+        if department_id:
+            users = users.filter(User.department_id == department_id)
+        if request.args.get('role'):
+            users = users.filter(User.role == request.args['role'])
+        if request.args.get('search'):
+            search = request.args['search']
+            users = users.filter(User.full_name.icontains(search, autoescape=True) | User.email.icontains(search, autoescape=True))
+        return list_response(users, [User.id], User.to_dict)
     if request.method == 'POST':
         data = request.json
-        new_user = User(full_name=data.get('full_name'), email=data.get('email'), password=generate_password_hash(data.get('password')), role=data.get('role'), department_id=data.get('department_id'))
+        try:
+            hashed_password = hash_password(data.get('password'))
+        except HashPoolBusy:
+            return jsonify({'msg': 'Server busy, please try again'}), 503, {'Retry-After': '1'}
+        new_user = User(full_name=data.get('full_name'), email=data.get('email'), password=hashed_password, role=data.get('role'), department_id=data.get('department_id'))
         try:
             db.session.add(new_user)
+            bump_version(USERS)
             db.session.commit()
         except IntegrityError:
             db.session.rollback()
@@ -254,6 +321,7 @@ def manage_single_user(user_id):
         user.email = data.get('email', user.email)
         user.role = data.get('role', user.role)
         user.department_id = data.get('department_id', user.department_id)
+        bump_version(USERS)
         try:
             db.session.commit()
         except IntegrityError:
@@ -269,5 +337,33 @@ def manage_single_user(user_id):
             return jsonify({'msg': 'Cannot delete: CR has existing attendance records.'}), 400
         
         db.session.delete(user)
+        bump_version(USERS)
         db.session.commit()
-        return jsonify({'msg': 'User deleted successfully'})
\ No newline at end of file
+        return jsonify({'msg': 'User deleted successfully'})
+
+# --- BULK IMPORT ROUTES ---
+@admin_bp.route('/import/users', methods=['POST'])
+@jwt_required()
+def import_users_csv():
+    claims = get_jwt()
+    if claims.get('role') != 'Admin': return jsonify({'msg': 'Forbidden'}), 403
+    file = request.files.get('file')
+    if not file or file.filename == '':
+        return jsonify({'msg': 'No file selected'}), 400
+    result, error = import_users(file)
+    if error:
+        return jsonify({'msg': error}), 400
+    return jsonify(result)
+
+@admin_bp.route('/import/subjects', methods=['POST'])
+@jwt_required()
+def import_subjects_csv():
+    claims = get_jwt()
+    if claims.get('role') != 'Admin': return jsonify({'msg': 'Forbidden'}), 403
+    file = request.files.get('file')
+    if not file or file.filename == '':
+        return jsonify({'msg': 'No file selected'}), 400
+    result, error = import_subjects(file)
+    if error:
+        return jsonify({'msg': error}), 400
+    return jsonify(result)
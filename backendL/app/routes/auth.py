@@ -1,7 +1,8 @@
 from flask import Blueprint, request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_jwt_extended import create_access_token
 from ..models import User, db
+from ..cache import bump_version, USERS
+from ..hashing import hash_password, verify_password, needs_rehash, HashPoolBusy
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 
@@ -13,9 +14,13 @@ def register():
     email = data.get('email')
     if User.query.filter_by(email=email).first():
         return jsonify({'msg': 'Email already exists'}), 400
-    hashed_password = generate_password_hash(data.get('password'))
+    try:
+        hashed_password = hash_password(data.get('password'))
+    except HashPoolBusy:
+        return jsonify({'msg': 'Server busy, please try again'}), 503, {'Retry-After': '1'}
     new_user = User(full_name=data.get('full_name'), email=email, password=hashed_password, role=data.get('role'), department_id=data.get('department_id'))
     db.session.add(new_user)
+    bump_version(USERS)
     db.session.commit()
     return jsonify({'msg': 'User registered successfully'}), 201
 
@@ -29,8 +34,14 @@ def login():
         access_token = create_access_token(identity=email, additional_claims=additional_claims)
         return jsonify(token=access_token)
     user = User.query.filter_by(email=email).first()
-    if not user or not check_password_hash(user.password, password):
-        return jsonify({'msg': 'Bad credentials'}), 401
+    try:
+        if not user or not verify_password(user.password, password):
+            return jsonify({'msg': 'Bad credentials'}), 401
+        if needs_rehash(user.password):
+            user.password = hash_password(password)
+            db.session.commit()
+    except HashPoolBusy:
+        return jsonify({'msg': 'Server busy, please try again'}), 503, {'Retry-After': '1'}
     additional_claims = {"role": user.role, "id": user.id, "full_name": user.full_name, "department_id": user.department_id}
     access_token = create_access_token(identity=user.email, additional_claims=additional_claims)
     return jsonify(token=access_token)
@@ -1,8 +1,19 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt
-from datetime import date, time
+from datetime import date, datetime, time
+from sqlalchemy import select, update, exists, and_, or_
 from sqlalchemy.exc import IntegrityError
-from ..models import db, User, Program, Subject, Semester, ClassSchedule, Attendance, SpecialSchedule
+from ..models import db, User, Program, Subject, ClassSchedule, ClassOccurrence, Attendance, SpecialSchedule
+from ..cache import get_active_semester, conditional_response, USERS, PROGRAMS, SUBJECTS
+from ..occurrences import (add_weekly_schedule_occurrences, remove_weekly_schedule_occurrences,
+                           add_special_schedule_occurrence, remove_special_schedule_occurrence)
+from ..imports import import_schedules
+from ..pagination import list_response
+from ..rollups import record_verifications
+from ..conflicts import occurrence_conflicts, weekly_slot_conflicts, department_conflicts
+from ..changes import record_changes
+from ..events import publish
+from ..routing import read_replica
 
 hod_bp = Blueprint('hod', __name__, url_prefix='/api/hod')
 
@@ -15,29 +26,33 @@ def get_hod_department_id_from_token():
 
 @hod_bp.route('/data-for-timetable', methods=['GET'])
 @jwt_required()
+@read_replica('GET')
 def get_hod_timetable_data():
     department_id = get_hod_department_id_from_token()
     if department_id is None:
         return jsonify({'msg': 'Forbidden'}), 403
 
-    lecturers = User.query.filter_by(role='Lecturer', department_id=department_id).all()
-    programs_in_dept = Program.query.filter_by(department_id=department_id).all()
-    program_ids = [p.id for p in programs_in_dept]
-    subjects = Subject.query.filter(Subject.program_id.in_(program_ids)).all()
+    def build():
+        lecturers = User.query.filter_by(role='Lecturer', department_id=department_id).all()
+        programs_in_dept = Program.query.filter_by(department_id=department_id).all()
+        program_ids = [p.id for p in programs_in_dept]
+        subjects = Subject.query.options(*Subject.to_dict_options()).filter(Subject.program_id.in_(program_ids)).all()
+        return jsonify({
+            'lecturers': [{'id': l.id, 'full_name': l.full_name} for l in lecturers],
+            'subjects': [{'id': s.id, 'name': f"{s.program.name}: {s.code} - {s.name}"} for s in subjects]
+        })
 
-    return jsonify({
-        'lecturers': [{'id': l.id, 'full_name': l.full_name} for l in lecturers],
-        'subjects': [{'id': s.id, 'name': f"{s.program.name}: {s.code} - {s.name}"} for s in subjects]
-    })
+    return conditional_response([USERS, PROGRAMS, SUBJECTS], build, scope=f"department:{department_id}")
 
 @hod_bp.route('/schedules', methods=['GET', 'POST'])
 @jwt_required()
+@read_replica('GET')
 def manage_hod_schedules():
     department_id = get_hod_department_id_from_token()
     if department_id is None:
         return jsonify({'msg': 'Forbidden'}), 403
     
-    active_semester = Semester.query.filter_by(is_active=True).first()
+    active_semester = get_active_semester()
     if not active_semester:
         # For GET requests, it's okay to return empty, but POST needs an active semester.
         if request.method == 'POST':
@@ -46,14 +61,14 @@ def manage_hod_schedules():
         
     if request.method == 'GET':
         # Get regular weekly schedules
-        schedules = ClassSchedule.query.join(Subject).join(Program).filter(
+        schedules = ClassSchedule.query.options(*ClassSchedule.to_dict_options()).join(Subject).join(Program).filter(
             Program.department_id == department_id,
             ClassSchedule.semester_id == active_semester.id if active_semester else -1 # Avoid error if no active semester
         ).all()
         
         # Get upcoming special schedules created by this HOD
         today = date.today()
-        special_schedules = SpecialSchedule.query.filter(
+        special_schedules = SpecialSchedule.query.options(*SpecialSchedule.to_dict_options()).filter(
             SpecialSchedule.creating_hod_id == get_jwt()['id'],
             SpecialSchedule.class_date >= today
         ).order_by(SpecialSchedule.class_date).all()
@@ -70,14 +85,34 @@ def manage_hod_schedules():
             start_time=time.fromisoformat(data['start_time']), end_time=time.fromisoformat(data['end_time']),
             semester_id=active_semester.id
         )
+        if new_schedule.end_time <= new_schedule.start_time:
+            return jsonify({'msg': 'end_time must be after start_time'}), 400
+        conflicts = weekly_slot_conflicts(new_schedule.lecturer_id, new_schedule.day_of_week, new_schedule.start_time, new_schedule.end_time, active_semester)
+        if conflicts:
+            return jsonify({'msg': 'The lecturer already has a class at this time.', 'conflicts': conflicts}), 409
         try:
             db.session.add(new_schedule)
+            db.session.flush()
+            add_weekly_schedule_occurrences(new_schedule)
+            publish(department_id, 'schedules', {'action': 'added', 'id': new_schedule.id})
             db.session.commit()
         except IntegrityError:
             db.session.rollback()
             return jsonify({'msg': 'This exact class schedule already exists.'}), 409
         return jsonify({'msg': 'Class scheduled successfully'}), 201
 
+@hod_bp.route('/schedules/conflicts', methods=['GET'])
+@jwt_required()
+@read_replica('GET')
+def hod_schedule_conflicts():
+    department_id = get_hod_department_id_from_token()
+    if department_id is None:
+        return jsonify({'msg': 'Forbidden'}), 403
+    active_semester = get_active_semester()
+    if not active_semester:
+        return jsonify({'msg': 'No active semester set'}), 404
+    return jsonify(department_conflicts(active_semester, department_id))
+
 @hod_bp.route('/schedules/<int:schedule_id>', methods=['DELETE'])
 @jwt_required()
 def delete_hod_schedule(schedule_id):
@@ -91,8 +126,14 @@ def delete_hod_schedule(schedule_id):
     if schedule_item.subject.program.department_id != department_id:
         return jsonify({'msg': 'Forbidden: Cannot delete schedule from another department'}), 403
 
-    db.session.delete(schedule_item)
-    db.session.commit()
+    try:
+        remove_weekly_schedule_occurrences(schedule_item.id)
+        db.session.delete(schedule_item)
+        publish(department_id, 'schedules', {'action': 'deleted', 'id': schedule_id})
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'msg': 'This schedule is still referenced and cannot be deleted.'}), 409
     return jsonify({'msg': 'Scheduled class deleted successfully'})
 
 @hod_bp.route('/special-schedules/<int:schedule_id>', methods=['DELETE'])
@@ -104,23 +145,54 @@ def delete_special_schedule(schedule_id):
         return jsonify({'msg': 'Special schedule not found'}), 404
     if schedule_item.creating_hod_id != hod_id:
         return jsonify({'msg': 'Forbidden: You can only delete special schedules you created.'}), 403
-    db.session.delete(schedule_item)
-    db.session.commit()
+    department_id = schedule_item.target_department_id
+    try:
+        remove_special_schedule_occurrence(schedule_item.id)
+        db.session.delete(schedule_item)
+        publish(department_id, 'schedules', {'action': 'deleted', 'special_id': schedule_id})
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'msg': 'This special schedule is still referenced and cannot be deleted.'}), 409
     return jsonify({'msg': 'Special scheduled class deleted successfully'})
 
+def attendance_scope(department_id, lecturer_id=None):
+    # Attendance for classes of the department's programs. Marks detached from their class
+    # (duplicates and unmatched legacy rows, see migrations 0004 and 0005) have no occurrence
+    # and are scoped by the weekly schedule they were recorded against instead.
+    in_department = (Subject.program_id == Program.id, Program.department_id == department_id)
+    linked = exists().where(ClassOccurrence.id == Attendance.occurrence_id, ClassOccurrence.subject_id == Subject.id, *in_department)
+    detached = exists().where(ClassSchedule.id == Attendance.class_schedule_id, ClassSchedule.subject_id == Subject.id, *in_department)
+    if lecturer_id:
+        linked = linked.where(ClassOccurrence.lecturer_id == lecturer_id)
+        detached = detached.where(ClassSchedule.lecturer_id == lecturer_id)
+    return or_(linked, and_(Attendance.occurrence_id.is_(None), detached))
+
+def pending_attendance_criteria(department_id, start_date=None, end_date=None, lecturer_id=None):
+    # Unverified attendance in the department, as plain WHERE criteria so the same scope
+    # drives both the listing and the set-based bulk verify
+    criteria = [attendance_scope(department_id, lecturer_id), Attendance.verified == False]
+    if start_date:
+        criteria.append(Attendance.timestamp >= start_date)
+    if end_date:
+        criteria.append(Attendance.timestamp <= datetime.combine(end_date, time.max))
+    return criteria
+
 @hod_bp.route('/attendance/pending', methods=['GET'])
 @jwt_required()
+@read_replica('GET')
 def hod_pending_attendance():
     department_id = get_hod_department_id_from_token()
     if department_id is None:
         return jsonify({'msg': 'Forbidden'}), 403
 
-    attendances = Attendance.query.join(ClassSchedule).join(Subject).join(Program).filter(
-        Attendance.verified == False,
-        Program.department_id == department_id
-    ).order_by(Attendance.timestamp.desc()).all()
-
-    return jsonify([att.to_dict() for att in attendances])
+    attendances = Attendance.query.options(*Attendance.to_dict_options()).filter(*pending_attendance_criteria(
+        department_id,
+        start_date=request.args.get('start_date', type=date.fromisoformat),
+        end_date=request.args.get('end_date', type=date.fromisoformat),
+        lecturer_id=request.args.get('lecturer_id', type=int)
+    ))
+    return list_response(attendances, [Attendance.timestamp, Attendance.id], Attendance.to_dict, descending=True)
 
 @hod_bp.route('/attendance/verify/<int:attendance_id>', methods=['POST'])
 @jwt_required()
@@ -132,13 +204,75 @@ def verify_attendance(attendance_id):
     attendance = db.session.get(Attendance, attendance_id)
     if not attendance:
         return jsonify({'msg': 'Attendance record not found'}), 404
-    if attendance.schedule.subject.program.department_id != department_id:
+    owner = db.session.execute(
+        select(ClassOccurrence.lecturer_id).select_from(Attendance).outerjoin(ClassOccurrence, Attendance.occurrence_id == ClassOccurrence.id)
+        .where(Attendance.id == attendance.id, attendance_scope(department_id))
+    ).first()
+    if not owner:
         return jsonify({'msg': 'Forbidden'}), 403
 
-    attendance.verified = True
+    result = db.session.execute(
+        update(Attendance).where(Attendance.id == attendance.id, Attendance.verified == False).values(verified=True)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        # Detached marks are not in the rollup, which counts attendance through its occurrence
+        if owner.lecturer_id is not None:
+            record_verifications([(owner.lecturer_id, attendance.attendance_date, attendance.present)])
+        record_changes('attendance', Attendance.id == attendance.id)
+        publish(department_id, 'attendance', {'action': 'verified', 'ids': [attendance.id]})
     db.session.commit()
     return jsonify({'msg': 'Attendance verified'})
 
+BULK_VERIFY_LIMIT = 1000
+
+@hod_bp.route('/attendance/verify-bulk', methods=['POST'])
+@jwt_required()
+def verify_attendance_bulk():
+    department_id = get_hod_department_id_from_token()
+    if department_id is None:
+        return jsonify({'msg': 'Forbidden'}), 403
+    data = request.json or {}
+    ids, filters = data.get('ids'), data.get('filter')
+    if (ids is None) == (filters is None):
+        return jsonify({'msg': 'Provide either ids or filter'}), 400
+
+    if ids is not None:
+        if not isinstance(ids, list) or not ids or not all(isinstance(i, int) for i in ids):
+            return jsonify({'msg': 'ids must be a non-empty list of attendance ids'}), 400
+        if len(ids) > BULK_VERIFY_LIMIT:
+            return jsonify({'msg': f'At most {BULK_VERIFY_LIMIT} ids per request'}), 400
+        criteria = pending_attendance_criteria(department_id) + [Attendance.id.in_(ids)]
+    else:
+        if not isinstance(filters, dict):
+            return jsonify({'msg': 'filter must be an object'}), 400
+        try:
+            criteria = pending_attendance_criteria(
+                department_id,
+                start_date=date.fromisoformat(filters['start_date']) if filters.get('start_date') else None,
+                end_date=date.fromisoformat(filters['end_date']) if filters.get('end_date') else None,
+                lecturer_id=int(filters['lecturer_id']) if filters.get('lecturer_id') else None
+            )
+        except (TypeError, ValueError):
+            return jsonify({'msg': 'Invalid filter values'}), 400
+
+    # Lock the matching rows first so the rollup is credited exactly for what the UPDATE changes
+    marks = db.session.execute(
+        select(Attendance.id, ClassOccurrence.lecturer_id, Attendance.attendance_date, Attendance.present).select_from(Attendance)
+        .outerjoin(ClassOccurrence, Attendance.occurrence_id == ClassOccurrence.id).where(*criteria).with_for_update(of=Attendance)
+    ).all()
+    # Scope check and update in one UPDATE; records outside the department,
+    # already verified or unknown are simply not matched
+    result = db.session.execute(
+        update(Attendance).where(*criteria).values(verified=True).execution_options(synchronize_session=False)
+    )
+    record_verifications([(mark.lecturer_id, mark.attendance_date, mark.present) for mark in marks if mark.lecturer_id is not None])
+    if marks:
+        record_changes('attendance', Attendance.id.in_([mark.id for mark in marks]))
+        publish(department_id, 'attendance', {'action': 'verified', 'ids': [mark.id for mark in marks]})
+    db.session.commit()
+    return jsonify({'verified': result.rowcount})
+
 @hod_bp.route('/special-schedules', methods=['POST'])
 @jwt_required()
 def add_special_schedule():
@@ -157,6 +291,32 @@ def add_special_schedule():
         creating_hod_id=hod_id,
         target_department_id=data['target_department_id']
     )
+    if new_special_class.end_time <= new_special_class.start_time:
+        return jsonify({'msg': 'end_time must be after start_time'}), 400
+    conflicts = occurrence_conflicts(new_special_class.lecturer_id, [new_special_class.class_date], new_special_class.start_time, new_special_class.end_time)
+    if conflicts:
+        return jsonify({'msg': 'The lecturer already has a class at this time.', 'conflicts': conflicts}), 409
     db.session.add(new_special_class)
+    db.session.flush()
+    add_special_schedule_occurrence(new_special_class)
+    publish(int(new_special_class.target_department_id), 'schedules', {'action': 'added', 'special_id': new_special_class.id, 'class_date': data['class_date']})
     db.session.commit()
-    return jsonify({'msg': 'Special class scheduled successfully'}), 201
\ No newline at end of file
+    return jsonify({'msg': 'Special class scheduled successfully'}), 201
+
+@hod_bp.route('/import/schedules', methods=['POST'])
+@jwt_required()
+def import_schedules_csv():
+    department_id = get_hod_department_id_from_token()
+    if department_id is None:
+        return jsonify({'msg': 'Forbidden'}), 403
+    active_semester = get_active_semester()
+    if not active_semester:
+        return jsonify({'msg': 'No active semester set'}), 404
+    file = request.files.get('file')
+    if not file or file.filename == '':
+        return jsonify({'msg': 'No file selected'}), 400
+    result, error = import_schedules(file, department_id, active_semester)
+    if error:
+        return jsonify({'msg': error}), 400
+    publish(department_id, 'schedules', {'action': 'imported'})
+    return jsonify(result)
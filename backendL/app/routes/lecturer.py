@@ -1,14 +1,18 @@
-import os
 from datetime import datetime, timedelta, date, timezone
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, jsonify
 from flask_jwt_extended import jwt_required, get_jwt
-from werkzeug.utils import secure_filename
-from ..models import db, User, Semester, ClassSchedule, Attendance, SpecialSchedule
+from sqlalchemy.orm import joinedload
+from ..models import db, Subject, ClassSchedule, Attendance, SpecialSchedule
+from ..cache import get_active_semester
+from ..routing import read_replica
+from ..storage import UploadRejected, receive_pdf
+from ..excuse_jobs import submit_excuse_job
 
 lecturer_bp = Blueprint('lecturer', __name__, url_prefix='/api/lecturer')
 
 @lecturer_bp.route('/dashboard-data', methods=['GET'])
 @jwt_required()
+@read_replica('GET')
 def get_lecturer_dashboard_data():
     claims = get_jwt()
     if claims.get('role') != 'Lecturer': 
@@ -17,15 +21,15 @@ def get_lecturer_dashboard_data():
     lecturer_id = claims.get('id')
     
     # --- Get Regular Weekly Schedule ---
-    active_semester = Semester.query.filter_by(is_active=True).first()
+    active_semester = get_active_semester()
     schedule_data = []
     if active_semester:
-        schedules = ClassSchedule.query.filter_by(
+        schedules = ClassSchedule.query.options(joinedload(ClassSchedule.subject).joinedload(Subject.program)).filter_by(
             lecturer_id=lecturer_id, 
             semester_id=active_semester.id
         ).order_by(ClassSchedule.day_of_week, ClassSchedule.start_time).all()
         schedule_ids = [s.id for s in schedules]
-        all_attendances = Attendance.query.filter(Attendance.class_schedule_id.in_(schedule_ids)).all()
+        all_attendances = Attendance.query.options(*Attendance.to_dict_options()).filter(Attendance.class_schedule_id.in_(schedule_ids)).all()
         attendance_map = {}
         for att in all_attendances:
             if att.class_schedule_id not in attendance_map: 
@@ -40,7 +44,7 @@ def get_lecturer_dashboard_data():
     
     # --- Get Upcoming Special Schedules ---
     today = date.today()
-    special_schedules = SpecialSchedule.query.filter(
+    special_schedules = SpecialSchedule.query.options(joinedload(SpecialSchedule.subject)).filter(
         SpecialSchedule.lecturer_id == lecturer_id,
         SpecialSchedule.class_date >= today
     ).order_by(SpecialSchedule.class_date, SpecialSchedule.start_time).all()
@@ -68,25 +72,30 @@ def upload_excuse(attendance_id):
     attendance = db.session.get(Attendance, attendance_id)
     if not attendance: 
         return jsonify({'msg': 'Attendance record not found'}), 404
-    if attendance.schedule.lecturer_id != claims.get('id'): 
+    # Marks detached from their class (see migration 0005) still name the weekly schedule they were recorded against
+    owner = attendance.occurrence or attendance.schedule
+    if not owner:
+        return jsonify({'msg': 'Attendance record is not linked to a class'}), 404
+    if owner.lecturer_id != claims.get('id'): 
         return jsonify({'msg': 'Unauthorized'}), 403
-    # Use datetime.utcnow() for correct timezone-naive comparison
-    if attendance.timestamp + timedelta(hours=24) < datetime.now(timezone.utc):
+    # Timestamps are stored as naive UTC
+    if attendance.timestamp + timedelta(hours=24) < datetime.now(timezone.utc).replace(tzinfo=None):
         return jsonify({'msg': 'Excuse submission window has expired (24 hours)'}), 400
         
-    file = request.files.get('file')
-    if not file or file.filename == '':
-        return jsonify({'msg': 'No file selected'}), 400
-    if not file.filename.lower().endswith('.pdf'):
-        return jsonify({'msg': 'Only PDF files are allowed'}), 400
-
-    filename = secure_filename(f"excuse_{attendance_id}_{file.filename}")
-    file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
+    # Streamed to disk under its content hash; an identical file already stored is reused
+    try:
+        filename, form = receive_pdf('file')
+    except UploadRejected as e:
+        return jsonify({'msg': e.msg}), e.status
     
     attendance.excuse_file = filename
-    attendance.excuse_comment = request.form.get('comment')
+    attendance.excuse_comment = form.get('comment')
     # Use datetime.utcnow() for consistency
     attendance.excuse_uploaded_at = datetime.now(timezone.utc)
+    # Checks, page count and thumbnail happen in the background; see app/excuse_jobs.py
+    attendance.excuse_status = 'queued'
+    attendance.excuse_pages = attendance.excuse_thumbnail = attendance.excuse_error = None
     db.session.commit()
+    submit_excuse_job(attendance.id, filename)
     
-    return jsonify({'msg': 'Excuse uploaded successfully'})
\ No newline at end of file
+    return jsonify({'msg': 'Excuse uploaded successfully', 'excuse_status': 'queued'})
\ No newline at end of file
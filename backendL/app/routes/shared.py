@@ -1,10 +1,21 @@
 import os
-import csv
-import io
-from flask import Blueprint, request, jsonify, send_from_directory, make_response, current_app
-from flask_jwt_extended import jwt_required, get_jwt
-from datetime import datetime, date, time
-from ..models import db, Attendance, ClassSchedule, User, Subject, Program, Department
+import json
+import uuid
+from flask import Blueprint, Response, request, jsonify, send_from_directory, make_response, current_app, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
+from datetime import datetime, date, timezone
+from sqlalchemy import select, literal
+from ..models import db, ReportJob, Attendance, ClassOccurrence, Department
+from ..occurrences import weekly_occurrence_key
+from ..dialects import insert_ignore
+from ..cache import conditional_response, DEPARTMENTS
+from ..rollups import record_marks
+from ..report_jobs import submit_report_job
+from ..reports import get_report_data, get_row_export_query, stream_rows_csv, summary_csv, summary_csv_filename
+from ..routing import read_replica
+from ..changes import ROLE_ENTITIES, ChangesPruned, head_cursor, read_changes, record_changes
+from ..events import bus, event_stream, publish, issue_stream_ticket, read_stream_ticket
+from ..storage import send_upload
 
 shared_bp = Blueprint('shared', __name__)
 
@@ -12,8 +23,8 @@ shared_bp = Blueprint('shared', __name__)
 @shared_bp.route('/api/departments', methods=['GET'])
 def get_public_departments():
     try:
-        departments = Department.query.order_by(Department.name).all()
-        return jsonify([d.to_dict() for d in departments])
+        departments = Department.query.order_by(Department.name)
+        return conditional_response([DEPARTMENTS], lambda: jsonify([d.to_dict() for d in departments]), public=True)
     except Exception as e:
         return jsonify({'msg': 'Failed to retrieve departments', 'error': str(e)}), 500
 
@@ -24,88 +35,176 @@ def submit_attendance():
     claims = get_jwt()
     if claims.get('role') != 'CR': return jsonify({'msg': 'Only CR can submit attendance'}), 403
     data = request.json
-    class_schedule_id = data.get('class_schedule_id')
     present = data.get('present')
-    today_start = datetime.combine(date.today(), time.min)
-    today_end = datetime.combine(date.today(), time.max)
-    existing_attendance = Attendance.query.filter(Attendance.class_schedule_id == class_schedule_id, Attendance.timestamp.between(today_start, today_end)).first()
-    if existing_attendance: return jsonify({'msg': 'Attendance for this class has already been submitted today'}), 409
-    new_attendance = Attendance(class_schedule_id=class_schedule_id, cr_id=claims.get('id'), present=present)
-    db.session.add(new_attendance)
+    if not isinstance(present, bool):
+        return jsonify({'msg': 'present must be true or false'}), 400
+    if 'occurrence_id' in data:
+        occurrence_filter = ClassOccurrence.id == data['occurrence_id']
+    else:
+        # Older clients send the weekly schedule id; resolve it to today's occurrence
+        occurrence_filter = ClassOccurrence.occurrence_key == weekly_occurrence_key(data.get('class_schedule_id'), date.today())
+
+    # A single INSERT ... SELECT both validates the class and records the mark; the unique
+    # (occurrence_id, attendance_date) constraint turns a repeat submission into a no-op.
+    source = select(
+        ClassOccurrence.class_schedule_id, ClassOccurrence.id, literal(claims.get('id')), literal(present),
+        literal(datetime.now(timezone.utc), Attendance.timestamp.type), ClassOccurrence.class_date, literal(False)
+    ).where(occurrence_filter, ClassOccurrence.department_id == claims.get('department_id'), ClassOccurrence.class_date == date.today())
+    result = db.session.execute(insert_ignore(Attendance).from_select(
+        ['class_schedule_id', 'occurrence_id', 'cr_id', 'present', 'timestamp', 'attendance_date', 'verified'], source
+    ))
+    if result.rowcount == 1:
+        occurrence_id, lecturer_id = db.session.execute(select(ClassOccurrence.id, ClassOccurrence.lecturer_id).where(occurrence_filter)).one()
+        record_marks([(lecturer_id, date.today(), present)])
+        record_changes('attendance', occurrence_filter, Attendance.attendance_date == date.today(), action='insert')
+        publish(claims.get('department_id'), 'attendance', {'action': 'submitted', 'count': 1, 'occurrence_ids': [occurrence_id]})
+        db.session.commit()
+        return jsonify({'msg': 'Attendance recorded successfully'}), 201
+    db.session.commit()
+
+    occurrence = db.session.execute(select(ClassOccurrence).where(occurrence_filter)).scalar()
+    if not occurrence or occurrence.class_date != date.today():
+        return jsonify({'msg': 'This class is not scheduled for today'}), 404
+    if occurrence.department_id != claims.get('department_id'):
+        return jsonify({'msg': 'Forbidden'}), 403
+    return jsonify({'msg': 'Attendance for this class has already been submitted today'}), 409
+
+BULK_ATTENDANCE_LIMIT = 200
+
+@shared_bp.route('/api/attendance/bulk', methods=['POST'])
+@jwt_required()
+def submit_attendance_bulk():
+    claims = get_jwt()
+    if claims.get('role') != 'CR': return jsonify({'msg': 'Only CR can submit attendance'}), 403
+    marks = (request.json or {}).get('marks')
+    if not isinstance(marks, list) or not marks:
+        return jsonify({'msg': 'marks must be a non-empty list'}), 400
+    if len(marks) > BULK_ATTENDANCE_LIMIT:
+        return jsonify({'msg': f'At most {BULK_ATTENDANCE_LIMIT} marks per request'}), 400
+
+    requested_ids = [m.get('occurrence_id') for m in marks if isinstance(m, dict) and isinstance(m.get('occurrence_id'), int)]
+    # One query validates every mark: today's classes for the CR's department, plus any attendance already recorded
+    todays = {row.id: row for row in db.session.query(
+        ClassOccurrence.id, ClassOccurrence.class_schedule_id, ClassOccurrence.lecturer_id, Attendance.cr_id, Attendance.present
+    ).outerjoin(Attendance, Attendance.occurrence_id == ClassOccurrence.id).filter(
+        ClassOccurrence.id.in_(requested_ids),
+        ClassOccurrence.department_id == claims.get('department_id'),
+        ClassOccurrence.class_date == date.today()
+    ).all()}
+
+    results = []
+    new_rows = []
+    seen = set()
+    now = datetime.now(timezone.utc)
+    # Tags the rows this request writes, so it can tell them apart from a concurrent submission's
+    submission_id = uuid.uuid4().hex
+    for mark in marks:
+        occurrence_id = mark.get('occurrence_id') if isinstance(mark, dict) else None
+        present = mark.get('present') if isinstance(mark, dict) else None
+        if not isinstance(occurrence_id, int) or not isinstance(present, bool) or occurrence_id in seen:
+            results.append({'occurrence_id': occurrence_id, 'status': 'invalid'})
+            continue
+        seen.add(occurrence_id)
+        row = todays.get(occurrence_id)
+        if row is None:
+            results.append({'occurrence_id': occurrence_id, 'status': 'not_scheduled_today'})
+        elif row.cr_id is None:
+            new_rows.append({'class_schedule_id': row.class_schedule_id, 'occurrence_id': occurrence_id, 'cr_id': claims.get('id'),
+                             'present': present, 'timestamp': now, 'attendance_date': date.today(), 'submission_id': submission_id})
+            results.append({'occurrence_id': occurrence_id, 'status': 'recorded'})
+        elif row.cr_id == claims.get('id') and row.present == present:
+            # A retried request: the same mark is already stored, report it as done
+            results.append({'occurrence_id': occurrence_id, 'status': 'recorded'})
+        else:
+            results.append({'occurrence_id': occurrence_id, 'status': 'already_submitted'})
+
+    inserted = 0
+    if new_rows:
+        inserted = db.session.execute(insert_ignore(Attendance), new_rows).rowcount
+    lecturers = {occurrence_id: row.lecturer_id for occurrence_id, row in todays.items()}
+    if inserted < len(new_rows):
+        # Another submission won the race for some classes; report what is actually stored
+        stored = {row.occurrence_id: row for row in db.session.query(
+            Attendance.occurrence_id, Attendance.cr_id, Attendance.submission_id
+        ).filter(
+            Attendance.occurrence_id.in_([row['occurrence_id'] for row in new_rows]),
+            Attendance.attendance_date == date.today()
+        ).all()}
+        marked = {row['occurrence_id'] for row in new_rows}
+        for item in results:
+            if item['occurrence_id'] not in marked:
+                continue
+            row = stored.get(item['occurrence_id'])
+            if row is None:
+                item['status'] = 'not_recorded'
+            elif row.cr_id != claims.get('id'):
+                item['status'] = 'already_submitted'
+        new_rows = [row for row in new_rows if getattr(stored.get(row['occurrence_id']), 'submission_id', None) == submission_id]
+    record_marks([(lecturers[row['occurrence_id']], row['attendance_date'], row['present']) for row in new_rows])
+    if new_rows:
+        record_changes('attendance', Attendance.occurrence_id.in_([row['occurrence_id'] for row in new_rows]),
+                       Attendance.attendance_date == date.today(), action='insert')
+        publish(claims.get('department_id'), 'attendance', {'action': 'submitted', 'count': len(new_rows),
+                                                          'occurrence_ids': [row['occurrence_id'] for row in new_rows]})
     db.session.commit()
-    return jsonify({'msg': 'Attendance recorded successfully'}), 201
+    return jsonify({'results': results, 'inserted': inserted})
+
+# --- CHANGE FEED ---
+@shared_bp.route('/api/changes', methods=['GET'])
+@jwt_required()
+def get_changes():
+    # Without since: the cursor to start from after loading full lists. With since: every change
+    # after it that the caller may see, newest state per row ('delete' once a row is gone, 'reset'
+    # when a list changed wholesale and must be reloaded). Follow 'cursor' while has_more is true.
+    claims = get_jwt()
+    allowed = ROLE_ENTITIES.get(claims.get('role'))
+    if not allowed:
+        return jsonify({'msg': 'Forbidden'}), 403
+    entities = set(request.args['scope'].split(',')) if request.args.get('scope') else allowed
+    if not entities <= allowed:
+        return jsonify({'msg': f"scope may only include {', '.join(sorted(allowed))}"}), 400
+    if 'since' not in request.args:
+        return jsonify({'cursor': head_cursor(), 'has_more': False, 'changes': []})
+    since = request.args.get('since', type=int)
+    if since is None or since < 0:
+        return jsonify({'msg': 'since must be a cursor returned by this endpoint'}), 400
+    try:
+        return jsonify(read_changes(claims, since, entities))
+    except ChangesPruned:
+        return jsonify({'msg': 'Changes this old are no longer kept; reload the lists', 'cursor': head_cursor()}), 410
+
+# --- EVENT STREAM ---
+@shared_bp.route('/api/events/ticket', methods=['POST'])
+@jwt_required()
+def create_event_ticket():
+    claims = get_jwt()
+    if claims.get('role') not in ('HOD', 'CR', 'Lecturer') or not claims.get('department_id'):
+        return jsonify({'msg': 'Forbidden'}), 403
+    return jsonify({'ticket': issue_stream_ticket(claims['department_id'])})
+
+@shared_bp.route('/api/events/stream', methods=['GET'])
+def stream_events():
+    # Server-Sent Events for one department, opened with a ticket from POST /api/events/ticket
+    department_id = read_stream_ticket(request.args.get('ticket', ''))
+    if department_id is None:
+        return jsonify({'msg': 'Invalid or expired ticket'}), 401
+    if bus.is_full(current_app.config['EVENTS_MAX_STREAMS']):
+        response = jsonify({'msg': 'Too many open event streams, try again shortly'})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    return Response(event_stream(department_id), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
 @shared_bp.route('/uploads/<filename>')
 def download_file(filename):
-    directory = os.path.abspath(current_app.config['UPLOAD_FOLDER'])
-    return send_from_directory(directory, filename)
+    return send_upload(filename)
 
 # --- REPORT GENERATION ROUTES ---
-def get_report_data(filters):
-    start_date_str = filters.get('start_date')
-    end_date_str = filters.get('end_date')
-    department_id = filters.get('department_id')
-    if not all([start_date_str, end_date_str, department_id]):
-        return None, "Missing required report filters"
-    start_date = date.fromisoformat(start_date_str)
-    end_date = date.fromisoformat(end_date_str)
-    department = db.session.get(Department, int(department_id))
-    if not department:
-        return None, "Department not found"
-    records = db.session.query(Attendance).join(ClassSchedule).join(User, User.id == ClassSchedule.lecturer_id).filter(
-        User.department_id == department_id,
-        Attendance.verified == True,
-        Attendance.timestamp >= start_date,
-        Attendance.timestamp <= datetime.combine(end_date, time.max)
-    ).all()
-    report_data = {}
-    total_classes = len(records)
-    total_present = sum(1 for r in records if r.present)
-    for record in records:
-        lecturer = record.schedule.lecturer
-        if lecturer.id not in report_data:
-            report_data[lecturer.id] = {'lecturer_name': lecturer.full_name, 'total_classes': 0, 'classes_attended': 0}
-        report_data[lecturer.id]['total_classes'] += 1
-        if record.present:
-            report_data[lecturer.id]['classes_attended'] += 1
-    overall_attendance_rate = (total_present / total_classes * 100) if total_classes > 0 else 0
-    detailed_breakdown = []
-    for lec_id, data in report_data.items():
-        rate = (data['classes_attended'] / data['total_classes'] * 100) if data['total_classes'] > 0 else 0
-        detailed_breakdown.append({
-            'lecturer_name': data['lecturer_name'],
-            'total_classes': data['total_classes'],
-            'classes_attended': data['classes_attended'],
-            'classes_missed': data['total_classes'] - data['classes_attended'],
-            'attendance_rate': round(rate, 2)
-        })
-    
-    # --- NEW STATISTICAL HIGHLIGHTS ---
-    highlights = {
-        'most_present_lecturer': None,
-        'highest_absence_lecturer': None
-    }
-    if detailed_breakdown:
-        most_present = sorted(detailed_breakdown, key=lambda x: x['classes_attended'], reverse=True)
-        highlights['most_present_lecturer'] = f"{most_present[0]['lecturer_name']} ({most_present[0]['classes_attended']} classes)"
-        
-        highest_absence = sorted(detailed_breakdown, key=lambda x: (x['classes_missed'] / x['total_classes'] if x['total_classes'] > 0 else 0), reverse=True)
-        highlights['highest_absence_lecturer'] = f"{highest_absence[0]['lecturer_name']} ({highest_absence[0]['classes_missed']} missed)"
-
-    final_report = {
-        'summary': {
-            'department_name': department.name,
-            'period': f"{start_date_str} to {end_date_str}",
-            'total_classes_recorded': total_classes,
-            'overall_attendance_rate': round(overall_attendance_rate, 2)
-        },
-        'breakdown': sorted(detailed_breakdown, key=lambda x: x['lecturer_name']),
-        'highlights': highlights
-    }
-    return final_report, None
-
 @shared_bp.route('/api/reports/generate', methods=['POST'])
 @jwt_required()
+@read_replica('POST')
 def generate_report():
     claims = get_jwt()
     if claims.get('role') != 'Admin':
@@ -117,41 +216,68 @@ def generate_report():
 
 @shared_bp.route('/api/reports/generate-csv', methods=['POST'])
 @jwt_required()
+@read_replica('POST')
 def generate_report_csv():
     claims = get_jwt()
     if claims.get('role') != 'Admin':
         return jsonify({'msg': 'Forbidden'}), 403
+    if request.json.get('mode') == 'rows':
+        return export_rows_csv(request.json)
     report_data, error = get_report_data(request.json)
     if error:
         return jsonify({'msg': error}), 400
-    summary = report_data['summary']
-    breakdown = report_data['breakdown']
-    highlights = report_data['highlights']
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    writer.writerow(['Lecturer Attendance Report'])
-    writer.writerow(['Department:', summary['department_name']])
-    writer.writerow(['Period:', summary['period']])
-    writer.writerow([])
-    writer.writerow(['STATISTICAL HIGHLIGHTS'])
-    writer.writerow(['Most Present:', highlights.get('most_present_lecturer', 'N/A')])
-    writer.writerow(['Most Absences:', highlights.get('highest_absence_lecturer', 'N/A')])
-    writer.writerow([])
-    writer.writerow(['DETAILED BREAKDOWN'])
-    writer.writerow(['Lecturer Name', 'Attended', 'Missed', 'Total Classes', 'Attendance Rate (%)'])
-    
-    for item in breakdown:
-        writer.writerow([
-            item['lecturer_name'],
-            item['classes_attended'],
-            item['classes_missed'],
-            item['total_classes'],
-            item['attendance_rate']
-        ])
-    
-    response = make_response(output.getvalue())
+    response = make_response(summary_csv(report_data))
     response.headers['Content-Type'] = 'text/csv'
-    response.headers['Content-Disposition'] = f"attachment; filename=attendance_report_{summary['department_name'].replace(' ', '_')}.csv"
-    return response
\ No newline at end of file
+    response.headers['Content-Disposition'] = f"attachment; filename={summary_csv_filename(report_data)}"
+    return response
+
+def export_rows_csv(filters):
+    query, error = get_row_export_query(filters)
+    if error:
+        return jsonify({'msg': error}), 400
+    response = Response(stream_with_context(stream_rows_csv(query)), mimetype='text/csv')
+    response.headers['Content-Disposition'] = f"attachment; filename=attendance_records_{filters['start_date']}_{filters['end_date']}.csv"
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# --- REPORT JOBS ---
+@shared_bp.route('/api/reports/jobs', methods=['POST'])
+@jwt_required()
+def create_report_job():
+    claims = get_jwt()
+    if claims.get('role') != 'Admin':
+        return jsonify({'msg': 'Forbidden'}), 403
+    data = request.json or {}
+    job, error = submit_report_job(data.get('kind', 'summary'), data, get_jwt_identity())
+    if error:
+        return jsonify({'msg': error}), 400
+    return jsonify(job.to_dict()), 200 if job.status == 'done' else 202
+
+@shared_bp.route('/api/reports/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_report_job(job_id):
+    claims = get_jwt()
+    if claims.get('role') != 'Admin':
+        return jsonify({'msg': 'Forbidden'}), 403
+    job = db.session.get(ReportJob, job_id)
+    if not job:
+        return jsonify({'msg': 'Report job not found'}), 404
+    return jsonify(job.to_dict())
+
+@shared_bp.route('/api/reports/jobs/<job_id>/result', methods=['GET'])
+@jwt_required()
+def download_report_job(job_id):
+    claims = get_jwt()
+    if claims.get('role') != 'Admin':
+        return jsonify({'msg': 'Forbidden'}), 403
+    job = db.session.get(ReportJob, job_id)
+    if not job:
+        return jsonify({'msg': 'Report job not found'}), 404
+    if job.status != 'done':
+        return jsonify({'msg': f'Report is {job.status}'}), 409
+    directory = os.path.abspath(current_app.config['REPORT_FOLDER'])
+    if job.kind == 'summary':
+        return send_from_directory(directory, job.result_file, mimetype='application/json')
+    filters = json.loads(job.filters)
+    download_name = f"attendance_{'records' if job.kind == 'rows-csv' else 'report'}_{filters['start_date']}_{filters['end_date']}.csv"
+    return send_from_directory(directory, job.result_file, mimetype='text/csv', as_attachment=True, download_name=download_name)
@@ -0,0 +1,65 @@
+# app/routing.py
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, g, has_app_context, request
+from flask_sqlalchemy.session import Session
+
+# With a "replica" bind configured (DATABASE_REPLICA_URL), views marked @read_replica send
+# their plain SELECTs to the replica. Everything else stays on the primary: writes, locking
+# reads, every read after the session has written, and every view not marked. A client who
+# has just written is also kept on the primary for REPLICA_STICKY_SECONDS, so the list they
+# reload right after saving shows their change even while the replica lags. The client
+# carries that state: a response to a request that wrote has an X-Last-Write header with the
+# time of the write, which the frontend sends back on its following requests. Any worker
+# process can then tell, and clients that do not send it simply read from the replica.
+REPLICA = 'replica'
+LAST_WRITE_HEADER = 'X-Last-Write'
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or (clause is not None and (clause.is_dml or getattr(clause, '_for_update_arg', None) is not None)):
+                self.info['wrote'] = True
+            elif clause is not None and clause.is_select and not self.info.get('wrote') and REPLICA in self._db.engines \
+                    and has_app_context() and g.get('read_replica'):
+                return self._db.engines[REPLICA]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def _wrote_recently():
+    wrote_at = request.headers.get(LAST_WRITE_HEADER, type=float)
+    if wrote_at is None:
+        return False
+    window = current_app.config['REPLICA_STICKY_SECONDS']
+    # A time beyond the window in the future was not set by us; it must not pin a client to the primary
+    return -window < time.time() - wrote_at < window
+
+def read_replica(*methods):
+    # Routes the listed methods of a view, e.g. @read_replica('GET') on a GET/POST view.
+    def decorator(view):
+        @wraps(view)
+        def routed(*args, **kwargs):
+            g.read_replica = request.method in methods and not _wrote_recently()
+            return view(*args, **kwargs)
+        return routed
+    return decorator
+
+@contextmanager
+def replica_reads(session):
+    # For background work that has committed its own writes and only reads from here on
+    session.info.pop('wrote', None)
+    g.read_replica = True
+    try:
+        yield
+    finally:
+        g.read_replica = False
+
+def _remember_writer(response):
+    from . import db
+    if db.session.info.get('wrote'):
+        response.headers[LAST_WRITE_HEADER] = f'{time.time():.3f}'
+    return response
+
+def init_replica_routing(app):
+    if REPLICA in app.config['SQLALCHEMY_BINDS']:
+        app.after_request(_remember_writer)
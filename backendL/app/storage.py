@@ -0,0 +1,129 @@
+# app/storage.py
+import hashlib
+import os
+import re
+import tempfile
+from flask import current_app, request, send_file, send_from_directory
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.formparser import parse_form_data
+
+# Uploaded files are stored under the SHA-256 of their content, sharded two levels deep
+# (UPLOAD_FOLDER/ab/cd/abcd....pdf), so an identical file submitted twice is kept once and a
+# stored name never points at different bytes. That makes downloads safe to cache forever.
+# Names from before content addressing stay flat in UPLOAD_FOLDER and are served as they were.
+PDF_MAGIC = b'%PDF-'
+STORED_NAME = re.compile(r'^([0-9a-f]{64})\.(pdf|jpg)$')
+MIMETYPES = {'pdf': 'application/pdf', 'jpg': 'image/jpeg'}
+
+class UploadRejected(Exception):
+    def __init__(self, msg, status=400):
+        super().__init__(msg)
+        self.msg = msg
+        self.status = status
+
+def _too_large(limit):
+    size = f'{limit // (1024 * 1024)} MB' if limit >= 1024 * 1024 else f'{limit // 1024} KB'
+    return UploadRejected(f'Files may be at most {size}', 413)
+
+class _HashingFile:
+    # What the form parser writes each uploaded part into: hashed and size-checked chunk by
+    # chunk on its way to a temporary file next to the store, so nothing is held in memory
+    def __init__(self, directory, limit):
+        self.file = tempfile.NamedTemporaryFile(dir=directory, prefix='.upload-', delete=False)
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.head = b''
+        self.limit = limit
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.limit:
+            raise RequestEntityTooLarge()
+        if len(self.head) < len(PDF_MAGIC):
+            self.head += data[:len(PDF_MAGIC)]
+        self.sha256.update(data)
+        return self.file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+def stored_path(name, root=None):
+    root = root or os.path.abspath(current_app.config['UPLOAD_FOLDER'])
+    return os.path.join(root, name[:2], name[2:4], name)
+
+def store_bytes(root, data, suffix):
+    # For derived files (compressed PDFs, thumbnails); also usable outside an app context
+    name = f'{hashlib.sha256(data).hexdigest()}.{suffix}'
+    path = stored_path(name, root)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=root, prefix='.upload-', delete=False) as temp:
+            temp.write(data)
+        os.replace(temp.name, path)
+    return name
+
+def receive_pdf(field='file'):
+    # Reads the request's multipart body itself (request.files would spool it through Werkzeug
+    # first) and returns (stored name, form fields). Raises UploadRejected.
+    limit = current_app.config['EXCUSE_MAX_BYTES']
+    # Werkzeug applies this to its parse buffer as well as to the text fields
+    form_memory = current_app.config['MAX_FORM_MEMORY_SIZE']
+    if request.content_length is not None and request.content_length > limit + form_memory:
+        raise _too_large(limit)
+    root = os.path.abspath(current_app.config['UPLOAD_FOLDER'])
+    os.makedirs(root, exist_ok=True)
+    parts = []
+
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        parts.append(_HashingFile(root, limit))
+        return parts[-1]
+
+    try:
+        try:
+            _, form, files = parse_form_data(
+                request.environ, stream_factory=stream_factory, max_form_memory_size=form_memory,
+                max_content_length=limit + form_memory, max_form_parts=10
+            )
+        except RequestEntityTooLarge:
+            raise _too_large(limit)
+        upload = files.get(field)
+        if not upload or upload.filename == '':
+            raise UploadRejected('No file selected')
+        part = upload.stream
+        if not part.head.startswith(PDF_MAGIC):
+            raise UploadRejected('Only PDF files are allowed')
+
+        name = f'{part.sha256.hexdigest()}.pdf'
+        path = stored_path(name)
+        part.close()
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(part.name, path)
+        return name, form
+    finally:
+        for part in parts:
+            part.close()
+            if os.path.exists(part.name):
+                os.remove(part.name)
+
+def send_upload(name):
+    match = STORED_NAME.match(name)
+    if not match:
+        return send_from_directory(os.path.abspath(current_app.config['UPLOAD_FOLDER']), name)
+    path = stored_path(name)
+    if not os.path.isfile(path):
+        return send_from_directory(os.path.dirname(path), name)   # the usual 404
+    max_age = current_app.config['UPLOAD_CACHE_SECONDS']
+    accel_prefix = current_app.config['UPLOAD_ACCEL_PREFIX']
+    if accel_prefix:
+        # nginx serves the file (ranges included) from an internal location aliased to UPLOAD_FOLDER
+        response = current_app.response_class(mimetype=MIMETYPES[match.group(2)])
+        response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{name[:2]}/{name[2:4]}/{name}"
+        response.set_etag(match.group(1))
+    else:
+        # Range and If-None-Match are answered here; with USE_X_SENDFILE the body is left to the web server
+        response = send_file(path, mimetype=MIMETYPES[match.group(2)], etag=match.group(1), max_age=max_age, conditional=True)
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    response.cache_control.immutable = True
+    return response
@@ -0,0 +1,198 @@
+# benchmarks/endpoints.py
+#
+# Times the endpoints of every blueprint through the Flask test client against a seeded
+# synthetic data set (benchmarks.synthetic), recording the SQL statements each request
+# issues and its latency percentiles, and compares the run with a stored baseline.
+#
+#   cd backendL
+#   python -m benchmarks.endpoints                      # compare with benchmarks/baseline.json
+#   python -m benchmarks.endpoints --save-baseline      # record a new baseline
+#   python -m benchmarks.endpoints --database-url mysql+pymysql://root:pw@localhost/lecats_bench
+#
+# --database-url must point at an EMPTY database; it is migrated from scratch. The data
+# set options (see --help) are stored with the baseline and a comparison only runs
+# against a baseline recorded with the same options and database backend.
+#
+# Exits with status 1 when an endpoint issues more statements than in the baseline or
+# its median latency grew by more than --tolerance and by more than --min-delta-ms. An endpoint
+# that looks slower is first measured --confirm more times and judged on the median of its
+# rounds, so one noisy round does not fail the run.
+# Query counts hold on any machine; latencies are only comparable on the machine that
+# recorded the baseline, so re-record it there before relying on them.
+#
+# Login and the write endpoints are left out so every request sees the same data;
+# benchmarks.login_throughput covers login.
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time as clock
+from datetime import date, timedelta
+
+from benchmarks.synthetic import DEFAULTS, add_arguments
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+def endpoints(ids):
+    today = date.today()
+    window = {'start_date': (today - timedelta(days=90)).isoformat(), 'end_date': today.isoformat()}
+    department = {**window, 'department_id': ids['department_id']}
+    return [
+        ('shared: departments', 'Admin', 'GET', '/api/departments', None),
+        ('admin: departments', 'Admin', 'GET', '/api/admin/departments', None),
+        ('admin: semesters', 'Admin', 'GET', '/api/admin/semesters', None),
+        ('admin: programs', 'Admin', 'GET', '/api/admin/programs', None),
+        ('admin: subjects', 'Admin', 'GET', '/api/admin/subjects', None),
+        ('admin: users', 'Admin', 'GET', '/api/admin/users', None),
+        ('admin: users page', 'Admin', 'GET', '/api/admin/users?limit=50&role=Lecturer', None),
+        ('hod: data-for-timetable', 'HOD', 'GET', '/api/hod/data-for-timetable', None),
+        ('hod: schedules', 'HOD', 'GET', '/api/hod/schedules', None),
+        ('hod: schedule conflicts', 'HOD', 'GET', '/api/hod/schedules/conflicts', None),
+        ('hod: pending attendance', 'HOD', 'GET', '/api/hod/attendance/pending', None),
+        ('hod: pending attendance page', 'HOD', 'GET', '/api/hod/attendance/pending?limit=50', None),
+        ('lecturer: dashboard-data', 'Lecturer', 'GET', '/api/lecturer/dashboard-data', None),
+        ('cr: todays-schedule', 'CR', 'GET', '/api/cr/todays-schedule', None),
+        ('reports: summary', 'Admin', 'POST', '/api/reports/generate', department),
+        ('reports: summary all', 'Admin', 'POST', '/api/reports/generate', {**window, 'department_id': 'all'}),
+        ('reports: summary csv', 'Admin', 'POST', '/api/reports/generate-csv', department),
+        ('reports: rows csv', 'Admin', 'POST', '/api/reports/generate-csv', {**department, 'mode': 'rows'}),
+    ]
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))] if samples else 0
+
+def run(args, options):
+    from sqlalchemy import event
+    from flask_jwt_extended import create_access_token
+    from flask_migrate import upgrade
+    from app import create_app, init_migrations, db
+    from benchmarks.synthetic import generate
+
+    app = create_app()
+    init_migrations(app)
+    with app.app_context():
+        upgrade()
+        started = clock.perf_counter()
+        ids = generate(**options)
+        print(f'seeded in {clock.perf_counter() - started:.1f}s: ' + ', '.join(f'{count} {name}' for name, count in ids.items() if not name.endswith('_id')))
+        backend = db.engine.dialect.name
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *a: statements.append(a[2]))
+        tokens = {
+            'Admin': create_access_token(identity='Admin', additional_claims={'role': 'Admin', 'full_name': 'Admin User'}),
+            'HOD': create_access_token(identity='HOD', additional_claims={'role': 'HOD', 'id': ids['hod_id'], 'department_id': ids['department_id']}),
+            'Lecturer': create_access_token(identity='Lecturer', additional_claims={'role': 'Lecturer', 'id': ids['lecturer_id'], 'department_id': ids['department_id']}),
+            'CR': create_access_token(identity='CR', additional_claims={'role': 'CR', 'id': ids['cr_id'], 'department_id': ids['department_id']}),
+        }
+
+    client = app.test_client()
+    cases = {name: (role, method, url, body) for name, role, method, url, body in endpoints(ids)}
+
+    def measure(name):
+        role, method, url, body = cases[name]
+        headers = {'Authorization': f'Bearer {tokens[role]}'}
+        latencies, counts = [], []
+        for attempt in range(args.warmup + args.repeat):
+            statements.clear()
+            started = clock.perf_counter()
+            response = client.open(url, method=method, json=body, headers=headers)
+            response.get_data()
+            elapsed = clock.perf_counter() - started
+            if response.status_code != 200:
+                sys.exit(f'{name}: {method} {url} returned {response.status_code}: {response.get_data(as_text=True)[:200]}')
+            if attempt >= args.warmup:
+                latencies.append(elapsed * 1000)
+                counts.append(len(statements))
+        return {
+            'queries': max(counts),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+        }
+
+    return backend, {name: measure(name) for name in cases}, measure
+
+def slower(result, base, args):
+    delta = result['p50_ms'] - base['p50_ms']
+    return delta > args.min_delta_ms and result['p50_ms'] > base['p50_ms'] * (1 + args.tolerance)
+
+def confirm(results, baseline, remeasure, args):
+    # A single slow round is usually the machine, not the code: an endpoint that looks slower
+    # is measured --confirm more times and keeps the median p50 of all its rounds
+    for name, result in results.items():
+        base = (baseline or {}).get(name)
+        if not base or not slower(result, base, args):
+            continue
+        rounds = [result['p50_ms']] + [remeasure(name)['p50_ms'] for _ in range(args.confirm)]
+        result['p50_ms'] = sorted(rounds)[len(rounds) // 2]
+        print(f'{name}: p50 over {len(rounds)} rounds {", ".join(f"{p:.2f}" for p in rounds)} ms')
+
+def compare(results, baseline, args):
+    regressions = []
+    print(f'{"endpoint":32s} {"queries":>8s} {"p50 ms":>9s} {"p95 ms":>9s} {"p99 ms":>9s} {"base p50":>9s} {"change":>8s}')
+    for name, result in results.items():
+        base = (baseline or {}).get(name)
+        notes = []
+        if base:
+            change = f'{(result["p50_ms"] / base["p50_ms"] - 1) * 100:+7.0f}%' if base['p50_ms'] else ''
+            if result['queries'] > base['queries']:
+                notes.append(f'queries {base["queries"]} -> {result["queries"]}')
+            if slower(result, base, args):
+                notes.append(f'p50 +{result["p50_ms"] - base["p50_ms"]:.1f} ms')
+            base_p50 = f'{base["p50_ms"]:9.2f}'
+        else:
+            change, base_p50 = '', f'{"-":>9s}'
+            if baseline is not None:
+                notes.append('not in baseline')
+        print(f'{name:32s} {result["queries"]:8d} {result["p50_ms"]:9.2f} {result["p95_ms"]:9.2f} {result["p99_ms"]:9.2f} {base_p50} {change:>8s}'
+              + (f'  <-- {", ".join(notes)}' if notes else ''))
+        if base and notes:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the API endpoints against seeded synthetic data.')
+    parser.add_argument('--database-url', default=None, help='an EMPTY database; defaults to a throwaway SQLite file')
+    parser.add_argument('--repeat', type=int, default=20, help='timed requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--output', help='also write this run as JSON to the given file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative p50 growth')
+    parser.add_argument('--min-delta-ms', type=float, default=5.0, help='ignore p50 growth below this')
+    parser.add_argument('--confirm', type=int, default=4, help='extra rounds for an endpoint that looks slower, compared by their median')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    options = {name: getattr(args, name) if getattr(args, name) is not None else default for name, default in DEFAULTS.items()}
+    os.environ['DATABASE_URL'] = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'endpoints.db')
+    backend, results, remeasure = run(args, options)
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            recorded = json.load(f)
+        if recorded['backend'] == backend and recorded['options'] == options:
+            baseline = recorded['endpoints']
+        else:
+            print(f'baseline {args.baseline} was recorded with {recorded["backend"]} and {recorded["options"]}; not comparing')
+    confirm(results, baseline, remeasure, args)
+    regressions = compare(results, baseline, args)
+    run_record = {'backend': backend, 'options': options, 'repeat': args.repeat, 'endpoints': results}
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(run_record, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(run_record, f, indent=2)
+            f.write('\n')
+        print(f'baseline saved to {args.baseline}')
+    elif regressions:
+        print(f'{len(regressions)} endpoint(s) regressed against the baseline')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# benchmarks/login_throughput.py
+#
+# Measures login throughput with many clients logging in at once, and how long a cheap
+# unrelated request takes while that burst is going on. Password checks run in the
+# hashing pool, so the probe latency should stay close to its idle value.
+#
+#   cd backendL
+#   python -m benchmarks.login_throughput --clients 16 --logins 10
+#
+# Pass --rehash to seed the users with a different hash method, so the first login of
+# every user also pays for the transparent upgrade to PASSWORD_HASH_METHOD.
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))] if samples else 0
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark concurrent logins.')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--logins', type=int, default=10, help='logins per client')
+    parser.add_argument('--users', type=int, default=32)
+    parser.add_argument('--rehash', action='store_true')
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+
+    from app import create_app, db
+    from app.models import Department, User
+    from app.hashing import hash_passwords
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        department = Department(name='Computing')
+        db.session.add(department)
+        db.session.flush()
+        seed_method = app.config['PASSWORD_HASH_METHOD']
+        if args.rehash:
+            app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:600000'
+        hashes = hash_passwords(['secret'] * args.users)
+        app.config['PASSWORD_HASH_METHOD'] = seed_method
+        db.session.add_all([User(full_name=f'User {i}', email=f'user{i}@example.com', password=hashes[i], role='CR', department_id=department.id) for i in range(args.users)])
+        db.session.commit()
+
+    login_latencies = []
+    probe_latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def login_client(n):
+        client = app.test_client()
+        for i in range(args.logins):
+            email = f'user{(n * args.logins + i) % args.users}@example.com'
+            started = time.perf_counter()
+            response = client.post('/auth/login', json={'email': email, 'password': 'secret'})
+            with lock:
+                login_latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    def probe():
+        client = app.test_client()
+        while not done.is_set():
+            started = time.perf_counter()
+            client.get('/api/departments')
+            probe_latencies.append(time.perf_counter() - started)
+            time.sleep(0.01)
+
+    probe_thread = threading.Thread(target=probe)
+    probe_thread.start()
+    time.sleep(0.2)
+    idle_probe = statistics.median(probe_latencies) if probe_latencies else 0
+    probe_latencies.clear()
+
+    started = time.perf_counter()
+    clients = [threading.Thread(target=login_client, args=(n,)) for n in range(args.clients)]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    probe_thread.join()
+
+    total = args.clients * args.logins
+    print(f'workers={app.config["PASSWORD_HASH_WORKERS"]} queue_limit={app.config["PASSWORD_HASH_QUEUE_LIMIT"]} method={app.config["PASSWORD_HASH_METHOD"]}')
+    print(f'{total} logins from {args.clients} clients in {elapsed:.2f}s: {total / elapsed:.1f} logins/s, statuses {statuses}')
+    print(f'login latency   p50 {percentile(login_latencies, 50) * 1000:8.1f} ms   p95 {percentile(login_latencies, 95) * 1000:8.1f} ms')
+    print(f'probe latency   idle {idle_probe * 1000:7.1f} ms   p50 {percentile(probe_latencies, 50) * 1000:8.1f} ms   p95 {percentile(probe_latencies, 95) * 1000:8.1f} ms')
+    os.remove(path)
+
+if __name__ == '__main__':
+    main()
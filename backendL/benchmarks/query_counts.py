@@ -0,0 +1,113 @@
+# benchmarks/query_counts.py
+#
+# Guards the list endpoints against N+1 regressions: every endpoint is called against
+# a small and a larger data set and must issue the same number of SQL statements.
+#
+#   cd backendL
+#   python -m benchmarks.query_counts
+#
+# Exits with status 1 if any endpoint's query count grows with the data size.
+import argparse
+import os
+import sys
+from datetime import date, datetime, time, timedelta
+
+parser = argparse.ArgumentParser(description='Check that list endpoints run a constant number of queries.')
+parser.add_argument('--small', type=int, default=2)
+parser.add_argument('--large', type=int, default=10)
+args = parser.parse_args()
+
+os.environ['DATABASE_URL'] = 'sqlite://'
+
+from sqlalchemy import event
+from flask_jwt_extended import create_access_token
+from app import create_app, db
+from app.models import Department, User, Semester, Program, Subject, ClassSchedule, ClassOccurrence, Attendance, SpecialSchedule
+from app.occurrences import sync_semester_occurrences, sync_special_occurrences
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+def seed(scale):
+    today = date.today()
+    department = Department(name='Computing')
+    db.session.add(department)
+    semester = Semester(year=today.year, semester_number=1, start_date=today - timedelta(days=30), end_date=today + timedelta(days=30), is_active=True)
+    db.session.add(semester)
+    db.session.flush()
+    hod = User(full_name='Head', email='hod@example.com', password='-', role='HOD', department_id=department.id)
+    cr = User(full_name='Rep', email='cr@example.com', password='-', role='CR', department_id=department.id)
+    lecturer = User(full_name='Lecturer', email='lecturer@example.com', password='-', role='Lecturer', department_id=department.id)
+    db.session.add_all([hod, cr, lecturer])
+    reporters = [cr]
+    for i in range(scale):
+        program = Program(name=f'Program {i}', level='Degree', department=department, duration_in_years=3)
+        extra_cr = User(full_name=f'Rep {i}', email=f'cr{i}@example.com', password='-', role='CR', department=department)
+        extra_lecturer = User(full_name=f'Lecturer {i}', email=f'lecturer{i}@example.com', password='-', role='Lecturer', department=department)
+        subject = Subject(name=f'Subject {i}', code=f'S{i}', program=program, year_of_study=1)
+        reporters.append(extra_cr)
+        db.session.add_all([program, extra_cr, extra_lecturer, subject])
+        db.session.flush()
+        for day in DAYS:
+            for owner in (lecturer, extra_lecturer):
+                db.session.add(ClassSchedule(subject_id=subject.id, lecturer_id=owner.id, semester_id=semester.id, day_of_week=day, start_time=time(8 + i % 9), end_time=time(17)))
+        for owner in (lecturer, extra_lecturer):
+            db.session.add(SpecialSchedule(subject_id=subject.id, lecturer_id=owner.id, class_date=today, start_time=time(9), end_time=time(10), creating_hod_id=hod.id, target_department_id=department.id))
+    db.session.flush()
+    sync_semester_occurrences(semester)
+    sync_special_occurrences()
+    # Attendance for half of today's classes, recorded by different CRs
+    todays = ClassOccurrence.query.filter_by(class_date=today).order_by(ClassOccurrence.id).all()
+    for n, occurrence in enumerate(todays[::2]):
+        reporter = reporters[n % len(reporters)]
+        db.session.add(Attendance(class_schedule_id=occurrence.class_schedule_id, occurrence_id=occurrence.id, cr_id=reporter.id, present=True, timestamp=datetime.now()))
+    db.session.commit()
+    return {
+        'Admin': {'role': 'Admin', 'full_name': 'Admin User'},
+        'HOD': {'role': 'HOD', 'id': hod.id, 'full_name': hod.full_name, 'department_id': department.id},
+        'Lecturer': {'role': 'Lecturer', 'id': lecturer.id, 'full_name': lecturer.full_name, 'department_id': department.id},
+        'CR': {'role': 'CR', 'id': cr.id, 'full_name': cr.full_name, 'department_id': department.id},
+    }
+
+ENDPOINTS = [
+    ('Admin', '/api/departments'),
+    ('Admin', '/api/admin/departments'),
+    ('Admin', '/api/admin/semesters'),
+    ('Admin', '/api/admin/programs'),
+    ('Admin', '/api/admin/subjects'),
+    ('Admin', '/api/admin/users'),
+    ('HOD', '/api/hod/data-for-timetable'),
+    ('HOD', '/api/hod/schedules'),
+    ('HOD', '/api/hod/attendance/pending'),
+    ('Lecturer', '/api/lecturer/dashboard-data'),
+    ('CR', '/api/cr/todays-schedule'),
+]
+
+def count_queries(scale):
+    app = create_app()
+    counts = {}
+    with app.app_context():
+        db.create_all()
+        claims = seed(scale)
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *a: statements.append(a[2]))
+        client = app.test_client()
+        for role, url in ENDPOINTS:
+            token = create_access_token(identity=role, additional_claims=claims[role])
+            db.session.remove()
+            statements.clear()
+            response = client.get(url, headers={'Authorization': f'Bearer {token}'})
+            if response.status_code != 200:
+                sys.exit(f'{url} returned {response.status_code}: {response.get_data(as_text=True)}')
+            counts[url] = len(statements)
+        db.drop_all()
+    return counts
+
+small = count_queries(args.small)
+large = count_queries(args.large)
+failed = False
+print(f'{"endpoint":40s} {"scale " + str(args.small):>10s} {"scale " + str(args.large):>10s}')
+for url in small:
+    flag = '' if small[url] == large[url] else '  <-- grows with data (N+1)'
+    failed = failed or bool(flag)
+    print(f'{url:40s} {small[url]:10d} {large[url]:10d}{flag}')
+sys.exit(1 if failed else 0)
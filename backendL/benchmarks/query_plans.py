@@ -0,0 +1,126 @@
+# benchmarks/query_plans.py
+#
+# Shows the query plans and timings of the hot query predicates before and after
+# the composite indexes added in migration 0002.
+#
+#   cd backendL
+#   python -m benchmarks.query_plans --attendance 200000
+#
+# Uses a throwaway SQLite file unless --database-url points at an EMPTY database
+# (e.g. a scratch MySQL schema); the script migrates it from scratch.
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time as clock
+from datetime import date, datetime, time, timedelta
+
+parser = argparse.ArgumentParser(description='Query plans before and after the hot-query indexes.')
+parser.add_argument('--database-url', default=None)
+parser.add_argument('--departments', type=int, default=10)
+parser.add_argument('--schedules', type=int, default=2000)
+parser.add_argument('--attendance', type=int, default=100000)
+parser.add_argument('--repeat', type=int, default=50)
+args = parser.parse_args()
+
+os.environ['DATABASE_URL'] = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'query_plans.db')
+
+from sqlalchemy import MetaData, select, insert
+from flask_migrate import upgrade
+from app import create_app, db, init_migrations
+from app.models import ClassSchedule, Attendance, SpecialSchedule
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+
+def seed():
+    # Seeds through the tables as they exist at revision 0001, not the current models
+    metadata = MetaData()
+    metadata.reflect(bind=db.engine)
+    Department, User, Semester, Program, Subject, ClassSchedule, Attendance, SpecialSchedule = (
+        metadata.tables[name] for name in ('departments', 'user', 'semester', 'program', 'subject', 'class_schedule', 'attendance', 'special_schedule')
+    )
+    rng = random.Random(42)
+    today = date.today()
+    db.session.execute(insert(Department), [{'name': f'Department {i}'} for i in range(args.departments)])
+    db.session.execute(insert(Semester), [{'year': today.year, 'semester_number': 1, 'start_date': today - timedelta(days=120), 'end_date': today + timedelta(days=30), 'is_active': True}])
+    db.session.execute(insert(User), [
+        {'full_name': f'User {i}', 'email': f'user{i}@example.com', 'password': '-', 'role': 'Lecturer' if i % 10 else 'CR', 'department_id': i % args.departments + 1}
+        for i in range(args.departments * 40)
+    ])
+    db.session.execute(insert(Program), [{'name': f'Program {i}', 'level': 'Degree', 'department_id': i + 1, 'duration_in_years': 3} for i in range(args.departments)])
+    db.session.execute(insert(Subject), [{'name': f'Subject {i}', 'code': f'S{i}', 'program_id': i % args.departments + 1, 'year_of_study': 1} for i in range(args.departments * 20)])
+    users = args.departments * 40
+    db.session.execute(insert(ClassSchedule), [
+        {'subject_id': rng.randint(1, args.departments * 20), 'lecturer_id': rng.randint(1, users), 'semester_id': 1,
+         'day_of_week': rng.choice(DAYS), 'start_time': time(rng.randint(7, 17)), 'end_time': time(18)}
+        for _ in range(args.schedules)
+    ])
+    db.session.execute(insert(SpecialSchedule), [
+        {'subject_id': rng.randint(1, args.departments * 20), 'lecturer_id': rng.randint(1, users), 'class_date': today + timedelta(days=rng.randint(-120, 30)),
+         'start_time': time(rng.randint(7, 17)), 'end_time': time(18), 'creating_hod_id': 1, 'target_department_id': rng.randint(1, args.departments)}
+        for _ in range(args.schedules // 4)
+    ])
+    start = datetime.combine(today - timedelta(days=120), time(8))
+    for offset in range(0, args.attendance, 10000):
+        db.session.execute(insert(Attendance), [
+            {'class_schedule_id': rng.randint(1, args.schedules), 'cr_id': rng.randint(1, users), 'present': rng.random() < 0.8,
+             'timestamp': start + timedelta(minutes=rng.randint(0, 120 * 24 * 60)), 'verified': rng.random() < 0.7}
+            for _ in range(min(10000, args.attendance - offset))
+        ])
+    db.session.commit()
+
+def hot_queries():
+    today = date.today()
+    today_start, today_end = datetime.combine(today, time.min), datetime.combine(today, time.max)
+    return {
+        'submit_attendance duplicate check': select(Attendance.id).where(
+            Attendance.class_schedule_id == 7, Attendance.timestamp.between(today_start, today_end)),
+        'verified attendance in a date range': select(Attendance.id).where(
+            Attendance.verified == True, Attendance.timestamp.between(today_start - timedelta(days=30), today_end)),
+        'todays weekly classes for a semester': select(ClassSchedule.id).where(
+            ClassSchedule.semester_id == 1, ClassSchedule.day_of_week == today.strftime('%A')),
+        'todays special classes for a department': select(SpecialSchedule.id).where(
+            SpecialSchedule.class_date == today, SpecialSchedule.target_department_id == 3),
+        'upcoming special classes for a lecturer': select(SpecialSchedule.id).where(
+            SpecialSchedule.lecturer_id == 11, SpecialSchedule.class_date >= today),
+    }
+
+def explain(connection, statement):
+    compiled = statement.compile(dialect=connection.dialect)
+    params = compiled.construct_params()
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.dialect.name == 'sqlite' else 'EXPLAIN '
+    plan = connection.exec_driver_sql(prefix + str(compiled), params).fetchall()
+    started = clock.perf_counter()
+    for _ in range(args.repeat):
+        connection.exec_driver_sql(str(compiled), params).fetchall()
+    elapsed_ms = (clock.perf_counter() - started) / args.repeat * 1000
+    return plan, elapsed_ms
+
+def report(label):
+    print(f'\n=== {label} ===')
+    results = {}
+    with db.engine.connect() as connection:
+        for name, statement in hot_queries().items():
+            plan, elapsed_ms = explain(connection, statement)
+            results[name] = elapsed_ms
+            print(f'\n-- {name}: {elapsed_ms:.3f} ms/query')
+            for row in plan:
+                print('   ', ' | '.join(str(col) for col in row))
+    return results
+
+app = create_app()
+init_migrations(app)
+with app.app_context():
+    if db.inspect(db.engine).get_table_names():
+        sys.exit('Refusing to run against a non-empty database.')
+    upgrade(revision='0001')
+    seed()
+    before = report('BEFORE (revision 0001, no composite indexes)')
+    upgrade(revision='0002')
+    after = report('AFTER (revision 0002, composite indexes)')
+    print('\n=== SUMMARY (ms/query) ===')
+    for name in before:
+        print(f'{name:45s} {before[name]:9.3f} -> {after[name]:9.3f}  ({before[name] / max(after[name], 1e-9):.1f}x)')
@@ -0,0 +1,108 @@
+# benchmarks/replica_routing.py
+#
+# Checks which database each request's statements go to when a read replica is configured.
+# Two SQLite files stand in for the primary and the replica: the replica is a copy taken
+# after seeding, so it lags behind every write made during the check, like a real replica
+# that has not caught up yet. Requests go through the Flask test client and every statement
+# is attributed to the engine that ran it.
+#
+#   cd backendL
+#   python -m benchmarks.replica_routing
+#
+# Exits with status 1 when a request reads from the wrong database or a read-your-writes
+# request sees the replica's stale data.
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+def main():
+    parser = argparse.ArgumentParser(description='Check read replica routing against two local SQLite databases.')
+    parser.parse_args()
+
+    scratch = tempfile.mkdtemp()
+    primary_path, replica_path = os.path.join(scratch, 'primary.db'), os.path.join(scratch, 'replica.db')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + primary_path
+    os.environ['DATABASE_REPLICA_URL'] = 'sqlite:///' + replica_path
+
+    from sqlalchemy import event
+    from flask_jwt_extended import create_access_token
+    from flask_migrate import upgrade
+    from app import create_app, init_migrations, db
+    from app.models import Attendance, ClassOccurrence
+    from app.routing import LAST_WRITE_HEADER, REPLICA
+    from benchmarks.synthetic import generate
+
+    app = create_app()
+    init_migrations(app)
+    with app.app_context():
+        upgrade()
+        ids = generate(departments=1, lecturers=2, subjects=1, crs=1, semesters=2, years=1, specials=1)
+        pending_id = db.session.query(Attendance.id).join(ClassOccurrence, Attendance.occurrence_id == ClassOccurrence.id).filter(
+            ClassOccurrence.department_id == ids['department_id'], Attendance.verified == False
+        ).order_by(Attendance.id).limit(1).scalar()
+        for engine in db.engines.values():
+            engine.dispose()
+        shutil.copyfile(primary_path, replica_path)
+
+        used = []
+        for name, engine in (('primary', db.engines[None]), ('replica', db.engines[REPLICA])):
+            event.listen(engine, 'before_cursor_execute', lambda *args, name=name: used.append(name))
+        tokens = {
+            'Admin': create_access_token(identity='Admin', additional_claims={'role': 'Admin', 'full_name': 'Admin User'}),
+            'HOD': create_access_token(identity='HOD', additional_claims={'role': 'HOD', 'id': ids['hod_id'], 'department_id': ids['department_id']}),
+        }
+
+    client = app.test_client()
+    window = app.config['REPLICA_STICKY_SECONDS']
+    failures = []
+
+    def check(label, role, method, url, expected, last_write=None, body=None):
+        used.clear()
+        headers = {'Authorization': f'Bearer {tokens[role]}'}
+        if last_write is not None:
+            headers[LAST_WRITE_HEADER] = f'{last_write:.3f}'
+        response = client.open(url, method=method, json=body, headers=headers)
+        if response.status_code != 200:
+            sys.exit(f'{label}: {method} {url} returned {response.status_code}: {response.get_data(as_text=True)[:200]}')
+        got = ', '.join(sorted(set(used))) or '-'
+        ok = got == expected
+        print(f'{label:52s} {expected:8s} {got:17s} {"ok" if ok else "WRONG"}')
+        if not ok:
+            failures.append(label)
+        return response
+
+    print(f'{"request":52s} {"expected":8s} {"statements ran on":17s}')
+    check('marked GET view', 'HOD', 'GET', '/api/hod/schedules', 'replica')
+    check('marked POST view (report)', 'Admin', 'POST', '/api/reports/generate', 'replica', body={
+        'start_date': '2000-01-01', 'end_date': '2100-01-01', 'department_id': ids['department_id']
+    })
+    check('unmarked view', 'Admin', 'GET', '/api/departments', 'primary')
+    saved = check('write', 'HOD', 'POST', f'/api/hod/attendance/verify/{pending_id}', 'primary')
+    wrote_at = saved.headers.get(LAST_WRITE_HEADER, type=float)
+    if wrote_at is None:
+        print(f'the write response has no {LAST_WRITE_HEADER} header')
+        failures.append('write header')
+        wrote_at = time.time()
+
+    # The replica still lists the verified record as pending; only the primary has the write
+    pending = lambda response: any(row['id'] == pending_id for row in response.get_json())
+    fresh = check('marked view, just wrote (header sent back)', 'HOD', 'GET', '/api/hod/attendance/pending', 'primary', last_write=wrote_at)
+    if pending(fresh):
+        print('the read after the write did not see it')
+        failures.append('read your writes')
+    stale = check('marked view, no header (another client)', 'HOD', 'GET', '/api/hod/attendance/pending', 'replica')
+    if not pending(stale):
+        print('the replica copy already has the write; the check above proves nothing')
+        failures.append('replica lag')
+    check('marked view, write older than the window', 'HOD', 'GET', '/api/hod/attendance/pending', 'replica', last_write=time.time() - window - 1)
+    check('marked view, write time far in the future', 'HOD', 'GET', '/api/hod/attendance/pending', 'replica', last_write=time.time() + window * 10)
+
+    shutil.rmtree(scratch, ignore_errors=True)
+    if failures:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# benchmarks/startup.py
+#
+# Times a cold start of the WSGI entry point: a fresh interpreter importing wsgi.py, which
+# builds the app, exactly as each server worker does when it is not preloaded. Every run also
+# checks that startup is free of side effects: no database connection, no files or folders
+# created, and none of the heavy modules that only background jobs or the CLI need imported.
+#
+#   cd backendL
+#   python -m benchmarks.startup                  # median of 10 cold starts
+#   python -m benchmarks.startup --max-ms 1500    # also fail when the median is slower
+#
+# Exits with status 1 when a side effect is found or the median exceeds --max-ms.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Needed by background jobs or the `flask db` commands only, never by a serving worker
+DEFERRED_MODULES = ('alembic', 'flask_migrate', 'pypdf', 'PIL')
+
+PROBE = '''
+import json, os, sys, time
+started = time.perf_counter()
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+connections = []
+event.listen(Engine, 'connect', lambda *args: connections.append(1))
+created = []
+makedirs = os.makedirs
+os.makedirs = lambda path, *args, **kwargs: (created.append(str(path)), makedirs(path, *args, **kwargs))[1]
+import wsgi
+ready = time.perf_counter()
+print(json.dumps({
+    'startup_ms': (ready - started) * 1000,
+    'connections': len(connections),
+    'created': created,
+    'deferred_imported': [name for name in sys.argv[1:] if name in sys.modules],
+}))
+'''
+
+def cold_start(environment):
+    output = subprocess.run([sys.executable, '-c', PROBE, *DEFERRED_MODULES], cwd=BACKEND, env=environment,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+def main():
+    parser = argparse.ArgumentParser(description='Time cold starts of the WSGI entry point and check they have no side effects.')
+    parser.add_argument('--repeat', type=int, default=10, help='cold starts to time')
+    parser.add_argument('--max-ms', type=float, help='fail when the median startup is slower than this')
+    parser.add_argument('--output', help='also write the run as JSON to the given file')
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp()
+    database = os.path.join(scratch, 'startup.db')
+    environment = dict(os.environ, DATABASE_URL='sqlite:///' + database)
+    environment.pop('FLASK_RUN_FROM_CLI', None)
+    cold_start(environment)   # warms the OS file cache, like any deploy after the first
+    runs = [cold_start(environment) for _ in range(args.repeat)]
+
+    timings = [run['startup_ms'] for run in runs]
+    problems = sorted({
+        *(f'{run["connections"]} database connection(s) opened' for run in runs if run['connections']),
+        *(f'created {path}' for run in runs for path in run['created']),
+        *(f'imported {name}' for run in runs for name in run['deferred_imported']),
+    })
+    if os.path.exists(database):
+        problems.append('the database file was created')
+    median = percentile(timings, 50)
+    print(f'cold start over {args.repeat} runs: min {min(timings):.0f} ms, median {median:.0f} ms, p95 {percentile(timings, 95):.0f} ms')
+    for problem in problems:
+        print(f'side effect: {problem}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'repeat': args.repeat, 'startup_ms': timings, 'side_effects': problems}, f, indent=2)
+    if problems or (args.max_ms is not None and median > args.max_ms):
+        if args.max_ms is not None and median > args.max_ms:
+            print(f'median startup {median:.0f} ms is over the {args.max_ms:.0f} ms budget')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+# benchmarks/synthetic.py
+#
+# Seeded synthetic data built on the application models: departments with programs,
+# subjects, HODs, lecturers and CRs, a run of semesters ending with an active one around
+# today, weekly and special timetables, their occurrences, and attendance history for
+# every past class. The same options and seed always produce the same data set.
+#
+# Used by benchmarks.endpoints, or on its own to fill an EMPTY database (migrated from
+# scratch here) for manual testing against a realistic volume:
+#
+#   cd backendL
+#   python -m benchmarks.synthetic --database-url mysql+pymysql://root:pw@localhost/lecats_bench --years 3
+#
+# Every generated user has the password "password".
+import argparse
+import os
+import random
+from datetime import date, datetime, time, timedelta
+
+DEFAULTS = {
+    'departments': 3,
+    'lecturers': 8,            # per department
+    'subjects': 2,             # per lecturer
+    'classes_per_week': 2,     # weekly slots per subject
+    'crs': 3,                  # per department
+    'semesters': 2,            # per year
+    'years': 1,                # of attendance history, ending with the active semester
+    'specials': 4,             # special classes per department in the active semester
+    'attendance_rate': 0.8,    # share of classes marked present
+    'seed': 1,
+}
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+PROGRAM_LEVELS = ['Certificate', 'Diploma', 'Degree']
+ATTENDANCE_BATCH_SIZE = 5000
+
+def semester_ranges(semesters, years, today):
+    # Back-to-back semesters, the last one centred on today so it has both history and upcoming classes
+    length = 365 // semesters
+    end = today + timedelta(days=length // 2)
+    ranges = []
+    for n in range(semesters * years):
+        start = end - timedelta(days=length - 1)
+        ranges.append((start, end))
+        end = start - timedelta(days=1)
+    return list(reversed(ranges))
+
+def generate(**options):
+    # Must run inside an app context on empty tables. Returns the row counts and one
+    # user id of each role in the first department, for building JWT claims.
+    from sqlalchemy import insert, select
+    from werkzeug.security import generate_password_hash
+    from flask import current_app
+    from app.models import db, Department, User, Semester, Program, Subject, ClassSchedule, SpecialSchedule, ClassOccurrence, Attendance
+    from app.occurrences import sync_semester_occurrences, sync_special_occurrences
+    from app.rollups import rebuild_rollup
+
+    opts = {**DEFAULTS, **{k: v for k, v in options.items() if v is not None}}
+    rng = random.Random(opts['seed'])
+    today = date.today()
+    password = generate_password_hash('password', current_app.config['PASSWORD_HASH_METHOD'])
+
+    ranges = semester_ranges(opts['semesters'], opts['years'], today)
+    semesters = [Semester(year=start.year, semester_number=sum(1 for other, _ in ranges[:n] if other.year == start.year) + 1,
+                          start_date=start, end_date=end, is_active=n == len(ranges) - 1)
+                 for n, (start, end) in enumerate(ranges)]
+    db.session.add_all(semesters)
+
+    staff = {}
+    for d in range(opts['departments']):
+        department = Department(name=f'Department {d + 1}')
+        db.session.add(department)
+        hod = User(full_name=f'Head {d + 1}', email=f'hod{d + 1}@example.com', password=password, role='HOD', department=department)
+        lecturers = [User(full_name=f'Lecturer {d + 1}.{i + 1}', email=f'lecturer{d + 1}.{i + 1}@example.com', password=password, role='Lecturer', department=department)
+                     for i in range(opts['lecturers'])]
+        crs = [User(full_name=f'Rep {d + 1}.{i + 1}', email=f'cr{d + 1}.{i + 1}@example.com', password=password, role='CR', department=department)
+               for i in range(opts['crs'])]
+        programs = [Program(name=f'{level} {d + 1}', level=level, department=department, duration_in_years=3) for level in PROGRAM_LEVELS]
+        subjects = [(Subject(name=f'Subject {d + 1}.{i + 1}.{n + 1}', code=f'D{d + 1}L{i + 1}S{n + 1}', program=rng.choice(programs), year_of_study=rng.randint(1, 3)), lecturer)
+                    for i, lecturer in enumerate(lecturers) for n in range(opts['subjects'])]
+        db.session.add_all([hod, *lecturers, *crs, *programs, *[subject for subject, _ in subjects]])
+        staff[department] = (hod, crs, subjects)
+    db.session.flush()
+
+    for semester in semesters:
+        db.session.execute(insert(ClassSchedule), [{
+            'subject_id': subject.id, 'lecturer_id': lecturer.id, 'semester_id': semester.id,
+            'day_of_week': rng.choice(WEEKDAYS), 'start_time': time(hour), 'end_time': time(hour + rng.choice([1, 2]))
+        } for _, _, subjects in staff.values() for subject, lecturer in subjects
+          for hour in rng.sample(range(8, 17), opts['classes_per_week'])])
+        sync_semester_occurrences(semester)
+    active = semesters[-1]
+    for department, (hod, _, subjects) in staff.items():
+        for _ in range(opts['specials']):
+            subject, lecturer = rng.choice(subjects)
+            hour = rng.randint(8, 16)
+            db.session.add(SpecialSchedule(subject_id=subject.id, lecturer_id=lecturer.id, class_date=today + timedelta(days=rng.randint(-14, 14)),
+                                           start_time=time(hour), end_time=time(hour + 1), creating_hod_id=hod.id, target_department_id=department.id))
+    db.session.flush()
+    sync_special_occurrences()
+
+    # Every class before today has a mark from one of its department's CRs; today's are left open
+    reporters = {department.id: [cr.id for cr in crs] for department, (_, crs, _) in staff.items()}
+    past = db.session.execute(
+        select(ClassOccurrence.id, ClassOccurrence.class_schedule_id, ClassOccurrence.department_id, ClassOccurrence.class_date, ClassOccurrence.start_time)
+        .where(ClassOccurrence.class_date < today).order_by(ClassOccurrence.id)
+    ).all()
+    attendance = 0
+    for offset in range(0, len(past), ATTENDANCE_BATCH_SIZE):
+        rows = []
+        for occurrence in past[offset:offset + ATTENDANCE_BATCH_SIZE]:
+            present = rng.random() < opts['attendance_rate']
+            rows.append({
+                'class_schedule_id': occurrence.class_schedule_id, 'occurrence_id': occurrence.id,
+                'cr_id': rng.choice(reporters[occurrence.department_id]), 'present': present,
+                'timestamp': datetime.combine(occurrence.class_date, occurrence.start_time) + timedelta(minutes=rng.randint(5, 50)),
+                'attendance_date': occurrence.class_date,
+                'verified': (today - occurrence.class_date).days > 7 and rng.random() < 0.9,
+                'excuse_comment': 'Attending a workshop' if not present and rng.random() < 0.2 else None,
+            })
+        db.session.execute(insert(Attendance), rows)
+        attendance += len(rows)
+    rebuild_rollup()
+    db.session.commit()
+
+    department, (hod, crs, subjects) = next(iter(staff.items()))
+    return {
+        'departments': len(staff),
+        'users': sum(1 + len(crs) + opts['lecturers'] for _, crs, _ in staff.values()),
+        'subjects': sum(len(subjects) for _, _, subjects in staff.values()),
+        'semesters': len(semesters),
+        'occurrences': db.session.query(ClassOccurrence).count(),
+        'attendance': attendance,
+        'active_semester_id': active.id,
+        'department_id': department.id,
+        'hod_id': hod.id,
+        'lecturer_id': subjects[0][1].id,
+        'cr_id': crs[0].id,
+    }
+
+def add_arguments(parser):
+    for name, default in DEFAULTS.items():
+        parser.add_argument('--' + name.replace('_', '-'), type=type(default), default=None, help=f'default {default}')
+
+def main():
+    parser = argparse.ArgumentParser(description='Fill an empty database with seeded synthetic data.')
+    parser.add_argument('--database-url', required=True)
+    add_arguments(parser)
+    args = parser.parse_args()
+    os.environ['DATABASE_URL'] = args.database_url
+
+    from flask_migrate import upgrade
+    from app import create_app, init_migrations
+
+    app = create_app()
+    init_migrations(app)
+    with app.app_context():
+        upgrade()
+        counts = generate(**{name: getattr(args, name) for name in DEFAULTS})
+    print(', '.join(f'{count} {name}' for name, count in counts.items() if not name.endswith('_id')))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# gunicorn.conf.py -- production serving: gunicorn -c gunicorn.conf.py wsgi:app
+#
+# The app is imported once in the master (preload_app) and the workers are forked from it, so
+# they share its memory copy-on-write and a deploy pays the import cost once, not per worker.
+# Startup opens no database connections (benchmarks/startup.py checks this); the engines'
+# pools are still reset after each fork so no worker ever reuses a connection from its parent.
+#
+# Workers are gevent by default: every open dashboard holds a /api/events/stream connection,
+# which costs a greenlet there instead of a thread. WORKER_CLASS=gthread runs plain threads;
+# each stream then takes one of the WORKER_THREADS for as long as it is open, so the streams
+# per worker are capped at a quarter of the threads unless EVENTS_MAX_STREAMS says otherwise.
+#
+# Each worker keeps its request metrics in PROMETHEUS_MULTIPROC_DIR, emptied at every start,
+# so a scrape of /metrics reports all workers together whichever one answers it.
+import gc
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+worker_class = os.environ.get('WORKER_CLASS', 'gevent')
+if worker_class == 'gevent':
+    # Before the app is preloaded, like run.py's SERVER=gevent
+    from gevent import monkey
+    monkey.patch_all()
+
+# Before the app is preloaded: prometheus_client picks its storage when it is first imported
+metrics_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'lecats-metrics'))
+shutil.rmtree(metrics_dir, ignore_errors=True)
+os.makedirs(metrics_dir)
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY') or multiprocessing.cpu_count() * 2 + 1)
+threads = int(os.environ.get('WORKER_THREADS') or 4)
+worker_connections = int(os.environ.get('WORKER_CONNECTIONS') or 1000)
+if worker_class == 'gthread':
+    # Read by config.py when the app is preloaded below
+    os.environ.setdefault('EVENTS_MAX_STREAMS', str(max(1, threads // 4)))
+preload_app = True
+
+# Recycle workers now and then to bound slow leaks; the jitter keeps them from restarting together
+max_requests = int(os.environ.get('MAX_REQUESTS') or 2000)
+max_requests_jitter = max_requests // 10
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+accesslog = '-'
+
+def when_ready(server):
+    # Everything allocated while preloading lives as long as the master. Moving it out of the
+    # collector's reach stops gc passes in the workers from touching (and so copying) those pages.
+    gc.freeze()
+
+def post_fork(server, worker):
+    from app import db
+    with server.app.callable.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
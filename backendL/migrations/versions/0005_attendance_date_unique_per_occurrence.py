@@ -0,0 +1,57 @@
+"""attendance date unique per occurrence
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 07:59:30.278125
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+attendance = sa.table('attendance', sa.column('id'), sa.column('occurrence_id'), sa.column('timestamp', sa.DateTime),
+                      sa.column('attendance_date', sa.Date))
+class_occurrence = sa.table('class_occurrence', sa.column('id'), sa.column('class_date', sa.Date))
+
+
+def upgrade():
+    with op.batch_alter_table('attendance', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('attendance_date', sa.Date(), nullable=True))
+
+    # Existing rows take the date of their class, falling back to the day they were recorded
+    class_date = sa.select(class_occurrence.c.class_date).where(class_occurrence.c.id == attendance.c.occurrence_id).scalar_subquery()
+    op.execute(attendance.update().values(attendance_date=sa.func.coalesce(class_date, sa.func.date(attendance.c.timestamp))))
+
+    # The old check-then-insert could race; keep the first mark per class and day and detach the rest
+    bind = op.get_bind()
+    seen = set()
+    duplicates = []
+    for row in bind.execute(sa.select(attendance.c.id, attendance.c.occurrence_id, attendance.c.attendance_date)
+                            .where(attendance.c.occurrence_id.is_not(None)).order_by(attendance.c.id)):
+        key = (row.occurrence_id, row.attendance_date)
+        if key in seen:
+            duplicates.append(row.id)
+        seen.add(key)
+    if duplicates:
+        logger.warning("Detaching duplicate attendance rows from their class occurrence: %s", duplicates)
+        op.execute(attendance.update().where(attendance.c.id.in_(duplicates)).values(occurrence_id=None))
+
+    with op.batch_alter_table('attendance', schema=None) as batch_op:
+        batch_op.alter_column('attendance_date', existing_type=sa.Date(), nullable=False)
+        batch_op.create_unique_constraint('uq_attendance_occurrence_date', ['occurrence_id', 'attendance_date'])
+
+
+def downgrade():
+    with op.batch_alter_table('attendance', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_attendance_occurrence_date', type_='unique')
+        batch_op.drop_column('attendance_date')
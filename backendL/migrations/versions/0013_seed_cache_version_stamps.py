@@ -0,0 +1,32 @@
+"""seed cache version stamps
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-18 09:00:29.587009
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0013'
+down_revision = '0012'
+branch_labels = None
+depends_on = None
+
+
+# The stamps bumped by app/cache.py; 0003 only seeded 'semester' and the others were inserted
+# on first use, where two concurrent first writers could collide
+NAMES = ['semester', 'departments', 'programs', 'subjects', 'users']
+
+
+def upgrade():
+    cache_version = sa.table('cache_version', sa.column('name', sa.String), sa.column('version', sa.Integer))
+    existing = {name for (name,) in op.get_bind().execute(sa.select(cache_version.c.name).where(cache_version.c.name.in_(NAMES)))}
+    op.bulk_insert(cache_version, [{'name': name, 'version': 0} for name in NAMES if name not in existing])
+
+
+def downgrade():
+    # The rows are harmless to older code, which only inserted them when missing
+    pass
@@ -1,6 +1,21 @@
+import os
+
+# Development server only; production runs gunicorn with wsgi.py (see gunicorn.conf.py).
+# FLASK_DEBUG=1 turns on the debugger and reloader.
+# SERVER=gevent serves every request on a greenlet, so hundreds of idle /api/events/stream
+# connections cost no thread each. Patching has to happen before anything else is imported.
+GEVENT = os.environ.get('SERVER') == 'gevent'
+if GEVENT:
+    from gevent import monkey
+    monkey.patch_all()
+
 from app import create_app
 
 app = create_app()
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    if GEVENT:
+        from gevent.pywsgi import WSGIServer
+        WSGIServer((os.environ.get('HOST') or '127.0.0.1', int(os.environ.get('PORT') or 5000)), app).serve_forever()
+    else:
+        app.run(threaded=True)
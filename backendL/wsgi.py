@@ -0,0 +1,6 @@
+# Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+# Building the app opens no connections and writes nothing, so it is safe to import in a
+# preforking master. Run `flask --app wsgi init` once per deploy to set up folders and schema.
+from app import create_app
+
+app = create_app()
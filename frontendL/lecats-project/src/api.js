@@ -6,6 +6,15 @@ const api = axios.create({
   baseURL: 'http://localhost:5000',
 });
 
+// A response to a request that saved something carries the time of the write; sending it back
+// keeps this browser's reads on the primary database until a lagging read replica has caught up
+const LAST_WRITE_HEADER = 'X-Last-Write';
+
+const rememberLastWrite = (response) => {
+  const wroteAt = response?.headers?.[LAST_WRITE_HEADER.toLowerCase()];
+  if (wroteAt) localStorage.setItem('lastWrite', wroteAt);
+};
+
 // This is an "interceptor" that runs before each request is sent
 api.interceptors.request.use(
   (config) => {
@@ -14,6 +23,10 @@ api.interceptors.request.use(
       // If a token exists, add it to the Authorization header
       config.headers.Authorization = `Bearer ${token}`;
     }
+    const lastWrite = localStorage.getItem('lastWrite');
+    if (lastWrite) {
+      config.headers[LAST_WRITE_HEADER] = lastWrite;
+    }
     return config;
   },
   (error) => {
@@ -23,8 +36,12 @@ api.interceptors.request.use(
 
 // You can also add an interceptor to handle errors globally
 api.interceptors.response.use(
-  (response) => response,
+  (response) => {
+    rememberLastWrite(response);
+    return response;
+  },
   (error) => {
+    rememberLastWrite(error.response);
 
     if (error.response && error.response.status === 401) {
       toast.error("Session expired. Please log in again.");
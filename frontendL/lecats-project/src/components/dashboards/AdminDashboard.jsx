@@ -4,11 +4,20 @@ import { Modal, Button, Form, Accordion, Nav, Tab } from 'react-bootstrap';
 import { Trash, Building, CalendarCheck, CheckCircleFill, MortarboardFill, Book, PencilSquare, Power, FileEarmarkPdf } from 'react-bootstrap-icons';
 import api from '../../api';
 import useDarkMode from '../../useDarkMode';
+import useChangeFeed, { applyChanges, needsReload } from '../../useChangeFeed';
 import ReportCharts from './ReportCharts';
 
+const USERS_PAGE_SIZE = 50;
+const REPORT_POLL_INTERVAL_MS = 1000;
+// Give up on a report job that has not settled after this long
+const REPORT_POLL_TIMEOUT_MS = 5 * 60 * 1000;
+const CHANGE_SCOPE = 'users,departments,semesters,programs,subjects';
+
 function AdminDashboard() {
   const [theme] = useDarkMode();
   const [users, setUsers] = useState([]);
+  const [usersCursor, setUsersCursor] = useState(null);
+  const [userFilters, setUserFilters] = useState({ search: '', role: '', department_id: '' });
   const [departments, setDepartments] = useState([]);
   const [semesters, setSemesters] = useState([]);
   const [programs, setPrograms] = useState([]);
@@ -33,10 +42,33 @@ function AdminDashboard() {
     fetchSubjects();
   };
 
-  async function fetchUsers() {
+  const syncChanges = useChangeFeed(CHANGE_SCOPE, (changes) => {
+    // Rows show the name of their department or program, so editing one reloads the lists naming it
+    const renamed = (entity) => changes.some(change => change.entity === entity && change.action !== 'insert');
+    if (needsReload(changes, 'users') || renamed('departments')) fetchUsers();
+    else setUsers(prev => applyChanges(prev, changes, 'users', matchesUserFilters));
+    setDepartments(prev => applyChanges(prev, changes, 'departments'));
+    setSemesters(prev => applyChanges(prev, changes, 'semesters'));
+    if (renamed('departments')) fetchPrograms();
+    else setPrograms(prev => applyChanges(prev, changes, 'programs'));
+    if (needsReload(changes, 'subjects') || renamed('programs')) fetchSubjects();
+    else setSubjects(prev => applyChanges(prev, changes, 'subjects'));
+  });
+
+  const matchesUserFilters = (user) => {
+    const search = userFilters.search.toLowerCase();
+    return (!userFilters.role || user.role === userFilters.role)
+      && (!userFilters.department_id || String(user.department_id) === String(userFilters.department_id))
+      && (!search || user.full_name.toLowerCase().includes(search) || user.email.toLowerCase().includes(search));
+  };
+
+  async function fetchUsers(cursor = null, filters = userFilters) {
     try {
-      const res = await api.get('/api/admin/users');
-      setUsers(res.data);
+      const params = { limit: USERS_PAGE_SIZE, ...filters };
+      if (cursor) params.cursor = cursor;
+      const res = await api.get('/api/admin/users', { params });
+      setUsers(prev => cursor ? [...prev, ...res.data.items] : res.data.items);
+      setUsersCursor(res.data.next_cursor);
     } catch (error) { toast.error('Failed to fetch users'); }
   }
   async function fetchDepartments() {
@@ -68,6 +100,11 @@ function AdminDashboard() {
     } catch (error) { toast.error('Failed to fetch subjects'); }
   }
   
+  const handleUserFilterChange = (e) => {
+    const filters = { ...userFilters, [e.target.name]: e.target.value };
+    setUserFilters(filters);
+    fetchUsers(null, filters);
+  };
   const handleUserFormChange = (e) => setUserFormData({ ...userFormData, [e.target.name]: e.target.value });
   const handleSemesterFormChange = (e) => setSemesterFormData({ ...semesterFormData, [e.target.name]: e.target.value });
   const handleProgramFormChange = (e) => setProgramFormData({ ...programFormData, [e.target.name]: e.target.value });
@@ -80,14 +117,14 @@ function AdminDashboard() {
     e.preventDefault();
     try {
       await api.post('/api/admin/departments', { name: newDepartmentName });
-      toast.success(`Department created!`); setNewDepartmentName(''); fetchDepartments();
+      toast.success(`Department created!`); setNewDepartmentName(''); syncChanges();
     } catch (error) { toast.error(error.response?.data?.msg || 'Failed to create department'); }
   };
    const handleAddSemester = async (e) => {
     e.preventDefault();
     try {
         await api.post('/api/admin/semesters', semesterFormData);
-        toast.success('Semester created!'); fetchSemesters();
+        toast.success('Semester created!'); syncChanges();
     } catch (error) { toast.error(error.response?.data?.msg || 'Failed to create semester'); }
   };
   const handleAddProgram = async (e) => {
@@ -95,7 +132,7 @@ function AdminDashboard() {
     if (!programFormData.department_id) { toast.warn("Please select a department."); return; }
     try {
       await api.post('/api/admin/programs', programFormData);
-      toast.success("Program created!"); fetchPrograms();
+      toast.success("Program created!"); syncChanges();
     } catch (error) { toast.error(error.response?.data?.msg || "Failed to create program"); }
   };
   const handleAddSubject = async (e) => {
@@ -103,7 +140,7 @@ function AdminDashboard() {
     if (!subjectFormData.program_id) { toast.warn("Please select a program."); return; }
     try {
       await api.post('/api/admin/subjects', subjectFormData);
-      toast.success("Subject created!"); fetchSubjects();
+      toast.success("Subject created!"); syncChanges();
     } catch (error) { toast.error(error.response?.data?.msg || "Failed to create subject"); }
   };
   const handleAddUser = async (e) => {
@@ -111,7 +148,7 @@ function AdminDashboard() {
     if (!userFormData.department_id) { toast.error("Please select a department."); return; }
     try {
       await api.post('/api/admin/users', userFormData);
-      toast.success('User added!'); fetchUsers();
+      toast.success('User added!'); syncChanges();
     } catch (error) { toast.error(error.response?.data?.msg || 'Failed to add user'); }
   };
   
@@ -123,7 +160,7 @@ function AdminDashboard() {
       await api.put(endpoint, editFormData);
       toast.success(`${type.charAt(0).toUpperCase() + type.slice(1)} updated!`);
       closeModal();
-      fetchAllData();
+      syncChanges();
     } catch (error) { toast.error(error.response?.data?.msg || `Failed to update ${type}`);}
   };
 
@@ -133,7 +170,7 @@ function AdminDashboard() {
       try {
         await api.delete(endpoint);
         toast.success(`${type.charAt(0).toUpperCase() + type.slice(1)} deleted!`);
-        fetchAllData();
+        syncChanges();
       } catch (error) { toast.error(error.response?.data?.msg || `Failed to delete ${type}`);}
     }
   };
@@ -142,7 +179,7 @@ function AdminDashboard() {
     if (window.confirm('Are you sure you want to activate this semester?')) {
         try {
             await api.post(`/api/admin/semesters/activate/${id}`);
-            toast.success('Semester activated!'); fetchSemesters();
+            toast.success('Semester activated!'); syncChanges();
         } catch (error) { toast.error(error.response?.data?.msg || 'Failed to activate semester'); }
     }
   };
@@ -151,21 +188,35 @@ function AdminDashboard() {
     if (window.confirm('Are you sure? This will deactivate the current active semester.')) {
         try {
             await api.post(`/api/admin/semesters/deactivate`);
-            toast.success('Semester deactivated!'); fetchSemesters();
+            toast.success('Semester deactivated!'); syncChanges();
         } catch (error) { toast.error(error.response?.data?.msg || 'Failed to deactivate semester'); }
     }
   };
   
+  // Reports are built by a background job: submit it, poll until it settles, then fetch the result
+  const runReportJob = async (kind) => {
+    let { data: job } = await api.post('/api/reports/jobs', { ...reportFilters, kind });
+    const deadline = Date.now() + REPORT_POLL_TIMEOUT_MS;
+    while (job.status === 'queued' || job.status === 'running') {
+      if (Date.now() > deadline) throw new Error('The report is taking too long; please try again later');
+      await new Promise(resolve => setTimeout(resolve, REPORT_POLL_INTERVAL_MS));
+      ({ data: job } = await api.get(`/api/reports/jobs/${job.job_id}`));
+    }
+    if (job.status === 'failed') throw new Error(job.error || 'Report failed');
+    return job;
+  };
+
   const handleGenerateReport = async (e) => {
     e.preventDefault();
     if (!reportFilters.department_id || !reportFilters.start_date || !reportFilters.end_date) {
       toast.warn("Please select a department and a full date range."); return;
     }
     try {
-      const res = await api.post('/api/reports/generate', reportFilters);
+      const job = await runReportJob('summary');
+      const res = await api.get(`/api/reports/jobs/${job.job_id}/result`);
       setReportData(res.data);
       toast.success("Report generated successfully!");
-    } catch (error) { toast.error(error.response?.data?.msg || "Failed to generate report"); }
+    } catch (error) { toast.error(error.response?.data?.msg || error.message || "Failed to generate report"); }
   };
 
   const handleGenerateCsvReport = async () => {
@@ -173,13 +224,14 @@ function AdminDashboard() {
       toast.warn("Please generate a report first before downloading."); return;
     }
     try {
-      const response = await api.post('/api/reports/generate-csv', reportFilters, {
+      const job = await runReportJob('summary-csv');
+      const response = await api.get(`/api/reports/jobs/${job.job_id}/result`, {
         responseType: 'blob',
       });
       const url = window.URL.createObjectURL(new Blob([response.data]));
       const link = document.createElement('a');
       link.href = url;
-      const departmentName = departments.find(d => d.id == reportFilters.department_id)?.name || 'report';
+      const departmentName = reportFilters.department_id === 'all' ? 'All departments' : departments.find(d => d.id == reportFilters.department_id)?.name || 'report';
       link.setAttribute('download', `attendance-report-${departmentName.replace(" ", "_")}.csv`);
       document.body.appendChild(link);
       link.click();
@@ -201,7 +253,7 @@ function AdminDashboard() {
           <div className="card-header"><h5 className="mb-0"><FileEarmarkPdf className="me-2"/>Generate Report</h5></div>
           <div className="card-body">
             <form onSubmit={handleGenerateReport} className="row g-3 align-items-end">
-              <div className="col-md-4"><label htmlFor="reportDepartment" className="form-label">Department</label><select name="department_id" className="form-select" onChange={(e) => setReportFilters({...reportFilters, department_id: e.target.value})} required><option value="">-- Select Department --</option>{departments.map(d => <option key={d.id} value={d.id}>{d.name}</option>)}</select></div>
+              <div className="col-md-4"><label htmlFor="reportDepartment" className="form-label">Department</label><select name="department_id" className="form-select" onChange={(e) => setReportFilters({...reportFilters, department_id: e.target.value})} required><option value="">-- Select Department --</option><option value="all">All departments</option>{departments.map(d => <option key={d.id} value={d.id}>{d.name}</option>)}</select></div>
               <div className="col-md-3"><label htmlFor="reportStartDate" className="form-label">Start Date</label><input type="date" name="start_date" className="form-control" onChange={(e) => setReportFilters({...reportFilters, start_date: e.target.value})} required/></div>
               <div className="col-md-3"><label htmlFor="reportEndDate" className="form-label">End Date</label><input type="date" name="end_date" className="form-control" onChange={(e) => setReportFilters({...reportFilters, end_date: e.target.value})} required/></div>
               <div className="col-md-2"><button className="btn btn-info w-100" type="submit">Generate</button></div>
@@ -228,6 +280,9 @@ function AdminDashboard() {
                         <strong>Period:</strong> {reportData.summary.period}<br/>
                         <strong>Total Classes Recorded:</strong> {reportData.summary.total_classes_recorded}<br/>
                         <strong>Overall Attendance Rate:</strong> <span className="fw-bold fs-5">{reportData.summary.overall_attendance_rate}%</span>
+                        {reportData.unlinked_records > 0 && (
+                          <><br/><small className="text-muted">{reportData.unlinked_records} record(s) not linked to a class are not counted.</small></>
+                        )}
                       </div>
                       <div className="row my-3">
                         <div className="col-md-6 mb-3 mb-md-0"><div className="card text-center h-100"><div className="card-body">
@@ -242,7 +297,7 @@ function AdminDashboard() {
                       <div className="table-responsive">
                         <table className={`table table-bordered ${theme === 'dark' ? 'table-dark' : ''}`}>
                           <thead><tr><th>Lecturer</th><th>Total Classes</th><th>Attended</th><th>Missed</th><th>Attendance Rate</th></tr></thead>
-                          <tbody>{reportData.breakdown.map(lec => (<tr key={lec.lecturer_name}><td>{lec.lecturer_name}</td><td>{lec.total_classes}</td><td>{lec.classes_attended}</td><td>{lec.classes_missed}</td><td>{lec.attendance_rate}%</td></tr>))}</tbody>
+                          <tbody>{reportData.breakdown.map(lec => (<tr key={`${lec.department_name || ''}-${lec.lecturer_name}`}><td>{lec.lecturer_name}{lec.department_name && <small className="text-muted d-block">{lec.department_name}</small>}</td><td>{lec.total_classes}</td><td>{lec.classes_attended}</td><td>{lec.classes_missed}</td><td>{lec.attendance_rate}%</td></tr>))}</tbody>
                         </table>
                       </div>
                     </Tab.Pane>
@@ -311,12 +366,13 @@ function AdminDashboard() {
         </div>
 
         <div className="card shadow-sm mt-4">
-          <div className="card-header"><h5 className="mb-0">Manage Users</h5></div>
+          <div className="card-header d-flex flex-wrap gap-2 justify-content-between align-items-center"><h5 className="mb-0">Manage Users</h5><div className="d-flex gap-2"><input type="search" name="search" className="form-control form-control-sm" placeholder="Search name or email" value={userFilters.search} onChange={handleUserFilterChange} /><select name="role" className="form-select form-select-sm" value={userFilters.role} onChange={handleUserFilterChange}><option value="">All roles</option><option value="CR">Class Representative</option><option value="Lecturer">Lecturer</option><option value="HOD">Head of Department</option></select><select name="department_id" className="form-select form-select-sm" value={userFilters.department_id} onChange={handleUserFilterChange}><option value="">All departments</option>{departments.map(dept => (<option key={dept.id} value={dept.id}>{dept.name}</option>))}</select></div></div>
           <div className="card-body p-0">
             <div className="table-responsive"><table className="table table-striped table-hover align-middle">
               <thead className="table-dark"><tr><th>#</th><th>Name</th><th>Email</th><th>Role</th><th>Department</th><th className="text-center">Actions</th></tr></thead>
               <tbody>{users.map((user, index) => (<tr key={user.id}><th>{index + 1}</th><td>{user.full_name}</td><td>{user.email}</td><td><span className={`badge bg-${getRoleBadge(user.role)}`}>{user.role}</span></td><td>{user.department_name}</td><td className="text-center"><div className="btn-group"><button className="btn btn-outline-secondary btn-sm" onClick={() => openModal('user', user)}><PencilSquare /></button><button className="btn btn-outline-danger btn-sm" onClick={() => handleDelete('user', user.id)}><Trash /></button></div></td></tr>))}</tbody>
             </table></div>
+            {usersCursor && (<div className="text-center p-3"><button className="btn btn-outline-primary btn-sm" onClick={() => fetchUsers(usersCursor)}>Load more</button></div>)}
           </div>
         </div>
       </div>
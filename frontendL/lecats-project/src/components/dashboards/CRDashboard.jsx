@@ -1,18 +1,54 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { toast } from 'react-toastify';
 import { ClockHistory, Check2Circle } from 'react-bootstrap-icons';
 import api from '../../api'; // Using the central api instance
+import useEventStream from '../../useEventStream';
+
+const REFETCH_DELAY_MS = 5000;
 
 function CRDashboard() {
   const [todaysSchedule, setTodaysSchedule] = useState([]);
   const [isLoading, setIsLoading] = useState(true);
+  const [marks, setMarks] = useState({});
+  const [isSubmitting, setIsSubmitting] = useState(false);
+
+  const refetchTimer = useRef(null);
 
   useEffect(() => {
     fetchTodaysSchedule();
+    return () => clearTimeout(refetchTimer.current);
   }, []);
 
-  async function fetchTodaysSchedule() {
-    setIsLoading(true);
+  // Every CR in the department hears every submission, so a burst of events is folded into
+  // at most one refetch per REFETCH_DELAY_MS instead of one per event
+  const scheduleRefetch = () => {
+    if (refetchTimer.current) return;
+    refetchTimer.current = setTimeout(() => {
+      refetchTimer.current = null;
+      fetchTodaysSchedule(false);
+    }, REFETCH_DELAY_MS);
+  };
+
+  // Marks from other CRs are patched in from the event itself; only a timetable change,
+  // a reconnect or an event without ids needs the schedule again
+  const markSubmitted = (occurrenceIds) => {
+    const submitted = new Set(occurrenceIds);
+    setTodaysSchedule((current) => current.map((item) => (submitted.has(item.occurrence_id) ? { ...item, submitted: true } : item)));
+    setMarks((current) => Object.fromEntries(Object.entries(current).filter(([id]) => !submitted.has(Number(id)))));
+  };
+
+  useEventStream({
+    schedules: scheduleRefetch,
+    attendance: (event) => {
+      if (event.action !== 'submitted') return;
+      if (event.occurrence_ids) markSubmitted(event.occurrence_ids);
+      else scheduleRefetch();
+    },
+    resync: scheduleRefetch,
+  });
+
+  async function fetchTodaysSchedule(showLoading = true) {
+    if (showLoading) setIsLoading(true);
     try {
       // UPDATED to use api instance
       const res = await api.get('/api/cr/todays-schedule');
@@ -24,17 +60,32 @@ function CRDashboard() {
     }
   }
 
-  const handleSubmit = async (scheduleId, isPresent) => {
+  const handleMark = (occurrenceId, isPresent) => {
+    setMarks((current) => ({ ...current, [occurrenceId]: isPresent }));
+  };
+
+  // All of the day's marks go to the server in a single request
+  const handleSubmit = async () => {
+    const payload = Object.entries(marks).map(([occurrenceId, present]) => ({
+      occurrence_id: Number(occurrenceId),
+      present,
+    }));
+    if (payload.length === 0) return;
+    setIsSubmitting(true);
     try {
-      // UPDATED to use api instance
-      await api.post('/api/attendance', {
-        class_schedule_id: scheduleId,
-        present: isPresent,
-      });
-      toast.success('Attendance submitted successfully!');
+      const res = await api.post('/api/attendance/bulk', { marks: payload });
+      const rejected = res.data.results.filter((item) => item.status !== 'recorded');
+      if (rejected.length === 0) {
+        toast.success('Attendance submitted successfully!');
+      } else {
+        toast.warn(`${rejected.length} mark(s) were not recorded (already submitted or no longer scheduled).`);
+      }
+      setMarks({});
       fetchTodaysSchedule();
     } catch (error) {
       toast.error(error.response?.data?.msg || 'Failed to submit attendance');
+    } finally {
+      setIsSubmitting(false);
     }
   };
   
@@ -54,7 +105,7 @@ function CRDashboard() {
     return (
       <ul className="list-group">
         {todaysSchedule.map((schedule) => (
-          <li key={schedule.schedule_id} className="list-group-item d-flex flex-column flex-md-row justify-content-between align-items-center">
+          <li key={schedule.occurrence_id} className="list-group-item d-flex flex-column flex-md-row justify-content-between align-items-center">
             <div className="mb-2 mb-md-0">
               <div className="fw-bold">{schedule.subject_name}</div>
               <small className="text-muted">{schedule.start_time} - {schedule.end_time} | {schedule.lecturer_name}</small>
@@ -64,8 +115,8 @@ function CRDashboard() {
                 <span className="badge bg-success-subtle text-success-emphasis p-2"><Check2Circle className="me-1"/> Submitted</span>
               ) : (
                 <div className="btn-group" role="group">
-                  <button className="btn btn-outline-success" onClick={() => handleSubmit(schedule.schedule_id, true)}>Present</button>
-                  <button className="btn btn-outline-danger" onClick={() => handleSubmit(schedule.schedule_id, false)}>Absent</button>
+                  <button className={`btn ${marks[schedule.occurrence_id] === true ? 'btn-success' : 'btn-outline-success'}`} onClick={() => handleMark(schedule.occurrence_id, true)}>Present</button>
+                  <button className={`btn ${marks[schedule.occurrence_id] === false ? 'btn-danger' : 'btn-outline-danger'}`} onClick={() => handleMark(schedule.occurrence_id, false)}>Absent</button>
                 </div>
               )}
             </div>
@@ -74,6 +125,18 @@ function CRDashboard() {
       </ul>
     );
   };
+
+  const renderSubmitButton = () => {
+    const count = Object.keys(marks).length;
+    if (isLoading || count === 0) return null;
+    return (
+      <div className="d-grid mt-4">
+        <button className="btn btn-primary" onClick={handleSubmit} disabled={isSubmitting}>
+          {isSubmitting ? 'Submitting...' : `Submit ${count} mark${count === 1 ? '' : 's'}`}
+        </button>
+      </div>
+    );
+  };
   
   return (
     <div className="d-flex align-items-center justify-content-center vh-100">
@@ -82,6 +145,7 @@ function CRDashboard() {
           <h2 className="card-title text-center fw-bold">Submit Today's Attendance</h2>
           <p className="text-center text-muted mb-4">{new Date().toLocaleDateString('en-US', { weekday: 'long', year: 'numeric', month: 'long', day: 'numeric' })}</p>
           {renderSchedule()}
+          {renderSubmitButton()}
         </div>
       </div>
     </div>
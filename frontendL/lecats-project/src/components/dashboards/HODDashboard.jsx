@@ -3,6 +3,11 @@ import { toast } from 'react-toastify';
 import { Nav, Button } from 'react-bootstrap';
 import { CalendarPlus, Table, CheckCircleFill, Download, Clipboard2Check, Trash } from 'react-bootstrap-icons';
 import api from '../../api';
+import useChangeFeed, { applyChanges, needsReload } from '../../useChangeFeed';
+import useEventStream from '../../useEventStream';
+
+const PENDING_PAGE_SIZE = 50;
+const CHANGE_SCOPE = 'schedules,special_schedules,attendance';
 
 function HODDashboard() {
   const [view, setView] = useState('timetable');
@@ -31,6 +36,9 @@ function HODDashboard() {
   
   // State for Pending Verifications
   const [pendingAttendances, setPendingAttendances] = useState([]);
+  const [pendingCursor, setPendingCursor] = useState(null);
+  const [selectedPending, setSelectedPending] = useState([]);
+  const [pendingWindow, setPendingWindow] = useState({ start_date: '', end_date: '' });
 
   useEffect(() => {
     fetchHODData();
@@ -38,6 +46,30 @@ function HODDashboard() {
     fetchPending();
     fetchDepartments();
   }, []);
+
+  const syncChanges = useChangeFeed(CHANGE_SCOPE, (changes) => {
+    if (needsReload(changes, 'schedules') || needsReload(changes, 'special_schedules')) fetchSchedules();
+    else {
+      setSchedules(prev => applyChanges(prev, changes, 'schedules'));
+      // Only upcoming special classes this HOD created are listed, so new ones come from fetchSchedules
+      setSpecialSchedules(prev => applyChanges(prev, changes, 'special_schedules', (row, known) => known));
+    }
+    if (needsReload(changes, 'attendance')) fetchPending();
+    else {
+      setPendingAttendances(prev => applyChanges(prev, changes, 'attendance', isPending));
+      setSelectedPending(prev => prev.filter(id => !changes.some(change => change.entity === 'attendance' && change.id === id && !isPending(change.data))));
+    }
+  });
+
+  // New submissions and timetable edits are pushed, so the feed is pulled as soon as they happen
+  useEventStream({ attendance: syncChanges, schedules: syncChanges, resync: syncChanges });
+
+  // Whether an attendance row belongs in the pending list as currently filtered
+  const isPending = (att) => {
+    if (!att || att.verified) return false;
+    const day = att.timestamp ? att.timestamp.slice(0, 10) : '';
+    return (!pendingWindow.start_date || day >= pendingWindow.start_date) && (!pendingWindow.end_date || day <= pendingWindow.end_date);
+  };
   
   async function fetchHODData() {
     try {
@@ -59,10 +91,16 @@ function HODDashboard() {
     }
   }
 
-  async function fetchPending() {
+  async function fetchPending(cursor = null, dateWindow = pendingWindow) {
     try {
-      const res = await api.get('/api/hod/attendance/pending');
-      setPendingAttendances(res.data);
+      const params = { limit: PENDING_PAGE_SIZE };
+      if (dateWindow.start_date) params.start_date = dateWindow.start_date;
+      if (dateWindow.end_date) params.end_date = dateWindow.end_date;
+      if (cursor) params.cursor = cursor;
+      const res = await api.get('/api/hod/attendance/pending', { params });
+      setPendingAttendances(prev => cursor ? [...prev, ...res.data.items] : res.data.items);
+      setPendingCursor(res.data.next_cursor);
+      if (!cursor) setSelectedPending([]);
     } catch (error) {
       toast.error(error.response?.data?.msg || 'Failed to fetch pending attendance');
     }
@@ -77,6 +115,12 @@ function HODDashboard() {
     }
   }
 
+  const handlePendingWindowChange = (e) => {
+    const dateWindow = { ...pendingWindow, [e.target.name]: e.target.value };
+    setPendingWindow(dateWindow);
+    fetchPending(null, dateWindow);
+  };
+
   const handleScheduleFormChange = (e) => {
     setScheduleFormData({ ...scheduleFormData, [e.target.name]: e.target.value });
   };
@@ -90,7 +134,7 @@ function HODDashboard() {
     try {
       await api.post('/api/hod/schedules', scheduleFormData);
       toast.success('Class added to timetable successfully!');
-      fetchSchedules();
+      syncChanges();
     } catch (error) {
       toast.error(error.response?.data?.msg || 'Failed to schedule class');
     }
@@ -112,7 +156,7 @@ function HODDashboard() {
       try {
         await api.delete(`/api/hod/schedules/${id}`);
         toast.success('Scheduled class deleted successfully!');
-        fetchSchedules();
+        syncChanges();
       } catch (error) {
         toast.error(error.response?.data?.msg || 'Failed to delete scheduled class');
       }
@@ -124,25 +168,57 @@ function HODDashboard() {
       try {
         await api.delete(`/api/hod/special-schedules/${id}`);
         toast.success('Special class deleted!');
-        fetchSchedules(); // Refresh both lists
+        syncChanges();
       } catch (error) {
         toast.error(error.response?.data?.msg || 'Failed to delete special class');
       }
     }
   };
 
+  const togglePendingSelection = (id) => {
+    setSelectedPending(prev => prev.includes(id) ? prev.filter(x => x !== id) : [...prev, id]);
+  };
+
+  const toggleAllPending = () => {
+    setSelectedPending(prev => prev.length === pendingAttendances.length ? [] : pendingAttendances.map(att => att.id));
+  };
+
+  const handleVerifySelected = async () => {
+    if (selectedPending.length === 0) return;
+    if (window.confirm(`Verify ${selectedPending.length} selected attendance records?`)) {
+      try {
+        const res = await api.post('/api/hod/attendance/verify-bulk', { ids: selectedPending });
+        toast.success(`${res.data.verified} attendance records verified!`);
+        syncChanges();
+      } catch (error) {
+        toast.error(error.response?.data?.msg || 'Failed to verify attendance');
+      }
+    }
+  };
+
   const handleVerify = async (id) => {
     if (window.confirm('Are you sure you want to verify this attendance record?')) {
       try {
         await api.post(`/api/hod/attendance/verify/${id}`);
         toast.success('Attendance verified successfully!');
-        fetchPending();
+        syncChanges();
       } catch (error) {
         toast.error(error.response?.data?.msg || 'Failed to verify attendance');
       }
     }
   };
 
+  // Processed excuses show their first-page thumbnail, which links to the full PDF
+  const renderExcuse = (att) => {
+    if (!att.excuse_file) return <span className="text-muted">-</span>;
+    const pdfUrl = `http://localhost:5000/uploads/${att.excuse_file}`;
+    if (att.excuse_status === 'rejected') return <span className="badge bg-danger-subtle text-danger-emphasis" title={att.excuse_error}>Invalid PDF</span>;
+    if (att.excuse_thumbnail) {
+      return (<a href={pdfUrl} target="_blank" rel="noreferrer" title={`${att.excuse_pages} page(s)`}><img src={`http://localhost:5000/uploads/${att.excuse_thumbnail}`} alt="Excuse, first page" loading="lazy" className="img-thumbnail" style={{ maxWidth: 80 }} /></a>);
+    }
+    return (<a href={pdfUrl} target="_blank" rel="noreferrer" className="btn btn-outline-info btn-sm"><Download size={14} className="me-1"/> {['queued', 'processing'].includes(att.excuse_status) ? 'Processing…' : 'View PDF'}</a>);
+  };
+
   const renderTimetableManager = () => (
     <>
       <div className="card shadow-sm mb-4">
@@ -195,12 +271,13 @@ function HODDashboard() {
 
   const renderPendingVerifications = () => (
     <div className="card shadow-sm">
-      <div className="card-header bg-light d-flex justify-content-between align-items-center"><h5 className="mb-0">Pending Attendance Verification</h5><span className="badge bg-warning text-dark rounded-pill">{pendingAttendances.length} Pending</span></div>
+      <div className="card-header bg-light d-flex justify-content-between align-items-center"><h5 className="mb-0">Pending Attendance Verification</h5><div className="d-flex gap-2 align-items-center"><input type="date" name="start_date" className="form-control form-control-sm" value={pendingWindow.start_date} onChange={handlePendingWindowChange} /><input type="date" name="end_date" className="form-control form-control-sm" value={pendingWindow.end_date} onChange={handlePendingWindowChange} /><button className="btn btn-success btn-sm text-nowrap" disabled={selectedPending.length === 0} onClick={handleVerifySelected}><CheckCircleFill size={14} className="me-1" /> Verify selected ({selectedPending.length})</button><span className="badge bg-warning text-dark rounded-pill">{pendingAttendances.length}{pendingCursor ? '+' : ''} Pending</span></div></div>
       <div className="card-body p-0">
         {pendingAttendances.length === 0 ? (<div className="text-center p-5"><Clipboard2Check size={40} className="mb-3 text-success"/><h4>All Caught Up!</h4><p className="text-muted">No pending records to verify.</p></div>) : (<div className="table-responsive"><table className="table table-striped table-hover mb-0 align-middle">
-            <thead className="table-dark"><tr><th>Course</th><th>Lecturer</th><th>CR</th><th className="text-center">Status</th><th>Submitted On</th><th>Excuse File</th><th className="text-center">Action</th></tr></thead>
-            <tbody>{pendingAttendances.map((att) => (<tr key={att.id}><td><strong>{att.course}</strong></td><td>{att.lecturer_name}</td><td>{att.cr_name}</td><td className="text-center">{att.present ? <span className="badge bg-success-subtle text-success-emphasis border border-success-subtle">Present</span> : <span className="badge bg-danger-subtle text-danger-emphasis border border-danger-subtle">Absent</span>}</td><td>{new Date(att.timestamp).toLocaleString()}</td><td className="text-center">{att.excuse_file ? (<a href={`http://localhost:5000/uploads/${att.excuse_file}`} target="_blank" rel="noreferrer" className="btn btn-outline-info btn-sm"><Download size={14} className="me-1"/> View PDF</a>) : ( <span className="text-muted">-</span> )}</td><td className="text-center"><button className="btn btn-success btn-sm" onClick={() => handleVerify(att.id)}><CheckCircleFill size={14} className="me-1" /> Verify</button></td></tr>))}</tbody>
+            <thead className="table-dark"><tr><th><input type="checkbox" className="form-check-input" checked={pendingAttendances.length > 0 && selectedPending.length === pendingAttendances.length} onChange={toggleAllPending} /></th><th>Course</th><th>Lecturer</th><th>CR</th><th className="text-center">Status</th><th>Submitted On</th><th>Excuse File</th><th className="text-center">Action</th></tr></thead>
+            <tbody>{pendingAttendances.map((att) => (<tr key={att.id}><td><input type="checkbox" className="form-check-input" checked={selectedPending.includes(att.id)} onChange={() => togglePendingSelection(att.id)} /></td><td><strong>{att.course}</strong></td><td>{att.lecturer_name}</td><td>{att.cr_name}</td><td className="text-center">{att.present ? <span className="badge bg-success-subtle text-success-emphasis border border-success-subtle">Present</span> : <span className="badge bg-danger-subtle text-danger-emphasis border border-danger-subtle">Absent</span>}</td><td>{new Date(att.timestamp).toLocaleString()}</td><td className="text-center">{renderExcuse(att)}</td><td className="text-center"><button className="btn btn-success btn-sm" onClick={() => handleVerify(att.id)}><CheckCircleFill size={14} className="me-1" /> Verify</button></td></tr>))}</tbody>
         </table></div>)}
+        {pendingCursor && (<div className="text-center p-3"><button className="btn btn-outline-primary btn-sm" onClick={() => fetchPending(pendingCursor)}>Load more</button></div>)}
       </div>
     </div>
   );
@@ -210,7 +287,7 @@ function HODDashboard() {
       <h1 className="h2 mb-4 fw-bold">HOD Dashboard</h1>
       <Nav variant="pills" activeKey={view} onSelect={(selectedKey) => setView(selectedKey)} className="mb-3">
         <Nav.Item><Nav.Link eventKey="timetable">Timetable Manager</Nav.Link></Nav.Item>
-        <Nav.Item><Nav.Link eventKey="verification">Pending Verifications <span className="badge bg-danger ms-1">{pendingAttendances.length}</span></Nav.Link></Nav.Item>
+        <Nav.Item><Nav.Link eventKey="verification">Pending Verifications <span className="badge bg-danger ms-1">{pendingAttendances.length}{pendingCursor ? '+' : ''}</span></Nav.Link></Nav.Item>
       </Nav>
 
       {view === 'timetable' && renderTimetableManager()}
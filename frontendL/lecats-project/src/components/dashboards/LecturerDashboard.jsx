@@ -144,10 +144,12 @@ function LecturerDashboard() {
                                 </td>
                                 <td>{att.cr_name}</td>
                                 <td className="text-center">
-                                  {att.excuse_file ? <span className="badge bg-info">Submitted</span> : <span className="badge bg-secondary">None</span>}
+                                  {!att.excuse_file ? <span className="badge bg-secondary">None</span>
+                                    : att.excuse_status === 'rejected' ? <span className="badge bg-danger" title={att.excuse_error}>Rejected</span>
+                                    : <span className="badge bg-info">Submitted</span>}
                                 </td>
                                 <td className="text-center">
-                                  {!att.present && !att.excuse_file && (
+                                  {!att.present && (!att.excuse_file || att.excuse_status === 'rejected') && (
                                     <Button variant="outline-primary" size="sm" onClick={() => handleShowModal(att)}>
                                       <PencilSquare className="me-1"/> Submit Excuse
                                     </Button>
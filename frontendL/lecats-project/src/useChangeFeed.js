@@ -0,0 +1,93 @@
+import { useCallback, useEffect, useRef } from 'react';
+import api from './api';
+
+const CHANGE_POLL_INTERVAL_MS = 15000;
+
+// Keeps lists loaded once in sync through /api/changes instead of refetching them after every
+// action. onChanges receives each batch; a 'reset' entry (or a cursor too old for the server)
+// means that list must be reloaded. Call sync() after a save to pick up its effect right away.
+function useChangeFeed(scope, onChanges) {
+  const cursorRef = useRef(null);
+  const handlerRef = useRef(onChanges);
+  const pollRef = useRef(() => {});
+  handlerRef.current = onChanges;
+
+  useEffect(() => {
+    let cancelled = false;
+    let running = null;
+    let again = false;
+    let timer;
+
+    const poll = async () => {
+      try {
+        if (cursorRef.current === null) {
+          const res = await api.get('/api/changes', { params: { scope } });
+          cursorRef.current = res.data.cursor;
+          return;
+        }
+        let more = true;
+        while (more && !cancelled) {
+          const res = await api.get('/api/changes', { params: { scope, since: cursorRef.current } });
+          cursorRef.current = res.data.cursor;
+          more = res.data.has_more;
+          if (res.data.changes.length && !cancelled) handlerRef.current(res.data.changes);
+        }
+      } catch (error) {
+        if (error.response?.status === 410 && !cancelled) {
+          cursorRef.current = error.response.data.cursor;
+          handlerRef.current(scope.split(',').map(entity => ({ entity, action: 'reset' })));
+        }
+      }
+    };
+
+    const schedule = () => {
+      clearTimeout(timer);
+      if (!cancelled) timer = setTimeout(run, CHANGE_POLL_INTERVAL_MS);
+    };
+    // One poll at a time; a sync() during a poll runs once more right after it
+    const run = () => {
+      if (running) {
+        again = true;
+        return running;
+      }
+      running = poll().finally(() => {
+        running = null;
+        if (again) {
+          again = false;
+          run();
+        } else {
+          schedule();
+        }
+      });
+      return running;
+    };
+
+    pollRef.current = run;
+    run();
+    return () => { cancelled = true; clearTimeout(timer); pollRef.current = () => {}; };
+  }, [scope]);
+
+  return useCallback(() => pollRef.current(), []);
+}
+
+// Applies one entity's changes to a list of rows: changed rows are replaced in place, new rows
+// go on top, and rows that are deleted or no longer pass keep() are dropped
+export function applyChanges(rows, changes, entity, keep = () => true) {
+  let next = rows;
+  for (const change of changes) {
+    if (change.entity !== entity || change.action === 'reset') continue;
+    const known = next.some(row => row.id === change.id);
+    if (change.action === 'delete' || !keep(change.data, known)) {
+      if (known) next = next.filter(row => row.id !== change.id);
+    } else if (known) {
+      next = next.map(row => row.id === change.id ? change.data : row);
+    } else {
+      next = [change.data, ...next];
+    }
+  }
+  return next;
+}
+
+export const needsReload = (changes, entity) => changes.some(change => change.entity === entity && change.action === 'reset');
+
+export default useChangeFeed;
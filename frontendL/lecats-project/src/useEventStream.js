@@ -0,0 +1,64 @@
+import { useEffect, useRef } from 'react';
+import api from './api';
+
+const RETRY_MIN_MS = 3000;
+const RETRY_MAX_MS = 60000;
+
+// Subscribes to /api/events/stream for the user's department. handlers maps event names
+// ('attendance', 'schedules', 'resync') to callbacks. EventSource cannot send the Authorization
+// header, so each connection opens with a short-lived ticket from POST /api/events/ticket; the
+// access token never ends up in a URL. A ticket is only good for one connect, so after an error
+// the stream is reopened here with a fresh one instead of by EventSource itself, and 'resync'
+// runs on every reconnect since events sent while disconnected are lost.
+function useEventStream(handlers) {
+  const handlersRef = useRef(handlers);
+  handlersRef.current = handlers;
+
+  useEffect(() => {
+    if (!localStorage.getItem('token') || typeof EventSource === 'undefined') return undefined;
+    let source = null;
+    let retryTimer = null;
+    let retryMs = RETRY_MIN_MS;
+    let connected = false;
+    let stopped = false;
+
+    const retry = () => {
+      if (stopped) return;
+      retryTimer = setTimeout(connect, retryMs);
+      retryMs = Math.min(retryMs * 2, RETRY_MAX_MS);
+    };
+
+    const connect = async () => {
+      let ticket;
+      try {
+        ticket = (await api.post('/api/events/ticket')).data.ticket;
+      } catch {
+        retry();
+        return;
+      }
+      if (stopped) return;
+      source = new EventSource(`${api.defaults.baseURL}/api/events/stream?ticket=${encodeURIComponent(ticket)}`);
+      source.onopen = () => {
+        if (connected) handlersRef.current.resync?.();
+        connected = true;
+        retryMs = RETRY_MIN_MS;
+      };
+      source.onerror = () => {
+        source.close();
+        retry();
+      };
+      for (const name of Object.keys(handlersRef.current)) {
+        source.addEventListener(name, (e) => handlersRef.current[name]?.(JSON.parse(e.data || '{}')));
+      }
+    };
+
+    connect();
+    return () => {
+      stopped = true;
+      clearTimeout(retryTimer);
+      source?.close();
+    };
+  }, []);
+}
+
+export default useEventStream;